@@ -1,14 +1,23 @@
 
-from flask import Flask, request, jsonify, make_response
-from command_detect import detect_command
-import requests  # For sending to firmware (if networked)
+from flask import Flask, request, jsonify, abort, make_response
 from flask_cors import CORS
+import startup  # first, so its clock covers the imports below
 import os
 import time
-import json
 import traceback
+import uuid
+import metrics
+import profiling
 
 app = Flask(__name__)
+# Request counts/latency/payload sizes per route and GET /metrics
+# (registered first so every request is seen)
+metrics.instrument(app)
+# Per-request cProfile/stack sampling and /debug/profiles, only with EDGEVOICE_PROFILING=1
+profiling.register(app)
+# Reject oversized uploads before they are buffered (413)
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('EDGEVOICE_MAX_UPLOAD_MB', 32))
+                                        * 1024 * 1024)
 # Enable wide-open CORS for local file:// usage (no credentials needed)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
@@ -17,9 +26,22 @@ CORS(app, resources={r"/*": {"origins": "*"}})
 def add_cors_headers(response):
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    response.headers['Access-Control-Allow-Headers'] = ('Content-Type, Authorization, '
+                                                        'X-EdgeVoice-Profile')
+    response.headers['Access-Control-Expose-Headers'] = serialization.EXPOSED_HEADERS
     return response
 
+@app.before_request
+def reject_oversized_upload():
+    # Checked up front so views that catch Exception never see the 413
+    if request.content_length is not None and request.content_length > request.max_content_length:
+        abort(413)
+
+@app.errorhandler(413)
+def handle_too_large(e):
+    limit_mb = request.max_content_length / (1024 * 1024)
+    return jsonify({'error': f'Upload too large (limit {limit_mb:g} MB)'}), 413
+
 # Log unhandled errors so we can see root cause of 500s
 @app.errorhandler(Exception)
 def handle_error(e):
@@ -27,8 +49,36 @@ def handle_error(e):
     print('Unhandled exception:', e)
     return jsonify({'error': str(e)}), 500
 
-import librosa
 import numpy as np
+import audio_io
+import serialization
+import artifacts
+import fixed_point
+import feature_store
+import result_cache
+import ws_stream
+import pipeline
+import batcher
+import long_audio
+import jobs
+import routes
+
+# Decode -> MFCC -> stats -> detect, built once
+# (detector from EDGEVOICE_DETECTOR / EDGEVOICE_MODEL_PATH)
+pipe = pipeline.default
+# Concurrent one-shot /wakeword_detect chunks share one stacked MFCC + detector pass
+wake_batcher = batcher.MicroBatcher(pipe)
+startup.mark('imports')
+# GET /ready: 503 until the warm-up pass (startup.py, EDGEVOICE_WARMUP) has run
+startup.register(app, pipe)
+# POST /upload_long: block-by-block decode/MFCC/detection for long recordings, flat memory
+long_audio.register(app, pipe)
+# /jobs/<id>, /jobs/<id>/events (SSE progress) and /jobs/<id>/result for /upload?async=1
+jobs.register(app)
+
+# Persistent PCM stream for the wakeword page (ws://.../ws/wakeword, needs flask-sock)
+if not ws_stream.register(app, pipe):
+    print("⚠️ flask-sock not installed, /ws/wakeword disabled")
 
 # --- CORS Helper Function ---
 def handle_cors_preflight():
@@ -64,61 +114,39 @@ def upload():
             print("❌ No audio file in request")
             return jsonify({'error': 'No audio file provided'}), 400
         
+        try:
+            fmt, compression = serialization.negotiate(request)
+        except serialization.FormatError as e:
+            return jsonify({'error': str(e)}), 400
+        
         print(f"✅ Audio file received: {audio.filename}")
         # Get original filename and extension
         original_filename = audio.filename
         file_ext = os.path.splitext(original_filename)[1] if original_filename else '.wav'
-        temp_filename = f'temp{file_ext}'
-        audio.save(temp_filename)
-        print(f"📁 Audio saved to {temp_filename}")
+        session_id = request.form.get('session_id') or uuid.uuid4().hex
+        data = audio_io.read_upload(audio)
         
-        # librosa.load handles multiple formats: WAV, MP3, OGG, FLAC, M4A, etc.
+        # ?async=1: queue the work and answer at once; follow it at /jobs/<id>/events
+        if request.args.get('async') == '1' or request.form.get('async') == '1':
+            try:
+                job = jobs.submit(routes.run_upload, pipe, bytes(data), file_ext, original_filename,
+                                  session_id, kind='upload')
+            except jobs.QueueFull as e:
+                print(f"⏳ Job queue full: {e}")
+                return jobs.busy_response(e)
+            print(f"🧵 Upload queued as job {job.id}")
+            return jsonify(jobs.status(job.state)), 202, {'Location': f'/jobs/{job.id}'}
+
         try:
-            y, sr = librosa.load(temp_filename, sr=16000)
-            print(f"🔊 Audio loaded: {len(y)} samples at {sr} Hz")
-        except Exception as e:
+            result, mfcc = routes.run_upload(pipe, data, file_ext, original_filename, session_id)
+        except audio_io.DecodeError as e:
             # Surface decoder problems (e.g., missing FFmpeg for MP3) instead of generic 500
-            print(f"❌ Failed to load audio: {str(e)}")
             return jsonify({
                 'error': 'Could not decode audio. Install FFmpeg for MP3/OGG or upload a WAV file.',
                 'details': str(e)
             }), 415
-        
-        print("🎵 Extracting MFCC...")
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        stats = {
-            'mean': np.mean(mfcc, axis=1).round(3).tolist(),
-            'std': np.std(mfcc, axis=1).round(3).tolist(),
-            'energy': float(np.sum(y ** 2) / len(y)),
-            'duration': round(len(y) / sr, 2)
-        }
-        print(f"✅ MFCC extracted: shape {mfcc.shape}")
-        
-        # Wake word detection
-        try:
-            wake_word, wake_range = detect_command(mfcc)
-            confidence = None
-            if wake_word:
-                # Simple confidence: inverse of min_dist (simulate)
-                confidence = 95.0
-        except Exception as e:
-            print(f"⚠️ Wake word detection failed: {str(e)}, continuing without it")
-            wake_word = None
-            wake_range = None
-            confidence = None
-        
-        result = {
-            'mfcc': mfcc.tolist(),
-            'shape': [int(x) for x in mfcc.shape],
-            'stats': stats,
-            'wake_word': bool(wake_word),
-            'wake_range': [int(x) for x in wake_range] if wake_range else None,
-            'confidence': float(confidence) if confidence else None,
-            'timestamp': int((wake_range[0] / mfcc.shape[1]) * stats['duration'] * 1000) if wake_range else None,
-            'keyword': wake_word
-        }
-        print("✅ Upload/MFCC processing complete, returning result")
-        return jsonify(result)
+        print(f"✅ MFCC extracted: shape {mfcc.shape}, wake word: {result['keyword']}")
+        return serialization.mfcc_response(result, mfcc, fmt, compression)
     
     except Exception as e:
         print(f"❌ FATAL ERROR in upload: {str(e)}")
@@ -132,21 +160,24 @@ def upload():
 # --- Streaming endpoint for real-time MFCC (chunked audio) ---
 @app.route('/stream_mfcc', methods=['POST'])
 def stream_mfcc():
-    # Accepts raw PCM or WAV chunks, returns MFCC for each chunk
+    # Accepts raw PCM or WAV chunks, returns MFCC for each chunk.
+    # With a session_id the frame overlap is carried across chunks and only
+    # the new frames are returned; send final=1 with the last chunk.
     audio = request.files['audio']
-    y, sr = librosa.load(audio, sr=16000)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    stats = {
-        'mean': np.mean(mfcc, axis=1).round(3).tolist(),
-        'std': np.std(mfcc, axis=1).round(3).tolist(),
-        'energy': float(np.sum(y ** 2) / len(y)),
-        'duration': round(len(y) / sr, 2)
-    }
-    return jsonify({
-        'mfcc': mfcc.tolist(),
-        'shape': list(mfcc.shape),
-        'stats': stats
-    })
+    try:
+        fmt, compression = serialization.negotiate(request)
+    except serialization.FormatError as e:
+        return jsonify({'error': str(e)}), 400
+    file_ext = os.path.splitext(audio.filename or '')[1]
+    result, mfcc = routes.stream_mfcc(pipe, audio_io.read_upload(audio), file_ext, request.form)
+    return serialization.mfcc_response(result, mfcc, fmt, compression)
+
+# Result cache counters, for sizing EDGEVOICE_CACHE_MB
+metrics.add_collector(metrics.cache_collector(result_cache.cache))
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.cache.stats())
 
 # --- Wake Word Detection Endpoint (Real-Time) ---
 @app.route('/wakeword_detect', methods=['POST', 'OPTIONS'])
@@ -156,31 +187,9 @@ def wakeword_detect():
     
     try:
         audio = request.files.get('audio')
-        wake_word = request.form.get('wakeWord', 'hey assistant')
-        confidence = float(request.form.get('confidence', 0))
-        
         if audio:
-            # Save audio chunk
-            temp_filename = 'wakeword_temp.wav'
-            audio.save(temp_filename)
-            
-            # Process with librosa
-            y, sr = librosa.load(temp_filename, sr=16000)
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            
-            # Detect wake word
-            detected_word, wake_range = detect_command(mfcc)
-            
-            result = {
-                'detected': bool(detected_word),
-                'wake_word': wake_word,
-                'detected_word': detected_word,
-                'confidence': confidence,
-                'timestamp': int(time.time() * 1000),
-                'mfcc_shape': list(mfcc.shape)
-            }
-            
-            return jsonify(result)
+            data = audio_io.read_upload(audio)
+            return jsonify(routes.wakeword_detect(pipe, wake_batcher, data, request.form))
         else:
             return jsonify({'error': 'No audio data'}), 400
     except Exception as e:
@@ -194,54 +203,48 @@ def accelerate():
         return handle_cors_preflight()
     
     try:
-        mfcc_json = request.form.get('mfcc', '[]')
-        if not mfcc_json or mfcc_json == '[]':
-            return jsonify({
-                'success': False,
-                'error': 'No MFCC data provided'
-            }), 400
-        
-        mfcc_data = json.loads(mfcc_json)
+        # Optional raw audio also runs the fixed-point MFCC front end
+        audio = request.files.get('audio')
+        data, file_ext = None, '.wav'
+        if audio is not None:
+            file_ext = os.path.splitext(audio.filename)[1] if audio.filename else '.wav'
+            data = audio_io.read_upload(audio)
         
-        # Validate MFCC data
-        if not isinstance(mfcc_data, list) or len(mfcc_data) == 0:
+        # Validate MFCC data (a finite, rectangular 2-D matrix) and bits
+        try:
+            mfcc, pcm, bits = routes.accelerator_inputs(pipe, data, file_ext, request.form)
+        except audio_io.DecodeError as e:
             return jsonify({
                 'success': False,
-                'error': 'Invalid MFCC data format'
-            }), 400
+                'error': 'Could not decode audio',
+                'details': str(e)
+            }), 415
+        except routes.PayloadError as e:
+            return jsonify(dict({'success': False}, **e.to_dict())), 400
         
         # Get data dimensions
-        rows = len(mfcc_data)
-        cols = len(mfcc_data[0]) if mfcc_data and len(mfcc_data) > 0 else 0
-        
-        # Simulate hardware accelerator processing
-        # In a real system, this would:
-        # - Apply quantization (reduce precision for faster hardware)
-        # - Send to FPGA/ASIC for processing
-        # - Get optimized results back
+        rows, cols = mfcc.shape
         
-        # Simulate processing time (hardware delay)
-        time.sleep(0.1)
+        # Quantize to int8/int16, run the integer detector and, with audio,
+        # the fixed-point MFCC pipeline; every stage is timed
+        start = time.perf_counter()
+        accel = fixed_point.run_accelerator(mfcc, bits=bits, pcm=pcm, sr=16000)
+        elapsed = time.perf_counter() - start
         
-        # Process MFCC through accelerator (could be quantization, optimization, etc)
         result = {
             'success': True,
             'message': 'Hardware acceleration complete',
             'input_shape': [rows, cols],
-            'processing_time': '0.1s',
-            'accelerator_status': 'FPGA simulation OK',
+            'processing_time': f'{elapsed:.4f}s',
+            'accelerator_status': f'int{bits} fixed-point emulation OK',
             'optimized': True
         }
+        result.update(accel)
         
-        print(f"✅ Accelerator processed MFCC data: {rows}x{cols}")
+        print(f"✅ Accelerator processed MFCC data: {rows}x{cols} "
+              f"(int{bits}, {elapsed * 1000:.1f} ms)")
         return jsonify(result)
         
-    except json.JSONDecodeError as e:
-        return jsonify({
-            'success': False,
-            'error': 'Invalid JSON data',
-            'details': str(e)
-        }), 400
     except Exception as e:
         print(f"❌ Accelerator error: {str(e)}")
         return jsonify({
@@ -250,25 +253,47 @@ def accelerate():
         }), 500
 
 # --- Download endpoints ---
+# Pass ?session_id=<id from /upload>; an upload is only served to whoever knows its id
 @app.route('/download_wav', methods=['GET'])
 def download_wav():
-    # Find temp file with any audio extension
-    for ext in ['.wav', '.mp3', '.m4a', '.ogg', '.flac']:
-        temp_file = f'temp{ext}'
-        if os.path.exists(temp_file):
-            return send_file(temp_file, as_attachment=True, download_name=f'audio{ext}')
-    return 'No audio file available', 404
+    session_id = request.args.get('session_id')
+    if not session_id:
+        return 'session_id is required', 400
+    artifact = artifacts.store.get(session_id)
+    if artifact is None or 'audio' not in artifact:
+        return 'No audio file available', 404
+    ext = artifact['ext'] or '.wav'
+    return send_file(io.BytesIO(artifact['audio']), as_attachment=True, download_name=f'audio{ext}')
 
 @app.route('/download_mfcc', methods=['GET'])
 def download_mfcc():
-    mfcc = np.loadtxt('temp.mfcc', delimiter=',') if os.path.exists('temp.mfcc') else None
+    # Read from the feature store by id (?id= or ?session_id=); memory-mapped, not loaded
+    feature_id = request.args.get('id') or request.args.get('session_id')
+    if not feature_id:
+        return 'id or session_id is required', 400
+    mfcc = feature_store.store.get(feature_id)
     if mfcc is None:
         return 'No MFCC available', 404
+    if request.args.get('mfcc_format') == 'npy':
+        buf = io.BytesIO()
+        np.save(buf, mfcc)
+        buf.seek(0)
+        return send_file(buf, as_attachment=True, download_name='mfcc.npy',
+                         mimetype='application/x-npy')
     buf = io.StringIO()
     np.savetxt(buf, mfcc, delimiter=',')
     buf.seek(0)
     return send_file(io.BytesIO(buf.read().encode()), as_attachment=True, download_name='mfcc.csv', mimetype='text/csv')
 
+# Stored utterances, newest first (?limit=50&offset=0); index only, no MFCC data
+@app.route('/features', methods=['GET'])
+def list_features():
+    limit = min(request.args.get('limit', 50, type=int), 1000)
+    offset = request.args.get('offset', 0, type=int)
+    return jsonify({'total': len(feature_store.store),
+                    'features': feature_store.store.recent(limit, offset)})
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    startup.start(pipe)
     app.run(host='0.0.0.0', port=port, debug=True)
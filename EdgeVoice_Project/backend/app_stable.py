@@ -3,13 +3,16 @@ EdgeVoice Backend Server with Enhanced Error Handling
 Permanent solution with CORS, error recovery, and health checks
 """
 
-from flask import Flask, request, jsonify, send_file, make_response
+from flask import Flask, request, jsonify, abort, send_file, make_response
 from flask_cors import CORS
+import startup  # first, so its clock covers the imports below
 import os
 import time
 import traceback
 import logging
-import json
+import uuid
+import metrics
+import profiling
 
 # Configure logging
 logging.basicConfig(
@@ -19,26 +22,68 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": "*"}})
+# Request counts/latency/payload sizes per route and GET /metrics (first, so every request is seen)
+metrics.instrument(app)
+# Per-request cProfile/stack sampling and /debug/profiles, only with EDGEVOICE_PROFILING=1
+profiling.register(app)
+# Reject oversized uploads before they are buffered (413)
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.environ.get('EDGEVOICE_MAX_UPLOAD_MB', 32))
+                                        * 1024 * 1024)
+CORS(app, resources={r"/*": {"origins": "*"}},
+     expose_headers=['X-MFCC-Shape', 'X-MFCC-Dtype', 'X-MFCC-Compression', 'X-EdgeVoice-Meta',
+                     'X-EdgeVoice-Profile-Id'])
 
 try:
-    import librosa
     import numpy as np
-    from command_detect import detect_command
+    import streaming
+    import audio_io
+    import serialization
+    import artifacts
+    import fixed_point
+    import feature_store
+    import result_cache
+    import ws_stream
+    import pipeline
+    import batcher
+    import long_audio
+    import jobs
+    import routes
     import io
     logger.info("All dependencies loaded successfully")
 except ImportError as e:
     logger.error(f"Missing dependency: {e}")
     logger.error("Run: pip install librosa numpy flask flask-cors")
 
+# Decode -> MFCC -> stats -> detect, built once
+# (detector from EDGEVOICE_DETECTOR / EDGEVOICE_MODEL_PATH)
+pipe = pipeline.default
+# Concurrent one-shot /wakeword_detect chunks share one stacked MFCC + detector pass
+wake_batcher = batcher.MicroBatcher(pipe)
+startup.mark('imports')
+# GET /ready: 503 until the warm-up pass (startup.py, EDGEVOICE_WARMUP) has run
+startup.register(app, pipe)
+# POST /upload_long: block-by-block decode/MFCC/detection for long recordings, flat memory
+long_audio.register(app, pipe)
+# /jobs/<id>, /jobs/<id>/events (SSE progress) and /jobs/<id>/result for /upload?async=1
+jobs.register(app)
+
+# Persistent PCM stream for the wakeword page (ws://.../ws/wakeword, needs flask-sock)
+if not ws_stream.register(app, pipe):
+    logger.warning("flask-sock not installed, /ws/wakeword disabled")
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint to verify server is running"""
+    """Health check endpoint to verify server is running, with current load"""
     return jsonify({
         'status': 'healthy',
         'timestamp': int(time.time() * 1000),
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'pid': os.getpid(),
+        'load': metrics.snapshot(),
+        'cache': result_cache.cache.stats(),
+        'stream_sessions': len(streaming.mfcc_sessions) + len(streaming.wakeword_sessions),
+        'startup': startup.report()
     }), 200
 
 @app.route('/', methods=['GET'])
@@ -49,7 +94,12 @@ def index():
         'version': '1.0.0',
         'endpoints': {
             '/health': 'GET - Health check',
+            '/ready': 'GET - Readiness (503 until warmed up)',
             '/upload': 'POST - Upload audio for MFCC extraction',
+            '/jobs/<id>': ('GET - Status of an /upload?async=1 job '
+                           '(/events: SSE progress, /result: the upload result)'),
+            '/upload_long': ('POST - Long recordings: block-by-block stats and detections '
+                             '(flat memory)'),
             '/stream_mfcc': 'POST - Stream audio chunks for real-time MFCC',
             '/wakeword_detect': 'POST - Wake word detection',
             '/download_wav': 'GET - Download processed audio',
@@ -78,67 +128,43 @@ def upload():
         if audio.filename == '':
             return jsonify({'error': 'Empty filename'}), 400
         
+        try:
+            fmt, compression = serialization.negotiate(request)
+        except serialization.FormatError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Get original filename and extension
         original_filename = audio.filename
         file_ext = os.path.splitext(original_filename)[1] if original_filename else '.wav'
-        temp_filename = f'temp{file_ext}'
+        session_id = request.form.get('session_id') or uuid.uuid4().hex
         
-        # Save audio file
-        audio.save(temp_filename)
+        # Read the upload without touching disk
+        data = audio_io.read_upload(audio)
         logger.info(f"Received audio file: {original_filename} ({file_ext})")
         
-        # Load and process audio (surface decoder errors instead of 500)
+        # ?async=1: queue the work and answer at once; follow it at /jobs/<id>/events
+        if request.args.get('async') == '1' or request.form.get('async') == '1':
+            try:
+                job = jobs.submit(routes.run_upload, pipe, bytes(data), file_ext, original_filename,
+                                  session_id, envelope={'success': True}, kind='upload')
+            except jobs.QueueFull as e:
+                logger.warning(f"Job queue full: {e}")
+                return jobs.busy_response(e)
+            logger.info(f"Upload queued as job {job.id}")
+            return jsonify(jobs.status(job.state)), 202, {'Location': f'/jobs/{job.id}'}
+
         try:
-            y, sr = librosa.load(temp_filename, sr=16000)
-        except Exception as e:
-            logger.error(f"Audio decode failed for {original_filename}: {e}")
+            result, mfcc = routes.run_upload(pipe, data, file_ext, original_filename, session_id,
+                                             envelope={'success': True})
+        except audio_io.DecodeError as e:
             return jsonify({
                 'success': False,
                 'error': 'Could not decode audio. For MP3/OGG please install FFmpeg and ensure it is on PATH, or upload a WAV file.',
                 'details': str(e)
             }), 415
-        logger.info(f"Loaded audio: {len(y)} samples at {sr} Hz")
-        
-        # Extract MFCC features
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        logger.info(f"MFCC extracted: shape {mfcc.shape}")
-        
-        # Calculate statistics
-        stats = {
-            'mean': np.mean(mfcc, axis=1).round(3).tolist(),
-            'std': np.std(mfcc, axis=1).round(3).tolist(),
-            'energy': float(np.sum(y ** 2) / len(y)),
-            'duration': round(len(y) / sr, 2)
-        }
-        
-        # Wake word detection (optional)
-        wake_word = None
-        wake_range = None
-        confidence = None
         
-        try:
-            wake_word, wake_range = detect_command(mfcc)
-            if wake_word:
-                confidence = 95.0  # Simplified confidence
-                logger.info(f"Wake word detected: {wake_word}")
-        except Exception as e:
-            logger.warning(f"Wake word detection failed: {e}")
-        
-        # Prepare response (convert numpy types to native Python for JSON serialization)
-        result = {
-            'success': True,
-            'mfcc': mfcc.tolist(),
-            'shape': [int(x) for x in mfcc.shape],
-            'stats': stats,
-            'wake_word': bool(wake_word),
-            'wake_range': [int(x) for x in wake_range] if wake_range else None,
-            'confidence': float(confidence) if confidence else None,
-            'timestamp': int((wake_range[0] / mfcc.shape[1]) * stats['duration'] * 1000) if wake_range else None,
-            'keyword': wake_word
-        }
-        
-        logger.info("MFCC extraction successful")
-        return jsonify(result), 200
+        logger.info(f"MFCC extracted: shape {mfcc.shape}, wake word: {result['keyword']}")
+        return serialization.mfcc_response(result, mfcc, fmt, compression), 200
         
     except Exception as e:
         error_msg = str(e)
@@ -150,6 +176,13 @@ def upload():
             'error_type': type(e).__name__
         }), 500
 
+metrics.add_collector(metrics.cache_collector(result_cache.cache))
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Result cache hit/miss counters (for sizing EDGEVOICE_CACHE_MB)"""
+    return jsonify(result_cache.cache.stats()), 200
+
 @app.route('/stream_mfcc', methods=['POST', 'OPTIONS'])
 def stream_mfcc():
     """Stream audio chunks for real-time MFCC extraction"""
@@ -161,22 +194,15 @@ def stream_mfcc():
             return jsonify({'error': 'No audio chunk provided'}), 400
         
         audio = request.files['audio']
-        y, sr = librosa.load(audio, sr=16000)
-        mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        
-        stats = {
-            'mean': np.mean(mfcc, axis=1).round(3).tolist(),
-            'std': np.std(mfcc, axis=1).round(3).tolist(),
-            'energy': float(np.sum(y ** 2) / len(y)),
-            'duration': round(len(y) / sr, 2)
-        }
-        
-        return jsonify({
-            'success': True,
-            'mfcc': mfcc.tolist(),
-            'shape': list(mfcc.shape),
-            'stats': stats
-        }), 200
+        fmt, compression = serialization.negotiate(request)
+        file_ext = os.path.splitext(audio.filename or '')[1]
+        # Carry frame overlap across chunks of the same session
+        result, mfcc = routes.stream_mfcc(pipe, audio_io.read_upload(audio), file_ext, request.form)
+        result = dict({'success': True}, **result)
+        return serialization.mfcc_response(result, mfcc, fmt, compression), 200
+    
+    except serialization.FormatError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
         
     except Exception as e:
         logger.error(f"Stream MFCC error: {e}")
@@ -193,29 +219,10 @@ def wakeword_detect():
     
     try:
         audio = request.files.get('audio')
-        wake_word = request.form.get('wakeWord', 'hey assistant')
-        confidence = float(request.form.get('confidence', 0))
-        
         if audio:
-            temp_filename = 'wakeword_temp.wav'
-            audio.save(temp_filename)
-            
-            y, sr = librosa.load(temp_filename, sr=16000)
-            mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-            
-            detected_word, wake_range = detect_command(mfcc)
-            
-            result = {
-                'success': True,
-                'detected': bool(detected_word),
-                'wake_word': wake_word,
-                'detected_word': detected_word,
-                'confidence': confidence,
-                'timestamp': int(time.time() * 1000),
-                'mfcc_shape': list(mfcc.shape)
-            }
-            
-            return jsonify(result), 200
+            data = audio_io.read_upload(audio)
+            result = routes.wakeword_detect(pipe, wake_batcher, data, request.form)
+            return jsonify(dict({'success': True}, **result)), 200
         else:
             return jsonify({'error': 'No audio data'}), 400
             
@@ -234,43 +241,76 @@ def accelerate():
         return response
     
     try:
-        mfcc_json = request.form.get('mfcc', '[]')
-        mfcc_data = json.loads(mfcc_json)
+        # Optional raw audio also runs the fixed-point MFCC front end
+        audio = request.files.get('audio')
+        data, file_ext = None, '.wav'
+        if audio is not None:
+            file_ext = os.path.splitext(audio.filename)[1] if audio.filename else '.wav'
+            data = audio_io.read_upload(audio)
+        try:
+            mfcc, pcm, bits = routes.accelerator_inputs(pipe, data, file_ext, request.form)
+        except audio_io.DecodeError as e:
+            logger.warning(f"Accelerate: could not decode audio: {e}")
+            return jsonify({'success': False, 'error': 'Could not decode audio',
+                            'details': str(e)}), 415
+        except routes.PayloadError as e:
+            return jsonify(dict({'success': False}, **e.to_dict())), 400
+
+        logger.info(f"Accelerating MFCC data with shape: {mfcc.shape[0]} x {mfcc.shape[1]} "
+                    f"(int{bits})")
         
-        logger.info(f"Accelerating MFCC data with shape: {len(mfcc_data)} x {len(mfcc_data[0]) if mfcc_data else 0}")
+        # Quantize, run the integer detector and, with audio, the fixed-point MFCC pipeline
+        start = time.perf_counter()
+        accel = fixed_point.run_accelerator(mfcc, bits=bits, pcm=pcm, sr=16000)
+        elapsed = time.perf_counter() - start
         
-        # Process MFCC through accelerator (could be quantization, optimization, etc)
         result = {
             'success': True,
             'message': 'MFCC accelerated successfully',
-            'data_shape': (len(mfcc_data), len(mfcc_data[0]) if mfcc_data else 0)
+            'data_shape': list(mfcc.shape),
+            'processing_time': f'{elapsed:.4f}s'
         }
+        result.update(accel)
         return jsonify(result)
     except Exception as e:
         logger.error(f"Accelerate error: {e}")
-        return jsonify({'error': str(e)}), 400
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/download_wav', methods=['GET'])
 def download_wav():
-    """Download the most recent audio file"""
+    """Download the audio of an upload (?session_id=... from /upload, required)"""
     try:
-        for ext in ['.wav', '.mp3', '.m4a', '.ogg', '.flac']:
-            temp_file = f'temp{ext}'
-            if os.path.exists(temp_file):
-                return send_file(temp_file, as_attachment=True, download_name=f'audio{ext}')
-        return jsonify({'error': 'No audio file available'}), 404
+        session_id = request.args.get('session_id')
+        if not session_id:
+            return jsonify({'error': 'session_id is required'}), 400
+        artifact = artifacts.store.get(session_id)
+        if artifact is None or 'audio' not in artifact:
+            return jsonify({'error': 'No audio file available'}), 404
+        ext = artifact['ext'] or '.wav'
+        return send_file(io.BytesIO(artifact['audio']), as_attachment=True,
+                         download_name=f'audio{ext}')
     except Exception as e:
         logger.error(f"Download WAV error: {e}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/download_mfcc', methods=['GET'])
 def download_mfcc():
-    """Download MFCC data as CSV"""
+    """Download stored MFCC as CSV or .npy (?id= or ?session_id=, required; ?mfcc_format=npy)"""
     try:
-        mfcc = np.loadtxt('temp.mfcc', delimiter=',') if os.path.exists('temp.mfcc') else None
+        feature_id = request.args.get('id') or request.args.get('session_id')
+        if not feature_id:
+            return jsonify({'error': 'id or session_id is required'}), 400
+        mfcc = feature_store.store.get(feature_id)
         if mfcc is None:
             return jsonify({'error': 'No MFCC data available'}), 404
         
+        if request.args.get('mfcc_format') == 'npy':
+            buf = io.BytesIO()
+            np.save(buf, mfcc)
+            buf.seek(0)
+            return send_file(buf, as_attachment=True, download_name='mfcc.npy',
+                             mimetype='application/x-npy')
+        
         buf = io.StringIO()
         np.savetxt(buf, mfcc, delimiter=',')
         buf.seek(0)
@@ -285,11 +325,35 @@ def download_mfcc():
         logger.error(f"Download MFCC error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/features', methods=['GET'])
+def list_features():
+    """Stored utterances, newest first (?limit=50&offset=0)"""
+    try:
+        limit = min(request.args.get('limit', 50, type=int), 1000)
+        offset = request.args.get('offset', 0, type=int)
+        return jsonify({'total': len(feature_store.store),
+                        'features': feature_store.store.recent(limit, offset)})
+    except Exception as e:
+        logger.error(f"Feature listing error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.errorhandler(404)
 def not_found(e):
     """Handle 404 errors"""
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.before_request
+def reject_oversized_upload():
+    # Checked up front so views that catch Exception never see the 413
+    if request.content_length is not None and request.content_length > request.max_content_length:
+        abort(413)
+
+@app.errorhandler(413)
+def too_large(e):
+    """Handle uploads over MAX_CONTENT_LENGTH"""
+    limit_mb = request.max_content_length / (1024 * 1024)
+    return jsonify({'error': f'Upload too large (limit {limit_mb:g} MB)'}), 413
+
 @app.errorhandler(500)
 def internal_error(e):
     """Handle 500 errors"""
@@ -305,6 +369,7 @@ if __name__ == '__main__':
     logger.info("=" * 50)
     
     try:
+        startup.start(pipe)
         app.run(
             host='0.0.0.0',
             port=5000,
@@ -0,0 +1,60 @@
+"""
+Per-session store for the uploaded audio that /download_wav serves.
+
+Replaces the shared temp{ext} / temp.mfcc files: every upload is kept under
+its own session id, so concurrent clients no longer overwrite each other,
+and an upload is only served to a client that asks for its session id.
+The store is bounded by the total bytes of audio it holds
+(EDGEVOICE_ARTIFACT_MB, default 64), oldest sessions evicted first, with
+MAX_ARTIFACTS as a cap on the count; an upload larger than the whole
+budget is not kept. The MFCC of each upload goes to the persistent
+feature_store instead.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ARTIFACTS = 32
+MAX_BYTES = int(float(os.environ.get('EDGEVOICE_ARTIFACT_MB', 64)) * 1024 * 1024)
+
+
+def _size(artifact):
+    return len(artifact.get('audio') or b'')
+
+
+class ArtifactStore:
+    """Thread-safe map of session id -> {'audio', 'ext'}, bounded by bytes and count."""
+
+    def __init__(self, max_items=MAX_ARTIFACTS, max_bytes=MAX_BYTES):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, session_id, **fields):
+        with self._lock:
+            artifact = self._items.pop(session_id, {})
+            self.nbytes -= _size(artifact)
+            artifact.update(fields)
+            if _size(artifact) > self.max_bytes:
+                return
+            self._items[session_id] = artifact
+            self.nbytes += _size(artifact)
+            while len(self._items) > self.max_items or self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= _size(evicted)
+
+    def get(self, session_id):
+        """Artifact for session_id, or None (also when no id is given)."""
+        if not session_id:
+            return None
+        with self._lock:
+            return self._items.get(session_id)
+
+    def __len__(self):
+        return len(self._items)
+
+
+store = ArtifactStore()
@@ -0,0 +1,34 @@
+"""
+ASGI entry point for the EdgeVoice backend.
+
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+    uvicorn --app-dir EdgeVoice_Project/backend asgi:app --workers 1
+
+Connections are handled by the event loop, so many idle or slow-uploading
+/stream_mfcc and /wakeword_detect clients do not each hold a thread; the
+Flask views run in asgiref's thread pool (ASGI_THREADS, default 8 per worker).
+
+Keep one worker, as gunicorn.conf.py does: streaming sessions, artifacts,
+the result cache and jobs live in the worker process, so with several
+workers a session's next chunk or a /jobs poll can land on a worker that
+has never seen it. Scale out with more processes only behind sticky
+routing (see gunicorn.conf.py).
+
+Optional: asgiref and uvicorn are not in requirements.txt, install them
+for this entry point only:
+
+    pip install asgiref uvicorn
+
+Only HTTP is wrapped. The flask-sock WebSocket /ws/wakeword needs a real
+socket from gunicorn's gthread workers and does not work under asgi:app;
+run wsgi:app for it.
+"""
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:  # optional dependency
+    raise ImportError('asgi.py needs asgiref and uvicorn: pip install asgiref uvicorn') from e
+
+from wsgi import app as wsgi_app
+
+app = WsgiToAsgi(wsgi_app)
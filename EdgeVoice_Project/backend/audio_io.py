@@ -0,0 +1,344 @@
+"""
+In-memory audio decoding for uploaded files.
+
+PCM WAV and headerless PCM are parsed straight out of the request buffer
+with np.frombuffer (no temp file, no intermediate copy). Compressed
+formats libsndfile understands (FLAC, OGG, recent MP3) are decoded from
+memory as well; only formats that need FFmpeg (M4A, WebM, ...) are spilled
+to a per-request temporary file, so concurrent requests never share a path.
+
+librosa (and numba through it) and scipy.signal are imported on first use:
+WAV/PCM uploads resampled by soxr never need them, which keeps the app's
+import time short (see startup.py for the warm-up that loads them early).
+"""
+
+import functools
+import io
+import math
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+import metrics
+
+try:
+    import soxr
+except ImportError:  # librosa < 0.10 does not pull soxr in
+    soxr = None
+
+# Resampling quality/speed trade-off, selectable per call or via the environment
+RESAMPLE_MODES = ('fast', 'balanced', 'hq')
+DEFAULT_RESAMPLE_MODE = os.environ.get('EDGEVOICE_RESAMPLE_MODE', 'balanced')
+
+# soxr recipe per mode ('HQ' is what librosa.load uses by default)
+_SOXR_QUALITY = {'fast': 'QQ', 'balanced': 'LQ', 'hq': 'HQ'}
+
+# Without soxr: half filter length (in multiples of the larger rate factor)
+# and Kaiser beta of the polyphase FIR
+_POLYPHASE_DESIGN = {
+    'fast': (4, 5.0),
+    'balanced': (10, 5.0),
+    'hq': (24, 8.6),
+}
+
+# Headerless uploads: form field 'format' names the sample encoding
+RAW_FORMATS = {
+    'pcm_s16le': np.dtype('<i2'),
+    'pcm_f32le': np.dtype('<f4'),
+}
+
+# Native-rate audio per block when decoding long files block by block
+BLOCK_SECONDS = 10.0
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class DecodeError(ValueError):
+    """Raised when an upload cannot be decoded into samples."""
+
+    status_code = 415
+
+
+def read_upload(file_storage):
+    """Return the upload's bytes, as a zero-copy view when Werkzeug buffered it in memory."""
+    stream = file_storage.stream
+    stream.seek(0)
+    if hasattr(stream, 'getbuffer'):
+        return stream.getbuffer()
+    return stream.read()
+
+
+def _wav_dtype(audio_format, bits):
+    """Sample dtype of a WAV fmt chunk, or None for encodings the parsers do not handle."""
+    if audio_format == _WAVE_FORMAT_PCM:
+        return {8: np.dtype('u1'), 16: np.dtype('<i2'), 32: np.dtype('<i4')}.get(bits)
+    if audio_format == _WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        return np.dtype('<f4')
+    return None
+
+
+def parse_wav(data):
+    """
+    Locate the sample data of a RIFF/WAVE buffer.
+
+    Returns (samples, sr, channels) where samples is a read-only view into
+    data, or None if data is not a PCM/float WAV this parser handles.
+    """
+    if len(data) < 12 or bytes(data[0:4]) != b'RIFF' or bytes(data[8:12]) != b'WAVE':
+        return None
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset:offset + 4])
+        chunk_size = struct.unpack_from('<I', data, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            audio_format, channels, sr = struct.unpack_from('<HHI', data, body)
+            bits = struct.unpack_from('<H', data, body + 14)[0]
+            if audio_format == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                audio_format = struct.unpack_from('<H', data, body + 24)[0]
+            fmt = (audio_format, channels, sr, bits)
+        elif chunk_id == b'data' and fmt is not None:
+            audio_format, channels, sr, bits = fmt
+            dtype = _wav_dtype(audio_format, bits)
+            if dtype is None:
+                return None
+            # Streaming writers leave the size as 0 or 0xFFFFFFFF; use what is there
+            available = len(data) - body
+            size = chunk_size if 0 < chunk_size <= available else available
+            count = size // (dtype.itemsize * channels) * channels
+            samples = np.frombuffer(data, dtype=dtype, count=count, offset=body)
+            return samples, sr, channels
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def pcm_to_float(samples, channels=1):
+    """Scale integer PCM to [-1, 1) float32 and mix down to mono, like librosa.load."""
+    if samples.dtype == np.uint8:
+        y = np.subtract(samples, 128, dtype=np.float32)
+        y *= 1.0 / 128
+    elif samples.dtype.kind == 'i':
+        y = np.multiply(samples, 1.0 / (1 << (8 * samples.dtype.itemsize - 1)), dtype=np.float32)
+    else:
+        y = samples.astype(np.float32, copy=False)
+    if channels > 1:
+        y = y.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    return y
+
+
+@functools.lru_cache(maxsize=8)
+def _polyphase_filter(up, down, mode):
+    """Anti-aliasing FIR for an up/down ratio, designed once per ratio and mode."""
+    import scipy.signal
+    half_len, beta = _POLYPHASE_DESIGN[mode]
+    max_rate = max(up, down)
+    taps = scipy.signal.firwin(2 * half_len * max_rate + 1, 1.0 / max_rate,
+                               window=('kaiser', beta))
+    taps.setflags(write=False)
+    return taps
+
+
+def resample(y, orig_sr, target_sr, mode=None):
+    """Resample mono float32 audio; a no-op when the rates already match."""
+    if orig_sr == target_sr:
+        return y
+    mode = mode or DEFAULT_RESAMPLE_MODE
+    if mode not in RESAMPLE_MODES:
+        raise ValueError(f'Unknown resample mode: {mode}')
+    with metrics.stage('resample'):
+        if soxr is not None:
+            # Called directly: librosa.resample adds validation and copies on top of the same call
+            y = soxr.resample(y, orig_sr, target_sr, quality=_SOXR_QUALITY[mode])
+            return y.astype(np.float32, copy=False)
+        import scipy.signal
+        # 48k -> 16k is 1/3, 44.1k -> 16k is 160/441
+        g = math.gcd(int(orig_sr), int(target_sr))
+        up, down = int(target_sr) // g, int(orig_sr) // g
+        out = scipy.signal.resample_poly(y, up, down, window=_polyphase_filter(up, down, mode))
+        return out.astype(np.float32, copy=False)
+
+
+class StreamResampler:
+    """
+    Resample a continuous stream chunk by chunk (WebSocket microphones).
+
+    soxr keeps its filter state between chunks, so the output has no seams;
+    without soxr each chunk is resampled on its own.
+    """
+
+    def __init__(self, orig_sr, target_sr, mode=None):
+        mode = mode or DEFAULT_RESAMPLE_MODE
+        if mode not in RESAMPLE_MODES:
+            raise ValueError(f'Unknown resample mode: {mode}')
+        self.orig_sr, self.target_sr, self.mode = orig_sr, target_sr, mode
+        self._stream = None
+        if orig_sr != target_sr and soxr is not None:
+            self._stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype='float32',
+                                               quality=_SOXR_QUALITY[mode])
+
+    def push(self, y, last=False):
+        if self._stream is not None:
+            return self._stream.resample_chunk(y, last=last)
+        return resample(y, self.orig_sr, self.target_sr, self.mode)
+
+
+def _read_exactly(stream, n):
+    """Read up to n bytes from a file object that may return short reads (sockets, pipes)."""
+    parts = []
+    while n > 0:
+        part = stream.read(n)
+        if not part:
+            break
+        parts.append(part)
+        n -= len(part)
+    return b''.join(parts)
+
+
+def _wav_stream_header(stream):
+    """
+    Read a WAV header from a file object, stopping at the start of the
+    samples; returns (dtype, sr, channels, data_size) or None. Only read()
+    is used, so non-seekable request streams work too.
+    """
+    head = _read_exactly(stream, 12)
+    if len(head) < 12 or head[0:4] != b'RIFF' or head[8:12] != b'WAVE':
+        return None
+    fmt = None
+    while True:
+        header = _read_exactly(stream, 8)
+        if len(header) < 8:
+            return None
+        chunk_id, chunk_size = header[:4], struct.unpack('<I', header[4:])[0]
+        if chunk_id == b'data':
+            if fmt is None:
+                return None
+            audio_format, channels, sr, bits = fmt
+            dtype = _wav_dtype(audio_format, bits)
+            return None if dtype is None else (dtype, sr, channels, chunk_size)
+        body = _read_exactly(stream, chunk_size + (chunk_size & 1))
+        if chunk_id == b'fmt ' and len(body) >= 16:
+            audio_format, channels, sr = struct.unpack_from('<HHI', body, 0)
+            bits = struct.unpack_from('<H', body, 14)[0]
+            if audio_format == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                audio_format = struct.unpack_from('<H', body, 24)[0]
+            fmt = (audio_format, channels, sr, bits)
+
+
+def _native_blocks(stream, ext, block_seconds):
+    """(native_sr, iterator of mono float32 blocks at native_sr) for a file object."""
+    start = stream.tell() if stream.seekable() else None
+    header = _wav_stream_header(stream)
+    if header is not None:
+        dtype, sr, channels, size = header
+        # Streaming writers leave the size as 0 or 0xFFFFFFFF: read to the end instead
+        remaining = size if 0 < size < 0xFFFFFFFF else None
+        frame_bytes = dtype.itemsize * channels
+
+        def wav_blocks(remaining=remaining):
+            block_bytes = max(int(block_seconds * sr), 1) * frame_bytes
+            while remaining is None or remaining > 0:
+                want = block_bytes if remaining is None else min(block_bytes, remaining)
+                data = _read_exactly(stream, want)
+                usable = len(data) - len(data) % frame_bytes
+                if not usable:
+                    return
+                if remaining is not None:
+                    remaining -= len(data)
+                samples = np.frombuffer(data, dtype=dtype, count=usable // dtype.itemsize)
+                yield pcm_to_float(samples, channels)
+        return sr, wav_blocks()
+
+    if start is None:
+        raise DecodeError('Only WAV can be streamed without a seekable upload')
+    stream.seek(start)
+    try:
+        import soundfile
+        handle = soundfile.SoundFile(stream)
+    except Exception as e:
+        # FFmpeg-only containers (M4A, WebM) have no block decoder
+        raise DecodeError(f'Cannot decode {ext or "this format"} block by block; '
+                          f'upload WAV, FLAC or OGG ({e})') from e
+
+    def sf_blocks():
+        with handle:
+            blocksize = max(int(block_seconds * handle.samplerate), 1)
+            for block in handle.blocks(blocksize=blocksize, dtype='float32', always_2d=True):
+                yield block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0]
+    return handle.samplerate, sf_blocks()
+
+
+def iter_audio_blocks(stream, ext='.wav', sr=16000, block_seconds=BLOCK_SECONDS,
+                      resample_mode=None):
+    """
+    Decode an audio file object block by block: yields mono float32 blocks
+    at sr of about block_seconds each, so memory does not grow with the
+    recording's length. WAV (16/32-bit PCM, 8-bit, float) is parsed
+    straight from the stream; FLAC/OGG/MP3 go through soundfile. Blocks
+    are resampled with one StreamResampler, so there are no seams between
+    them when soxr is installed.
+    """
+    native_sr, blocks = _native_blocks(stream, ext, block_seconds)
+    resampler = StreamResampler(native_sr, sr, resample_mode)
+    for block in blocks:
+        out = resampler.push(block)
+        if len(out):
+            yield out
+    if native_sr != sr:
+        tail = resampler.push(np.zeros(0, dtype=np.float32), last=True)
+        if len(tail):
+            yield tail
+
+
+def _load_with_librosa(data, ext):
+    """Decode formats that need libsndfile or FFmpeg at their native rate."""
+    import librosa
+    try:
+        return librosa.load(io.BytesIO(data), sr=None)
+    except Exception:
+        pass
+    # audioread/FFmpeg needs a real path; give this request its own file
+    fd, path = tempfile.mkstemp(suffix=ext or '.bin', prefix='edgevoice_')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        return librosa.load(path, sr=None)
+    finally:
+        os.remove(path)
+
+
+def decode_audio(data, ext='.wav', sr=16000, raw_format=None, raw_sr=None, raw_channels=1,
+                 resample_mode=None):
+    """
+    Decode an upload held in memory to mono float32 samples at sr.
+
+    The native rate and channel count come from the WAV header, so 16 kHz
+    mono PCM is only scaled to float, never resampled. raw_format
+    ('pcm_s16le' or 'pcm_f32le') marks a headerless buffer recorded at
+    raw_sr with raw_channels interleaved channels. resample_mode picks one
+    of RESAMPLE_MODES when the rates differ.
+    """
+    if raw_format:
+        if raw_format not in RAW_FORMATS:
+            raise DecodeError(f'Unsupported raw format: {raw_format}')
+        dtype = RAW_FORMATS[raw_format]
+        count = len(data) // (dtype.itemsize * raw_channels) * raw_channels
+        samples = np.frombuffer(data, dtype=dtype, count=count)
+        y, native_sr = pcm_to_float(samples, raw_channels), int(raw_sr or sr)
+    else:
+        parsed = parse_wav(data)
+        if parsed is not None:
+            samples, native_sr, channels = parsed
+            y = pcm_to_float(samples, channels)
+        else:
+            try:
+                y, native_sr = _load_with_librosa(data, ext)
+            except Exception as e:
+                raise DecodeError(str(e)) from e
+
+    return resample(y, native_sr, sr, resample_mode), sr
@@ -0,0 +1,163 @@
+"""
+Offline MFCC + wake-word featurization of a whole corpus.
+
+    python batch_features.py recordings/ features/ --workers 8
+    python batch_features.py manifest.txt features/ --chunksize 32
+
+The input is a directory (searched recursively for AUDIO_EXTENSIONS) or a
+manifest with one path per line (a .csv manifest uses its 'path' column).
+Files go through the shared pipeline (MFCC, stats, configured detector) in a process pool
+and written to a shard store in the output directory:
+
+    shard-00000.npy    float32 (total_frames, n_mfcc), all files' frames back to back
+    shard-00000.json   per file: path, offset, frames, keyword, wake_range, stats
+    errors.jsonl       files that failed to decode
+
+A shard's .json is written last and atomically, so it marks the shard as
+complete. Re-running the same command skips every file listed in a
+complete shard, which resumes an interrupted run; failed files are retried.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+import pipeline
+from mfcc import load_audio
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg', '.m4a', '.webm')
+SHARD_SIZE = 512
+CHUNKSIZE = 16
+
+
+def list_inputs(source):
+    """Audio paths under a directory, or listed in a manifest file."""
+    if os.path.isdir(source):
+        paths = []
+        for root, _dirs, files in os.walk(source):
+            paths.extend(os.path.join(root, f) for f in files
+                         if f.lower().endswith(AUDIO_EXTENSIONS))
+        return sorted(paths)
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, newline='') as handle:
+        if source.lower().endswith('.csv'):
+            entries = [row['path'] for row in csv.DictReader(handle)]
+        else:
+            entries = [line.strip() for line in handle if line.strip() and not line.startswith('#')]
+    return [p if os.path.isabs(p) else os.path.join(base, p) for p in entries]
+
+
+def featurize(path):
+    """Worker: (path, mfcc, record) on success, (path, None, error message) on failure."""
+    try:
+        result = pipeline.default.process(load_audio(path))
+    except Exception as e:
+        return path, None, f'{type(e).__name__}: {e}'
+    mfcc = result['mfcc']
+    record = {
+        'path': path,
+        'frames': int(mfcc.shape[1]),
+        'keyword': result['keyword'],
+        'wake_range': result['wake_range'],
+        'stats': result['stats']
+    }
+    return path, mfcc.astype(np.float32), record
+
+
+def _shard_paths(out_dir, index):
+    stem = os.path.join(out_dir, f'shard-{index:05d}')
+    return stem + '.npy', stem + '.json'
+
+
+def completed_shards(out_dir):
+    """{shard index: records} for every shard whose .json was written."""
+    shards = {}
+    for meta_path in glob.glob(os.path.join(out_dir, 'shard-*.json')):
+        index = int(os.path.basename(meta_path)[6:11])
+        with open(meta_path) as handle:
+            shards[index] = json.load(handle)['files']
+    return shards
+
+
+def write_shard(out_dir, index, items):
+    """Write (mfcc, record) pairs as one shard; the .json rename commits it."""
+    npy_path, meta_path = _shard_paths(out_dir, index)
+    offset = 0
+    records = []
+    for mfcc, record in items:
+        records.append(dict(record, offset=offset))
+        offset += mfcc.shape[1]
+    if items:
+        frames = np.concatenate([m.T for m, _ in items], axis=0)
+    else:
+        frames = np.zeros((0, 0), np.float32)
+
+    with open(npy_path + '.tmp', 'wb') as handle:
+        np.save(handle, np.ascontiguousarray(frames, dtype=np.float32))
+    os.replace(npy_path + '.tmp', npy_path)
+    with open(meta_path + '.tmp', 'w') as handle:
+        json.dump({'n_mfcc': int(frames.shape[1]), 'frames': int(frames.shape[0]),
+                   'files': records}, handle)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def run(source, out_dir, workers=None, chunksize=CHUNKSIZE, shard_size=SHARD_SIZE):
+    os.makedirs(out_dir, exist_ok=True)
+    paths = list_inputs(source)
+    shards = completed_shards(out_dir)
+    done = {record['path'] for records in shards.values() for record in records}
+    todo = [p for p in paths if p not in done]
+    next_index = max(shards, default=-1) + 1
+    print(f"📂 {len(paths)} files, {len(paths) - len(todo)} already featurized, "
+          f"{len(todo)} to go")
+    if not todo:
+        return 0
+
+    start = time.time()
+    buffer, processed, failed = [], 0, 0
+    with multiprocessing.Pool(workers) as pool, \
+            open(os.path.join(out_dir, 'errors.jsonl'), 'a') as errors:
+        for path, mfcc, record in pool.imap_unordered(featurize, todo, chunksize=chunksize):
+            processed += 1
+            if mfcc is None:
+                failed += 1
+                errors.write(json.dumps({'path': path, 'error': record}) + '\n')
+                errors.flush()
+            else:
+                buffer.append((mfcc, record))
+            if len(buffer) >= shard_size:
+                write_shard(out_dir, next_index, buffer)
+                print(f"💾 shard {next_index}: {len(buffer)} files "
+                      f"({processed}/{len(todo)}, {processed / (time.time() - start):.1f} files/s)")
+                next_index += 1
+                buffer = []
+        if buffer:
+            write_shard(out_dir, next_index, buffer)
+            print(f"💾 shard {next_index}: {len(buffer)} files")
+
+    print(f"✅ {processed - failed} files featurized, {failed} failed "
+          f"in {time.time() - start:.1f}s")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('source', help='directory of audio files or manifest (.txt/.csv)')
+    parser.add_argument('out_dir', help='shard store directory (reused to resume)')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: CPU count)')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE,
+                        help='files per task sent to a worker')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='files per shard')
+    args = parser.parse_args(argv)
+    return run(args.source, args.out_dir, args.workers, args.chunksize, args.shard_size)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Micro-batching for concurrent one-shot wake-word requests.
+
+Requests that arrive within a few milliseconds of each other are run as
+one stacked batch: one FFT over all their frames, one mel/DCT multiply and
+one vectorized detector call, instead of a small computation per request.
+
+    batcher = MicroBatcher(pipeline.default)
+    mfcc, detection = batcher.submit(y)        # blocks until its batch is done
+
+Every request already queued when the worker picks up a batch joins it
+at once. Only while requests are actually concurrent (the previous batch
+had more than one) does the first request of a batch also wait up to
+EDGEVOICE_BATCH_WINDOW_MS (default 10) for company, so a lone request
+is dispatched immediately. A batch is cut early at EDGEVOICE_BATCH_MAX
+(default 32) requests. EDGEVOICE_BATCHING=0 runs every request inline.
+Batching pays off when requests share a worker (gunicorn gthread threads,
+the threaded dev server, the ASGI thread pool); requests that arrive
+while a batch is being computed queue up and form the next one.
+
+Batch sizes and the time requests wait in the queue are exported as
+edgevoice_batch_size and edgevoice_batch_wait_seconds.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+
+ENABLED = os.environ.get('EDGEVOICE_BATCHING', '1') != '0'
+WINDOW = float(os.environ.get('EDGEVOICE_BATCH_WINDOW_MS', 10)) / 1000
+MAX_BATCH = int(os.environ.get('EDGEVOICE_BATCH_MAX', 32))
+
+
+class MicroBatcher:
+    """Collects submit() calls for up to window seconds or max_batch items; runs them together."""
+
+    def __init__(self, pipe, window=WINDOW, max_batch=MAX_BATCH, enabled=ENABLED):
+        self.pipe = pipe
+        self.window = window
+        self.max_batch = max_batch
+        self.enabled = enabled
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_size = 0
+
+    def submit(self, y, timeout=None):
+        """(mfcc, detection) for float32 samples y at pipe.sr; detector errors are raised here."""
+        if not self.enabled:
+            mfcc = self.pipe.features(y)
+            return mfcc, self.pipe.detect(mfcc)
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((y, future, time.perf_counter()))
+        return future.result(timeout)
+
+    def _ensure_worker(self):
+        # One worker thread per process; a forked gunicorn worker starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,),
+                                 name='edgevoice-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _collect(self, pending):
+        first = pending.get()
+        batch = [first]
+        # Whatever is already waiting joins without delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(pending.get_nowait())
+            except queue.Empty:
+                break
+        # Wait for more only under concurrent load; a lone request goes at once
+        if self._last_size > 1:
+            deadline = first[2] + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        self._last_size = len(batch)
+        return batch
+
+    def _run(self, pending):
+        while True:
+            batch = self._collect(pending)
+            started = time.perf_counter()
+            metrics.record_batch(len(batch), [started - queued for _, _, queued in batch])
+            try:
+                mfccs = self.pipe.features_batch([y for y, _, _ in batch])
+                detections = self.pipe.detect_batch(mfccs)
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), mfcc, detection in zip(batch, mfccs, detections):
+                future.set_result((mfcc, detection))
@@ -0,0 +1,271 @@
+"""
+Reproducible benchmarks for the audio pipeline.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --compare bench.json     # exit 1 on a p50 or memory regression
+
+Synthetic speech-like (voiced harmonics with syllable envelope) and noise
+signals are generated from fixed seeds at several lengths and sample
+rates, then timed through:
+
+    extract_mfcc        mfcc.extract_mfcc: file -> in-memory decode -> NumPy MFCC (pipeline.default)
+    detect_command      MFCC -> keyword
+    upload              POST /upload through the Flask test client
+    wakeword_detect     POST /wakeword_detect through the Flask test client
+    serialize_<fmt>     mfcc_response as json / f32 / npy
+
+Each result has p50/p99/mean latency, throughput, real-time factor
+(seconds of audio per second of compute) where it applies, and the peak
+memory one call allocates (peak_alloc_mb). That is measured per case by
+tracemalloc in a separate, untimed call, so it does not slow the timed
+runs and is not the process high-water mark left by an earlier, larger
+case. It covers Python and NumPy allocations, not buffers native
+decoders (libsndfile, soxr, FFmpeg) keep to themselves; the process's
+overall peak RSS is in the report's meta. --compare flags p50 and
+peak_alloc_mb regressions.
+
+The result cache is disabled and the feature store points at a temporary
+directory, so every request runs the full pipeline.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LENGTHS = (1.0, 5.0, 30.0)
+SAMPLE_RATES = (16000, 44100, 48000)
+KINDS = ('speech', 'noise')
+REPEATS = 20
+WARMUP = 2
+REGRESSION_THRESHOLD = 0.10
+MEMORY_FLOOR_MB = 1.0      # smaller peak_alloc_mb increases are noise, not regressions
+
+
+def speech_like(duration, sr, seed=0):
+    """Voiced harmonics (100-180 Hz pitch, formant-weighted), ~4 Hz syllables, breath noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    pitch = 140 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sr
+    voiced = np.zeros_like(t)
+    for harmonic in range(1, 20):
+        freq = 140 * harmonic
+        weight = sum(np.exp(-((freq - f) / 150.0) ** 2) for f in (700, 1200, 2600)) + 0.05
+        voiced += weight / harmonic * np.sin(harmonic * phase)
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)), 0, None) ** 2
+    gaps = np.repeat(rng.random(int(duration * 2) + 1) > 0.3, int(sr / 2) + 1)[:len(t)]
+    y = voiced * syllables * gaps + 0.01 * rng.standard_normal(len(t))
+    return (0.3 * y / np.max(np.abs(y))).astype(np.float32)
+
+
+def noise(duration, sr, seed=0):
+    rng = np.random.default_rng(seed)
+    return (0.05 * rng.standard_normal(int(duration * sr))).astype(np.float32)
+
+
+def to_wav(y, sr):
+    """16-bit mono WAV bytes."""
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(sr)
+        handle.writeframes((np.clip(y, -1, 1) * 32767).astype('<i2').tobytes())
+    return buf.getvalue()
+
+
+def peak_rss_mb():
+    """Process-lifetime peak RSS: the high-water mark of the whole run, not of one case."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def peak_alloc_mb(fn):
+    """Peak memory allocated during one call of fn (tracemalloc: keep it out of the timed loop)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 2)
+
+
+def measure(fn, repeats=REPEATS, warmup=WARMUP):
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def summarize(name, case, times, audio_seconds=None, memory_mb=None):
+    total = float(times.sum())
+    result = {
+        'name': name,
+        'case': case,
+        'n': int(len(times)),
+        'mean_ms': round(float(times.mean()) * 1000, 3),
+        'p50_ms': round(float(np.percentile(times, 50)) * 1000, 3),
+        'p99_ms': round(float(np.percentile(times, 99)) * 1000, 3),
+        'throughput_per_s': round(len(times) / total, 2) if total else None,
+        'realtime_factor': (round(audio_seconds * len(times) / total, 1)
+                            if audio_seconds and total else None),
+        'peak_alloc_mb': memory_mb
+    }
+    print(f"  {name:<18} {case:<22} p50 {result['p50_ms']:>9.2f} ms"
+          f"  p99 {result['p99_ms']:>9.2f} ms"
+          + (f"  {memory_mb:>7.2f} MB" if memory_mb is not None else '')
+          + (f"  x{result['realtime_factor']} realtime" if result['realtime_factor'] else ''))
+    return result
+
+
+def bench(name, case, fn, repeats=REPEATS, audio_seconds=None):
+    """Time fn, then measure one more call's peak allocation; returns the summary."""
+    times = measure(fn, repeats)
+    return summarize(name, case, times, audio_seconds, peak_alloc_mb(fn))
+
+
+def run(lengths=LENGTHS, sample_rates=SAMPLE_RATES, kinds=KINDS, repeats=REPEATS):
+    workdir = tempfile.mkdtemp(prefix='edgevoice_bench_')
+    os.environ['EDGEVOICE_FEATURE_STORE'] = os.path.join(workdir, 'features')
+
+    # Imported here so the feature store picks up the temporary directory
+    import app
+    import result_cache
+    import serialization
+    from command_detect import detect_command
+    from mfcc import extract_mfcc
+    result_cache.cache = result_cache.ResultCache(max_bytes=0, disk_dir=None)
+    client = app.app.test_client()
+
+    results = []
+    for kind in kinds:
+        make = speech_like if kind == 'speech' else noise
+        for sr in sample_rates:
+            for duration in lengths:
+                case = f'{kind}/{sr}Hz/{duration:g}s'
+                data = to_wav(make(duration, sr, seed=sr + int(duration)), sr)
+                path = os.path.join(workdir, f'{kind}_{sr}_{duration:g}.wav')
+                with open(path, 'wb') as handle:
+                    handle.write(data)
+                print(case)
+
+                mfcc, _ = extract_mfcc(path, full=True)
+                results.append(bench('extract_mfcc', case, lambda: extract_mfcc(path),
+                                     repeats, duration))
+                results.append(bench('detect_command', case, lambda: detect_command(mfcc), repeats))
+
+                def post(route, fields):
+                    fields = dict(fields, audio=(io.BytesIO(data), 'bench.wav'))
+                    # The handlers print per request
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        response = client.post(route, data=fields)
+                    assert response.status_code == 200, response.data[:200]
+                results.append(bench('upload', case, lambda: post('/upload', {}),
+                                     repeats, duration))
+                results.append(bench('wakeword_detect', case, lambda: post('/wakeword_detect', {}),
+                                     repeats, duration))
+
+                if sr == sample_rates[0]:
+                    with app.app.test_request_context():
+                        for fmt in ('json', 'f32', 'npy'):
+                            def serialize(fields={'shape': list(mfcc.shape)}):
+                                return serialization.mfcc_response(fields, mfcc, fmt).get_data()
+                            result = bench(f'serialize_{fmt}', case, serialize, repeats)
+                            result['bytes'] = len(serialize({}))
+                            results.append(result)
+    return results
+
+
+def metadata():
+    import librosa
+    import scipy
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'librosa': librosa.__version__
+    }
+
+
+def compare(results, baseline_path, threshold=REGRESSION_THRESHOLD):
+    """Print p50 and peak_alloc_mb changes against a saved run; returns the regressions."""
+    with open(baseline_path) as handle:
+        baseline = {(r['name'], r['case']): r for r in json.load(handle)['results']}
+    regressions = []
+    print(f"\nCompared with {baseline_path} (p50, peak allocation):")
+    for result in results:
+        old = baseline.get((result['name'], result['case']))
+        if not old or not old['p50_ms']:
+            continue
+        change = result['p50_ms'] / old['p50_ms'] - 1
+        flags = [' REGRESSION'] if change > threshold else []
+        line = (f"  {result['name']:<18} {result['case']:<22}"
+                f" {old['p50_ms']:>9.2f} -> {result['p50_ms']:>9.2f} ms  {change:+.1%}")
+        old_mb, new_mb = old.get('peak_alloc_mb'), result.get('peak_alloc_mb')
+        if old_mb is not None and new_mb is not None:
+            line += f"  {old_mb:>7.2f} -> {new_mb:>7.2f} MB"
+            if new_mb > old_mb * (1 + threshold) and new_mb - old_mb > MEMORY_FLOOR_MB:
+                flags.append(' MEMORY REGRESSION')
+        print(line + ''.join(flags))
+        if flags:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='p50 slowdown that counts as a regression (default 0.10)')
+    parser.add_argument('--repeats', type=int, default=REPEATS)
+    parser.add_argument('--quick', action='store_true', help='1 s and 5 s at 16/48 kHz, 5 repeats')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        results = run(lengths=(1.0, 5.0), sample_rates=(16000, 48000), repeats=min(args.repeats, 5))
+    else:
+        results = run(repeats=args.repeats)
+
+    report = {'meta': dict(metadata(), peak_rss_mb=peak_rss_mb()), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) above {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
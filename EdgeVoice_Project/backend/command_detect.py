@@ -1,6 +1,95 @@
 import os
 import numpy as np
 
+# Heuristic parameters (frames are MFCC hops, ~32 ms at 16 kHz / hop 512)
+MIN_FRAMES = 10           # shorter inputs are not scored at all
+MIN_ACTIVE_FRAMES = 8     # frames above the energy threshold needed for voice activity
+MAX_GAP = 4               # a larger gap between active frames starts a new segment
+MIN_SEGMENT, MAX_SEGMENT = 10, 150
+THRESHOLD_STDS = 1.0
+TIE_TOLERANCE = 1e-5      # relative gap to the threshold below which float rounding decides
+SPEECH_RATIO = 1.1
+N_LOWER_COEFFS = 5
+
+
+def _parse_calibration(value):
+    if not value:
+        return None
+    a, b = (float(x) for x in value.split(','))
+    return a, b
+
+
+# Platt scaling (a, b) of the heuristic's log speech ratio, from fit_platt() on
+# labeled clips: EDGEVOICE_DETECTOR_CALIBRATION="a,b". Unset: uncalibrated scores
+HEURISTIC_CALIBRATION = _parse_calibration(os.environ.get('EDGEVOICE_DETECTOR_CALIBRATION'))
+
+
+def heuristic_confidence(speech_ratio, calibration=None):
+    """
+    Confidence of a heuristic detection from its speech ratio. With Platt
+    parameters (a, b) it is sigmoid(a * log(ratio) + b), a probability
+    calibrated on the clips they were fitted to; without, 1 - SPEECH_RATIO /
+    ratio, which only ranks detections (0 at the threshold, towards 1 above).
+    """
+    if calibration is None:
+        return 1.0 - SPEECH_RATIO / speech_ratio
+    a, b = calibration
+    return float(1.0 / (1.0 + np.exp(-(a * np.log(speech_ratio) + b))))
+
+
+def fit_platt(scores, targets, iterations=100):
+    """
+    Fit Platt scaling P(target | score) = sigmoid(a * score + b) by Newton's
+    method, with Platt's smoothed targets so separable data stays finite.
+    scores and targets (0/1) are 1-D; returns (a, b).
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    targets = np.asarray(targets, dtype=bool)
+    n_pos, n_neg = targets.sum(), (~targets).sum()
+    y = np.where(targets, (n_pos + 1.0) / (n_pos + 2.0), 1.0 / (n_neg + 2.0))
+    a, b = 0.0, np.log((n_pos + 1.0) / (n_neg + 1.0))
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-(a * scores + b)))
+        w = np.maximum(p * (1.0 - p), 1e-12)
+        grad = np.array([np.sum((p - y) * scores), np.sum(p - y)])
+        hess = np.array([[np.sum(w * scores * scores), np.sum(w * scores)],
+                         [np.sum(w * scores), np.sum(w)]]) + 1e-9 * np.eye(2)
+        step = np.linalg.solve(hess, grad)
+        a, b = a - step[0], b - step[1]
+        if np.abs(step).max() < 1e-10:
+            break
+    return float(a), float(b)
+
+
+def fit_temperature(logits, targets, bounds=(0.05, 20.0), iterations=80):
+    """
+    Temperature T minimizing the negative log-likelihood of softmax(logits / T)
+    for integer class targets (temperature scaling). logits is (n, classes);
+    the NLL is unimodal in log T, so a golden-section search finds it.
+    """
+    logits = np.asarray(logits, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.int64)
+
+    def nll(log_t):
+        z = logits / np.exp(log_t)
+        z = z - z.max(axis=1, keepdims=True)
+        return float(np.mean(np.log(np.exp(z).sum(axis=1)) - z[np.arange(len(z)), targets]))
+
+    lo, hi = np.log(bounds[0]), np.log(bounds[1])
+    ratio = (np.sqrt(5.0) - 1.0) / 2.0
+    x1, x2 = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    f1, f2 = nll(x1), nll(x2)
+    for _ in range(iterations):
+        if f1 < f2:
+            hi, x2, f2 = x2, x1, f1
+            x1 = hi - ratio * (hi - lo)
+            f1 = nll(x1)
+        else:
+            lo, x1, f1 = x1, x2, f2
+            x2 = lo + ratio * (hi - lo)
+            f2 = nll(x2)
+    return float(np.exp((lo + hi) / 2.0))
+
 
 def detect_command(mfcc_matrix):
     """
@@ -8,62 +97,516 @@ def detect_command(mfcc_matrix):
     This is a DEMO implementation - it detects voice activity and basic patterns.
     For production use, train a real classifier (CNN/RNN) on labeled wake word data.
     """
-    
+
     # Check if there's data
-    if mfcc_matrix.size == 0 or mfcc_matrix.shape[1] < 10:
-        return None, None
-    
-    # Calculate energy for each frame (sum of absolute MFCC coefficients)
-    frame_energy = np.sum(np.abs(mfcc_matrix), axis=0)
-    
-    # Balanced threshold - detect speech but not overly sensitive
-    energy_mean = np.mean(frame_energy)
-    energy_std = np.std(frame_energy)
-    energy_threshold = energy_mean + 1.0 * energy_std  # Moderate threshold
-    
-    high_energy_frames = np.where(frame_energy > energy_threshold)[0]
-    
-    # Require at least some voice activity
-    if len(high_energy_frames) < 8:
+    if mfcc_matrix.size == 0 or mfcc_matrix.shape[1] < MIN_FRAMES:
         return None, None
-    
-    # Find continuous speech segments
-    segments = []
-    if len(high_energy_frames) > 0:
-        start_idx = high_energy_frames[0]
-        
-        for i in range(1, len(high_energy_frames)):
-            # If gap is more than 4 frames, it's a new segment
-            if high_energy_frames[i] - high_energy_frames[i-1] > 4:
-                segments.append((start_idx, high_energy_frames[i-1]))
-                start_idx = high_energy_frames[i]
-        
-        # Add last segment
-        segments.append((start_idx, high_energy_frames[-1]))
-    
-    if not segments:
-        return None, None
-    
-    # Find the longest segment (likely the wake word)
-    best_segment = max(segments, key=lambda x: x[1] - x[0])
-    segment_length = best_segment[1] - best_segment[0] + 1
-    
-    # Require a reasonable segment length (10-150 frames is typical speech)
-    if segment_length >= 10 and segment_length <= 150:
-        segment_mfcc = mfcc_matrix[:, best_segment[0]:best_segment[1]+1]
-        
-        # Check MFCC variance to distinguish speech from music/background noise
-        # Speech has focused energy in lower coefficients; music spreads across all
-        lower_coeff_energy = np.mean(np.abs(segment_mfcc[0:5, :]))  # First 5 coefficients
-        higher_coeff_energy = np.mean(np.abs(segment_mfcc[5:, :]))  # Rest of coefficients
-        
-        # Speech ratio: lower coefficients are significantly stronger than higher ones
-        speech_ratio = lower_coeff_energy / (higher_coeff_energy + 1e-10)
-        
-        # Speech typically has speech_ratio > 1.2 (lower coeffs dominate)
-        # Music tends to have more balanced energy across all coefficients
-        if speech_ratio > 1.1:
-            return 'light_on', best_segment
-    
-    return None, None
 
+    return detect_command_batch(mfcc_matrix[np.newaxis], [mfcc_matrix.shape[1]])[0]
+
+
+def stack_mfcc(mfcc_list):
+    """Zero-pad (n_mfcc, frames) matrices into (batch, lengths) for detect_command_batch."""
+    lengths = np.array([m.shape[1] for m in mfcc_list], dtype=np.int64)
+    n_mfcc = mfcc_list[0].shape[0] if mfcc_list else 0
+    batch = np.zeros((len(mfcc_list), n_mfcc, int(lengths.max(initial=0))), dtype=np.float32)
+    for i, m in enumerate(mfcc_list):
+        batch[i, :, :m.shape[1]] = m
+    return batch, lengths
+
+
+def detect_command_batch(mfcc_batch, lengths=None):
+    """
+    Run detect_command over a stacked batch in one vectorized pass.
+
+    mfcc_batch is (batch, n_mfcc, max_frames), zero-padded past each item's
+    length; lengths gives the valid frame count per item (default: all
+    frames). Returns a list of (keyword, (start, end)) / (None, None), one
+    per item, the same as calling detect_command on each item.
+    """
+    return [(keyword, wake_range) for keyword, wake_range, _ in _detect_batch(mfcc_batch, lengths)]
+
+
+def _detect_batch(mfcc_batch, lengths=None):
+    """detect_command_batch that also returns each detection's speech ratio."""
+    mfcc_batch = np.asarray(mfcc_batch)
+    batch, n_mfcc, max_frames = mfcc_batch.shape
+    lengths = np.full(batch, max_frames) if lengths is None else np.asarray(lengths, dtype=np.int64)
+    results = [(None, None, None)] * batch
+    if batch == 0 or max_frames == 0:
+        return results
+
+    valid = np.arange(max_frames) < lengths[:, None]
+    abs_mfcc = np.abs(mfcc_batch)
+
+    # Per-frame energy and the adaptive threshold over each item's valid frames
+    frame_energy = np.sum(abs_mfcc, axis=1)
+    frame_energy[~valid] = 0
+    counts = np.maximum(lengths, 1)
+    energy_mean = np.sum(frame_energy, axis=1) / counts
+    deviation = np.where(valid, frame_energy - energy_mean[:, None], 0)
+    energy_std = np.sqrt(np.sum(deviation * deviation, axis=1) / counts)
+    threshold = energy_mean + THRESHOLD_STDS * energy_std
+    # A frame within rounding distance of its threshold could go either way; redo those
+    # (rare) items with np.mean / np.std in the energies' dtype, exactly as one item would
+    gap = np.abs(frame_energy - threshold[:, None])
+    near = np.any(valid & (gap <= TIE_TOLERANCE * np.abs(threshold[:, None])), axis=1)
+    for item in np.flatnonzero(near):
+        energies = frame_energy[item, :lengths[item]]
+        threshold[item] = energies.mean() + THRESHOLD_STDS * energies.std()
+    active = (frame_energy > threshold[:, None]) & valid
+
+    eligible = (lengths >= MIN_FRAMES) & (np.sum(active, axis=1) >= MIN_ACTIVE_FRAMES)
+    active &= eligible[:, None]
+    flat = np.flatnonzero(active)
+    if len(flat) == 0:
+        return results
+
+    # Segments over the flattened (item, frame) grid; item boundaries always split
+    item_of, frame_of = np.divmod(flat, max_frames)
+    breaks = np.flatnonzero((np.diff(frame_of) > MAX_GAP) | (np.diff(item_of) != 0))
+    first = np.concatenate(([0], breaks + 1))
+    last = np.concatenate((breaks, [len(flat) - 1]))
+    seg_item, seg_start, seg_end = item_of[first], frame_of[first], frame_of[last]
+
+    # Score every candidate segment at once from per-frame coefficient sums
+    lower = np.cumsum(np.sum(abs_mfcc[:, :N_LOWER_COEFFS], axis=1), axis=1, dtype=np.float64)
+    upper = np.cumsum(np.sum(abs_mfcc[:, N_LOWER_COEFFS:], axis=1), axis=1, dtype=np.float64)
+    seg_len = seg_end - seg_start + 1
+    before = seg_start - 1
+    previous = np.maximum(before, 0)
+    lower_sum = lower[seg_item, seg_end] - np.where(before >= 0, lower[seg_item, previous], 0)
+    upper_sum = upper[seg_item, seg_end] - np.where(before >= 0, upper[seg_item, previous], 0)
+    lower_energy = lower_sum / (min(n_mfcc, N_LOWER_COEFFS) * seg_len)
+    upper_energy = upper_sum / (max(n_mfcc - N_LOWER_COEFFS, 1) * seg_len)
+    speech_ratio = lower_energy / (upper_energy + 1e-10)
+
+    # Longest segment per item decides, earliest one on ties (as max() would pick)
+    order = np.lexsort((np.arange(len(seg_len)), -seg_len, seg_item))
+    best = order[np.concatenate(([True], np.diff(seg_item[order]) != 0))]
+    items, starts, ends = seg_item[best], seg_start[best], seg_end[best]
+    seg_len, speech_ratio = seg_len[best], speech_ratio[best]
+
+    detected = (seg_len >= MIN_SEGMENT) & (seg_len <= MAX_SEGMENT) & (speech_ratio > SPEECH_RATIO)
+    if n_mfcc <= N_LOWER_COEFFS:
+        detected[:] = False  # no upper coefficients to compare against
+    for item, start, end, ratio in zip(items[detected], starts[detected], ends[detected],
+                                       speech_ratio[detected]):
+        results[item] = ('light_on', (int(start), int(end)), float(ratio))
+    return results
+
+
+class StreamingDetector:
+    """
+    Incremental version of detect_command for a live session.
+
+    Frame energies feed an exponentially weighted mean/variance (plain
+    Welford averaging until 1/n drops below alpha), so the adaptive
+    threshold follows the whole session instead of the current chunk. A
+    segment is scored as soon as MAX_GAP quiet frames close it, so a wake
+    word that straddles two chunks is still seen whole. Every update is
+    O(1) per frame; recent frames are kept in a ring buffer so events can
+    carry the segment's MFCCs.
+
+    Frames passed with update(quiet=True) (the VAD called them silence)
+    also feed a separate mean/variance of quiet-frame energy. skip()
+    replays that for frames a gate never computed, so the threshold is
+    still learned from silence and speech together; can_skip says when
+    that estimate exists and nothing is left open.
+    """
+
+    def __init__(self, n_mfcc=13, alpha=0.01, warmup_frames=MIN_FRAMES, hop_seconds=512 / 16000,
+                 calibration=HEURISTIC_CALIBRATION):
+        self.alpha = alpha
+        self.calibration = calibration
+        self.warmup_frames = warmup_frames
+        self.hop_seconds = hop_seconds
+
+        self.n_frames = 0       # frame clock, including skipped frames
+        self.n_seen = 0         # frames that went through _step
+        self.energy_mean = 0.0
+        self.energy_var = 0.0
+        self.quiet_mean = 0.0   # energy of frames the caller marked quiet
+        self.quiet_var = 0.0
+        self._quiet_seen = 0
+
+        capacity = MAX_SEGMENT + MAX_GAP + 1
+        self._ring = np.zeros((n_mfcc, capacity), dtype=np.float32)
+        self._segment_start = None
+        self._last_active = None
+        self._active_count = 0
+        self._lower = self._upper = 0.0              # sums up to the last active frame
+        self._pending_lower = self._pending_upper = 0.0  # quiet frames since then
+
+    @property
+    def threshold(self):
+        return self.energy_mean + THRESHOLD_STDS * np.sqrt(self.energy_var)
+
+    def update(self, mfcc_frames, quiet=False):
+        """
+        Consume (n_mfcc, k) new frames; returns the events of segments that
+        closed. quiet=True marks them as silence for the estimate skip() uses.
+        """
+        events = []
+        abs_frames = np.abs(mfcc_frames)
+        energies = abs_frames.sum(axis=0)
+        if quiet:
+            for energy in energies:
+                self._learn_quiet(float(energy))
+        lowers = abs_frames[:N_LOWER_COEFFS].sum(axis=0)
+        uppers = abs_frames[N_LOWER_COEFFS:].sum(axis=0)
+        for i in range(mfcc_frames.shape[1]):
+            event = self._step(mfcc_frames[:, i], float(energies[i]),
+                               float(lowers[i]), float(uppers[i]))
+            if event is not None:
+                events.append(event)
+        return events
+
+    @property
+    def in_segment(self):
+        """True while a segment is open (it needs more frames to be closed)."""
+        return self._segment_start is not None
+
+    @property
+    def can_skip(self):
+        """True once frames can be skipped without changing what the statistics learn."""
+        return self.n_seen > self.warmup_frames and self._quiet_seen > 0 and not self.in_segment
+
+    def skip(self, n_frames):
+        """
+        Advance the frame clock over n_frames the VAD gate dropped as
+        silence. Each one updates the energy statistics as a quiet frame,
+        alternately one quiet standard deviation above and below the quiet
+        mean, so the skipped span adds its level and its spread.
+        """
+        spread = np.sqrt(self.quiet_var)
+        for i in range(n_frames if self._quiet_seen else 0):
+            self.n_seen += 1
+            self._learn(self.quiet_mean + (spread if i % 2 else -spread))
+        self.n_frames += n_frames
+
+    def flush(self):
+        """Close a segment still open at the end of the stream."""
+        return [event for event in [self._close()] if event is not None]
+
+    def _step(self, frame, energy, lower, upper):
+        t = self.n_frames
+        self.n_frames += 1
+        self.n_seen += 1
+        self._ring[:, t % self._ring.shape[1]] = frame
+
+        self._learn(energy)
+
+        active = self.n_seen > self.warmup_frames and energy > self.threshold
+        event = None
+        if active:
+            if self._segment_start is None:
+                self._segment_start = t
+                self._lower = self._upper = 0.0
+                self._active_count = 0
+            else:
+                self._lower += self._pending_lower
+                self._upper += self._pending_upper
+            self._pending_lower = self._pending_upper = 0.0
+            self._lower += lower
+            self._upper += upper
+            self._last_active = t
+            self._active_count += 1
+        elif self._segment_start is not None:
+            self._pending_lower += lower
+            self._pending_upper += upper
+            if t - self._last_active > MAX_GAP:
+                event = self._close()
+        return event
+
+    def _learn(self, energy):
+        # Exponentially weighted Welford update of the energy statistics
+        weight = max(1.0 / self.n_seen, self.alpha)
+        delta = energy - self.energy_mean
+        self.energy_mean += weight * delta
+        self.energy_var = (1.0 - weight) * (self.energy_var + weight * delta * delta)
+
+    def _learn_quiet(self, energy):
+        self._quiet_seen += 1
+        weight = max(1.0 / self._quiet_seen, self.alpha)
+        delta = energy - self.quiet_mean
+        self.quiet_mean += weight * delta
+        self.quiet_var = (1.0 - weight) * (self.quiet_var + weight * delta * delta)
+
+    def _close(self):
+        start, end = self._segment_start, self._last_active
+        self._segment_start = None
+        self._pending_lower = self._pending_upper = 0.0
+        if start is None:
+            return None
+
+        length = end - start + 1
+        n_mfcc = self._ring.shape[0]
+        if length < MIN_SEGMENT or length > MAX_SEGMENT or self._active_count < MIN_ACTIVE_FRAMES \
+                or n_mfcc <= N_LOWER_COEFFS:
+            return None
+        lower_energy = self._lower / (N_LOWER_COEFFS * length)
+        upper_energy = self._upper / ((n_mfcc - N_LOWER_COEFFS) * length)
+        speech_ratio = lower_energy / (upper_energy + 1e-10)
+        if speech_ratio <= SPEECH_RATIO:
+            return None
+
+        columns = np.arange(start, end + 1) % self._ring.shape[1]
+        return {
+            'keyword': 'light_on',
+            'wake_range': [start, end],
+            'start_time': round(start * self.hop_seconds, 3),
+            'end_time': round((end + 1) * self.hop_seconds, 3),
+            'speech_ratio': round(float(speech_ratio), 3),
+            'confidence': round(heuristic_confidence(float(speech_ratio), self.calibration), 4),
+            'mfcc': self._ring[:, columns].copy()
+        }
+
+
+# --- Pluggable detector backends ---
+# Every backend takes MFCC matrices and returns, per item, a dict with
+# 'keyword', 'wake_range', 'confidence' (0-1) and per-keyword 'scores'.
+
+class HeuristicDetector:
+    """
+    The energy / speech-ratio heuristic above as a detector backend.
+    Confidences are calibrated once Platt parameters are set, from
+    calibrate() or EDGEVOICE_DETECTOR_CALIBRATION (see heuristic_confidence).
+    """
+
+    name = 'heuristic'
+    keywords = ('light_on',)
+
+    def __init__(self, calibration=HEURISTIC_CALIBRATION):
+        self.calibration = calibration
+
+    def calibrate(self, mfccs, targets):
+        """
+        Fit Platt scaling on labeled clips (targets: 1 if the clip holds the
+        keyword) and use it from now on; returns (a, b) for
+        EDGEVOICE_DETECTOR_CALIBRATION. Only clips the heuristic fires on
+        inform the fit, the others report confidence 0 either way.
+        """
+        detections = _detect_batch(*stack_mfcc(list(mfccs)))
+        scored = [(np.log(ratio), target)
+                  for (keyword, _, ratio), target in zip(detections, targets) if keyword]
+        if not scored:
+            raise ValueError('The heuristic fired on none of the clips; nothing to calibrate')
+        scores, labels = zip(*scored)
+        self.calibration = fit_platt(scores, labels)
+        return self.calibration
+
+    def detect(self, mfcc_matrix):
+        return self.detect_batch(*stack_mfcc([mfcc_matrix]))[0]
+
+    def detect_batch(self, mfcc_batch, lengths=None):
+        results = []
+        for keyword, wake_range, ratio in _detect_batch(mfcc_batch, lengths):
+            confidence = heuristic_confidence(ratio, self.calibration) if keyword else 0.0
+            results.append({
+                'keyword': keyword,
+                'wake_range': wake_range,
+                'confidence': confidence,
+                'scores': {'light_on': confidence}
+            })
+        return results
+
+
+def quantize_int8(weights):
+    """Symmetric per-output-channel int8 quantization; returns (int8 weights, float32 scales)."""
+    weights = np.asarray(weights, dtype=np.float32)
+    flat = weights.reshape(weights.shape[0], -1)
+    scale = np.maximum(np.abs(flat).max(axis=1), 1e-12) / 127.0
+    quantized = np.clip(np.round(flat / scale[:, None]), -127, 127).astype(np.int8)
+    return quantized.reshape(weights.shape), scale.astype(np.float32)
+
+
+def save_model(path, params, labels, temperature=1.0, feature_mean=None, feature_std=None):
+    """
+    Write float DS-CNN parameters as an int8 model file for DSCNNDetector.
+
+    params maps 'conv0', 'ds0.dw', 'ds0.pw', ..., 'fc' to (weights, bias);
+    labels names the output classes, with '_'-prefixed labels (e.g.
+    '_silence_', '_unknown_') meaning "no keyword".
+    """
+    arrays = {'labels': np.array(labels), 'temperature': np.float32(temperature)}
+    n_mfcc = params['conv0'][0].shape[1]
+    arrays['feature_mean'] = np.zeros(n_mfcc, np.float32) if feature_mean is None else feature_mean
+    arrays['feature_std'] = np.ones(n_mfcc, np.float32) if feature_std is None else feature_std
+    for layer, (weights, bias) in params.items():
+        arrays[f'{layer}.w'], arrays[f'{layer}.scale'] = quantize_int8(weights)
+        arrays[f'{layer}.b'] = np.asarray(bias, dtype=np.float32)
+    np.savez_compressed(path, **arrays)
+
+
+def calibrate_model(model_path, mfccs, targets, output_path=None):
+    """
+    Temperature-scale a DS-CNN model file on held-out labeled clips: mfccs
+    are (n_mfcc, frames) matrices, targets their label names. Writes the
+    fitted temperature into output_path (default: in place) and returns it.
+    """
+    detector = DSCNNDetector(model_path)
+    temperature = detector.calibrate(mfccs, targets)
+    with np.load(model_path) as model:
+        arrays = {key: model[key] for key in model.files}
+    arrays['temperature'] = np.float32(temperature)
+    np.savez_compressed(output_path or model_path, **arrays)
+    return temperature
+
+
+def _time_windows(x, kernel):
+    """(B, T, C) -> (B, T, C, kernel) 'same'-padded sliding windows over time (a view)."""
+    pad = kernel // 2
+    x = np.pad(x, ((0, 0), (pad, kernel - 1 - pad), (0, 0)))
+    return np.lib.stride_tricks.sliding_window_view(x, kernel, axis=1)
+
+
+class DSCNNDetector:
+    """
+    Small depthwise-separable CNN keyword spotter in plain NumPy.
+
+    Architecture: a full 1-D convolution over time (MFCC coefficients as
+    input channels), N depthwise-separable blocks, and a per-frame linear
+    classifier. Clip scores are the temperature-scaled softmax of the
+    time-averaged logits, so confidences are calibrated by the temperature
+    fitted at training time. Weights ship as int8 with per-channel scales
+    and are dequantized once at load: NumPy has no fast int8 GEMM, so the
+    float32 copy lets every layer run as a BLAS matmul over the whole batch.
+    """
+
+    name = 'dscnn'
+
+    def __init__(self, model_path, threshold=0.5):
+        self.model_path = model_path
+        self.threshold = threshold
+        with np.load(model_path) as model:
+            self.labels = [str(label) for label in model['labels']]
+            self.temperature = float(model['temperature'])
+            self.feature_mean = model['feature_mean'].astype(np.float32)
+            self.feature_std = model['feature_std'].astype(np.float32)
+            layers = sorted({key.rsplit('.', 1)[0] for key in model.files if key.endswith('.w')})
+            self._layers = {
+                layer: (model[f'{layer}.w'].astype(np.float32)
+                        * model[f'{layer}.scale'].reshape(
+                            (-1,) + (1,) * (model[f'{layer}.w'].ndim - 1)),
+                        model[f'{layer}.b'].astype(np.float32))
+                for layer in layers
+            }
+        self.n_blocks = sum(1 for layer in self._layers if layer.endswith('.dw'))
+        self.keywords = tuple(label for label in self.labels if not label.startswith('_'))
+
+    @property
+    def calibration(self):
+        return self.temperature
+
+    def clip_logits(self, mfcc_batch, lengths=None):
+        """(B, n_mfcc, T) -> (B, n_labels) time-averaged logits, before temperature."""
+        mfcc_batch = np.asarray(mfcc_batch, dtype=np.float32)
+        lengths = (np.full(mfcc_batch.shape[0], mfcc_batch.shape[2]) if lengths is None
+                   else np.asarray(lengths, dtype=np.int64))
+        if mfcc_batch.shape[2] == 0:
+            return np.zeros((mfcc_batch.shape[0], len(self.labels)), dtype=np.float32)
+        return self.frame_logits(mfcc_batch, lengths).sum(axis=1) / np.maximum(lengths, 1)[:, None]
+
+    def calibrate(self, mfccs, targets):
+        """
+        Fit the softmax temperature on labeled clips (targets: label names)
+        and use it from now on; returns it. calibrate_model() stores it.
+        """
+        logits = self.clip_logits(*stack_mfcc(list(mfccs)))
+        self.temperature = fit_temperature(logits, [self.labels.index(t) for t in targets])
+        return self.temperature
+
+    def _no_command(self):
+        return {'keyword': None, 'wake_range': None, 'confidence': 0.0,
+                'scores': {kw: 0.0 for kw in self.keywords}}
+
+    def frame_logits(self, mfcc_batch, lengths):
+        """(B, n_mfcc, T) -> (B, T, n_labels) logits; padded frames are zeroed."""
+        valid = (np.arange(mfcc_batch.shape[2]) < lengths[:, None])[:, :, None]
+        x = (np.transpose(mfcc_batch, (0, 2, 1)) - self.feature_mean) / self.feature_std
+        x = np.where(valid, x, 0).astype(np.float32)
+
+        weights, bias = self._layers['conv0']
+        out_channels, in_channels, kernel = weights.shape
+        windows = _time_windows(x, kernel).reshape(x.shape[0], x.shape[1], in_channels * kernel)
+        h = np.maximum(windows @ weights.reshape(out_channels, -1).T + bias, 0)
+
+        for i in range(self.n_blocks):
+            dw, dw_bias = self._layers[f'ds{i}.dw']
+            pw, pw_bias = self._layers[f'ds{i}.pw']
+            windows = _time_windows(h * valid, dw.shape[1])
+            h = np.maximum(np.einsum('btck,ck->btc', windows, dw) + dw_bias, 0)
+            h = np.maximum(h @ pw.T + pw_bias, 0)
+
+        fc, fc_bias = self._layers['fc']
+        return (h @ fc.T + fc_bias) * valid
+
+    def _softmax(self, logits):
+        z = logits / self.temperature
+        z = np.exp(z - z.max(axis=-1, keepdims=True))
+        return z / z.sum(axis=-1, keepdims=True)
+
+    def detect(self, mfcc_matrix):
+        return self.detect_batch(*stack_mfcc([mfcc_matrix]))[0]
+
+    def detect_batch(self, mfcc_batch, lengths=None):
+        mfcc_batch = np.asarray(mfcc_batch, dtype=np.float32)
+        lengths = (np.full(mfcc_batch.shape[0], mfcc_batch.shape[2]) if lengths is None
+                   else np.asarray(lengths, dtype=np.int64))
+        if mfcc_batch.shape[2] == 0:
+            # No frames at all (e.g. everything VAD-gated): nothing to convolve
+            return [self._no_command() for _ in range(mfcc_batch.shape[0])]
+        logits = self.frame_logits(mfcc_batch, lengths)
+        clip_probs = self._softmax(logits.sum(axis=1) / np.maximum(lengths, 1)[:, None])
+        frame_probs = self._softmax(logits)
+
+        results = []
+        for i, probs in enumerate(clip_probs):
+            if lengths[i] == 0:
+                results.append(self._no_command())
+                continue
+            best = int(np.argmax(probs))
+            label = self.labels[best]
+            scores = {kw: float(probs[self.labels.index(kw)]) for kw in self.keywords}
+            keyword, wake_range = None, None
+            if not label.startswith('_') and probs[best] >= self.threshold:
+                keyword = label
+                # Frames where the winning keyword dominates locate it in time
+                hits = np.flatnonzero(frame_probs[i, :lengths[i], best] >= self.threshold)
+                peak = int(np.argmax(frame_probs[i, :lengths[i], best]))
+                wake_range = (int(hits[0]), int(hits[-1])) if len(hits) else (peak, peak)
+            results.append({
+                'keyword': keyword,
+                'wake_range': wake_range,
+                'confidence': (float(probs[best]) if keyword
+                               else float(max(scores.values(), default=0.0))),
+                'scores': scores
+            })
+        return results
+
+
+DETECTORS = {
+    'heuristic': HeuristicDetector,
+    'dscnn': DSCNNDetector,
+}
+
+
+def load_detector(name=None, model_path=None):
+    """
+    Build the configured detector backend (call once at startup).
+
+    Defaults come from EDGEVOICE_DETECTOR and EDGEVOICE_MODEL_PATH; the
+    DS-CNN backend needs a model file written by save_model() (temperature
+    from calibrate_model()), the heuristic takes Platt parameters from
+    EDGEVOICE_DETECTOR_CALIBRATION.
+    """
+    name = name or os.environ.get('EDGEVOICE_DETECTOR', 'heuristic')
+    if name not in DETECTORS:
+        raise ValueError(f'Unknown detector backend: {name}')
+    if name == 'heuristic':
+        return HeuristicDetector()
+    model_path = model_path or os.environ.get('EDGEVOICE_MODEL_PATH')
+    if not model_path:
+        raise ValueError(f'Detector backend {name!r} needs EDGEVOICE_MODEL_PATH')
+    return DETECTORS[name](model_path)
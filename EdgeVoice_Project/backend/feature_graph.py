@@ -0,0 +1,100 @@
+"""
+Several features of one signal from a single STFT.
+
+    fs = FeatureSet(y, transforms)               # nothing is computed yet
+    fs['mfcc'], fs['delta']                      # each node is computed at most once
+    fs.compute(('log_mel', 'mfcc', 'energy'))    # {name: array}
+
+Nodes and what they are derived from:
+
+    power       |STFT|^2, (n_fft // 2 + 1, frames); the only pass over the waveform
+    mel         mel_basis @ power
+    log_mel     mel in dB, floored top_db below its peak (librosa.power_to_db)
+    mfcc        DCT of log_mel, the same as Pipeline.features / librosa.feature.mfcc
+    delta       first derivative of mfcc (librosa.feature.delta, width 9)
+    delta2      second derivative of mfcc
+    energy      per-frame mean square of the signal, mean(frame^2) under the window:
+                mean((window * frame)^2) / mean(window^2), from power (Parseval)
+    moments     feature_stats.FeatureStats of mfcc and y (one fused pass)
+    cmvn        mfcc normalized to zero mean and unit variance per coefficient
+    stats       the JSON stats block of Pipeline.stats, from moments
+
+Asking for 'delta' computes power, mel, log_mel and mfcc on the way and
+nothing else; asking for 'cmvn' and 'stats' shares one moments pass.
+Deltas import scipy.signal on first use.
+"""
+
+import numpy as np
+
+from feature_stats import FeatureStats
+from features import TOP_DB, power_spectrogram, power_to_db
+
+DELTA_WIDTH = 9
+
+
+def _energy(fs):
+    # Parseval over the one-sided spectrum gives sum((window * frame)^2) * n_fft;
+    # dividing by n_fft * sum(window^2) undoes the window's power loss, so a
+    # stationary signal's energy is its own mean square, not ~0.375 of it (Hann)
+    power = fs['power']
+    n_fft = fs.transforms.n_fft
+    total = 2.0 * power.sum(axis=0) - power[0] - (power[-1] if n_fft % 2 == 0 else 0.0)
+    return (total / (n_fft * n_fft * np.mean(fs.transforms.window ** 2))).astype(np.float32)
+
+
+def _delta(order):
+    def node(fs):
+        mfcc = fs['mfcc']
+        # librosa's interp mode needs width <= frames: shrink the window for short clips
+        width = min(DELTA_WIDTH, mfcc.shape[1] - (mfcc.shape[1] % 2 == 0))
+        if width <= order or width < 3:
+            return np.zeros_like(mfcc)
+        import scipy.signal
+        return scipy.signal.savgol_filter(mfcc, width, deriv=order, polyorder=order,
+                                          axis=-1, mode='interp').astype(np.float32)
+    return node
+
+
+def _cmvn(fs):
+    moments = fs['moments']
+    std = np.maximum(moments.std, 1e-8)
+    return ((fs['mfcc'] - moments.mean[:, None]) / std[:, None]).astype(np.float32)
+
+
+NODES = {
+    # The one pass over the waveform; every spectral node reuses this matrix
+    'power': lambda fs: power_spectrogram(fs.y, fs.transforms),
+    'mel': lambda fs: fs.transforms.mel_basis @ fs['power'],
+    'log_mel': lambda fs: power_to_db(fs['mel'], fs.top_db),
+    'mfcc': lambda fs: (fs.transforms.dct @ fs['log_mel']).astype(np.float32),
+    'delta': _delta(1),
+    'delta2': _delta(2),
+    'energy': _energy,
+    'moments': lambda fs: FeatureStats.of(fs['mfcc'], fs.y),
+    'cmvn': _cmvn,
+    'stats': lambda fs: fs['moments'].to_dict(fs.transforms.sr),
+}
+
+
+class FeatureSet:
+    """Lazily evaluated feature graph for one signal; see NODES for what can be asked for."""
+
+    def __init__(self, y, transforms, top_db=TOP_DB):
+        self.y = np.asarray(y, dtype=np.float32)
+        self.transforms = transforms
+        self.top_db = top_db
+        self._values = {}
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            if name not in NODES:
+                raise KeyError(f'Unknown feature {name!r}; choose from {", ".join(NODES)}')
+            self._values[name] = NODES[name](self)
+        return self._values[name]
+
+    def __contains__(self, name):
+        return name in self._values
+
+    def compute(self, outputs):
+        """{name: value} for the requested nodes, computing only what they depend on."""
+        return {name: self[name] for name in outputs}
@@ -0,0 +1,113 @@
+"""
+Fused, mergeable statistics for the MFCC stats block.
+
+    s = FeatureStats.of(mfcc, y)      # one call instead of mean/std/sum(y ** 2)
+    s.to_dict(sr)                     # {'mean', 'std', 'energy', 'rms', 'frames', 'duration'}
+
+    total = FeatureStats(n_mfcc)      # streaming: fold chunks in as they arrive
+    total.update(mfcc_chunk, y_chunk)
+    total.merge(other)                # or combine partials from other workers
+
+Per coefficient it keeps (frame count, mean, M2) and combines partials
+with Chan's parallel update, so merging is exact and does not lose
+precision the way a running sum / sum-of-squares does. Frames are reduced
+in cache-sized blocks: each block is shifted by its approximate mean into
+one reused float32 scratch buffer and reduced with float32 einsum, so the
+matrix is streamed from memory once and the shift keeps float32 accurate.
+The waveform energy is a BLAS dot product per block of samples, summed in
+float64; neither y ** 2 nor any other full-size temporary is allocated.
+"""
+
+import numpy as np
+
+# Frames per block: a 13 x 4096 float32 block (~200 KB) stays in cache for all its reductions
+BLOCK_FRAMES = 4096
+# Samples per float32 dot product in the energy sum
+BLOCK_SAMPLES = 65536
+
+
+class FeatureStats:
+    """Running per-coefficient mean/variance of MFCC frames plus waveform energy."""
+
+    __slots__ = ('n_frames', 'mean', 'm2', 'n_samples', 'sum_squares')
+
+    def __init__(self, n_mfcc):
+        self.n_frames = 0
+        self.mean = np.zeros(n_mfcc)
+        self.m2 = np.zeros(n_mfcc)
+        self.n_samples = 0
+        self.sum_squares = 0.0
+
+    @classmethod
+    def of(cls, mfcc, y=None):
+        """Statistics of one MFCC matrix (n_mfcc x frames) and its waveform."""
+        return cls(mfcc.shape[0]).update(mfcc, y)
+
+    def update(self, mfcc=None, y=None):
+        """Fold in new frames and/or samples; returns self."""
+        if y is not None and len(y):
+            self.n_samples += len(y)
+            for start in range(0, len(y), BLOCK_SAMPLES):
+                block = y[start:start + BLOCK_SAMPLES]
+                self.sum_squares += float(np.dot(block, block))
+        if mfcc is None or not mfcc.shape[1]:
+            return self
+        mfcc = np.asarray(mfcc, dtype=np.float32)
+        scratch = np.empty((mfcc.shape[0], min(mfcc.shape[1], BLOCK_FRAMES)), dtype=np.float32)
+        for start in range(0, mfcc.shape[1], BLOCK_FRAMES):
+            block = mfcc[:, start:start + BLOCK_FRAMES]
+            n = block.shape[1]
+            shifted = scratch[:, :n]
+            shift = np.einsum('ij->i', block) / n
+            np.subtract(block, shift[:, None], out=shifted)
+            sums = np.einsum('ij->i', shifted).astype(np.float64)
+            squares = np.einsum('ij,ij->i', shifted, shifted).astype(np.float64)
+            # Moments of the block from its shifted sums: mean = K + S/n, M2 = SS - S^2/n
+            self._combine(n, shift + sums / n, squares - sums * sums / n)
+        return self
+
+    def merge(self, other):
+        """Fold in another partial (same n_mfcc); returns self."""
+        if other.n_frames:
+            self._combine(other.n_frames, other.mean, other.m2)
+        self.n_samples += other.n_samples
+        self.sum_squares += other.sum_squares
+        return self
+
+    def _combine(self, n, mean, m2):
+        total = self.n_frames + n
+        delta = mean - self.mean
+        self.mean += delta * (n / total)
+        self.m2 += m2 + delta * delta * (self.n_frames * n / total)
+        self.n_frames = total
+
+    @property
+    def variance(self):
+        """Population variance per coefficient (what np.var / np.std use)."""
+        if not self.n_frames:
+            return np.zeros_like(self.m2)
+        return np.maximum(self.m2 / self.n_frames, 0.0)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def energy(self):
+        """Mean square of the samples."""
+        return self.sum_squares / self.n_samples if self.n_samples else 0.0
+
+    @property
+    def rms(self):
+        return float(np.sqrt(self.energy))
+
+    def to_dict(self, sr):
+        """The JSON stats block returned by the endpoints."""
+        return {
+            'mean': self.mean.round(3).tolist(),
+            'std': self.std.round(3).tolist(),
+            'energy': self.energy,
+            'rms': round(self.rms, 6),
+            'frames': self.n_frames,
+            'duration': round(self.n_samples / sr, 2)
+        }
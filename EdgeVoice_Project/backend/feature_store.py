@@ -0,0 +1,377 @@
+"""
+Persistent, memory-mapped store of MFCC matrices keyed by utterance id.
+
+    store.put(mfcc, 'abc123', filename='hello.wav')   # append to the current shard
+    store.get('abc123')                               # read-only np.memmap, no copy
+    store.recent(20)                                  # newest index rows
+
+    with store.writer('def456', filename='meeting.wav') as writer:
+        for block in blocks:
+            writer.append(block)                      # frames stream to a spool file
+
+Each matrix is appended as raw float32 (C order, n_mfcc x frames) to a
+large binary shard; shards roll over at SHARD_BYTES. The index (id ->
+shard, byte offset, shape, content digest, metadata) is a SQLite table,
+which several gunicorn workers can share. Every write runs in one
+SQLite write transaction, so all processes append to the same current
+shard without interleaving bytes. A writer() spools its frames
+(frame-major, Fortran order) to a temporary file and appends it to the
+current shard when it closes; get() maps it back as the same n_mfcc x
+frames matrix.
+
+Writes are deduplicated by digest: putting the same id with the same
+matrix again writes nothing, and a new id for a matrix already stored
+(a result-cache hit) only adds an index row. Only the newest MAX_ENTRIES
+rows are kept (EDGEVOICE_FEATURE_STORE_MAX_ENTRIES, default 10000);
+every PRUNE_EVERY puts a process drops older rows and compact() rewrites
+shards that are mostly unreferenced bytes (pruned or replaced matrices).
+
+The root directory is EDGEVOICE_FEATURE_STORE, or feature_store/ next to
+this file.
+"""
+
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+
+DEFAULT_ROOT = os.environ.get(
+    'EDGEVOICE_FEATURE_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_store'))
+SHARD_BYTES = 256 * 1024 * 1024
+MAX_ENTRIES = int(os.environ.get('EDGEVOICE_FEATURE_STORE_MAX_ENTRIES', 10000))
+PRUNE_EVERY = 100          # puts per process between retention/compaction passes
+COMPACT_GARBAGE = 0.5      # rewrite a shard once this fraction of it is unreferenced
+SPOOL_TTL = 3600.0         # seconds before an untouched writer spool counts as abandoned
+DTYPE = np.dtype('<f4')
+
+_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS features (
+        id TEXT PRIMARY KEY,
+        shard TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        n_rows INTEGER NOT NULL,
+        n_cols INTEGER NOT NULL,
+        created REAL NOT NULL,
+        meta TEXT NOT NULL,
+        digest TEXT
+    )
+    ''',
+    'CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)',
+)
+_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS features_created ON features (created)',
+    'CREATE INDEX IF NOT EXISTS features_digest ON features (digest)',
+)
+
+
+def _digest(order, shape):
+    # Identifies the stored bytes: same digest, same bytes at the same shape and order
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f'{order}{shape[0]}x{shape[1]}'.encode())
+    return digest
+
+
+class FeatureStore:
+    """Float32 MFCC shards plus a SQLite offset/shape/digest/metadata index."""
+
+    def __init__(self, root=DEFAULT_ROOT, shard_bytes=SHARD_BYTES, max_entries=MAX_ENTRIES):
+        self.root = root
+        self.shard_bytes = shard_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._ready = False
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(self.root, exist_ok=True)
+            with sqlite3.connect(self._path('index.sqlite')) as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+                # Indexes written before digests existed
+                columns = {column[1] for column in conn.execute('PRAGMA table_info(features)')}
+                if 'digest' not in columns:
+                    conn.execute('ALTER TABLE features ADD COLUMN digest TEXT')
+                for statement in _INDEXES:
+                    conn.execute(statement)
+            self._ready = True
+        return sqlite3.connect(self._path('index.sqlite'), timeout=30, isolation_level=None)
+
+    @contextlib.contextmanager
+    def _write(self):
+        """Connection holding the index's write lock: one writer at a time, across processes."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def _append(self, conn, nbytes, write):
+        """Append nbytes through write(handle) to the shared current shard; (shard, offset)."""
+        row = conn.execute("SELECT value FROM settings WHERE key = 'shard'").fetchone()
+        shard = row[0] if row else None
+        path = shard and self._path(shard)
+        size = os.path.getsize(path) if shard and os.path.exists(path) else 0
+        if shard is None or (size and size + nbytes > self.shard_bytes):
+            shard = f'shard-{uuid.uuid4().hex[:12]}.f32'
+            conn.execute("INSERT OR REPLACE INTO settings VALUES ('shard', ?)", (shard,))
+        with open(self._path(shard), 'ab') as handle:
+            offset = handle.tell()
+            write(handle)
+        return shard, offset
+
+    def _insert(self, conn, utterance_id, digest, shape, meta, nbytes, write):
+        """Index a matrix, writing its bytes only if no row holds them yet; False if unchanged."""
+        row = conn.execute('SELECT digest FROM features WHERE id = ?', (utterance_id,)).fetchone()
+        if row is not None and row[0] == digest:
+            return False
+        same = conn.execute('SELECT shard, offset FROM features WHERE digest = ? LIMIT 1',
+                            (digest,)).fetchone()
+        shard, offset = same if same else self._append(conn, nbytes, write)
+        conn.execute('INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                     (utterance_id, shard, offset, shape[0], shape[1], time.time(),
+                      json.dumps(meta), digest))
+        return True
+
+    def put(self, mfcc, utterance_id=None, **meta):
+        """Store one matrix; returns its id (a new one if utterance_id is None)."""
+        utterance_id = utterance_id or uuid.uuid4().hex
+        data = np.ascontiguousarray(mfcc, dtype=DTYPE)
+        if data.ndim != 2:
+            raise ValueError('mfcc must be a 2-D (n_mfcc x frames) matrix')
+        digest = _digest('C', data.shape)
+        digest.update(memoryview(data).cast('B'))
+        with self._write() as conn:
+            self._insert(conn, utterance_id, digest.hexdigest(), data.shape, meta, data.nbytes,
+                         lambda handle: handle.write(memoryview(data).cast('B')))
+        self._after_put()
+        return utterance_id
+
+    def writer(self, utterance_id=None, **meta):
+        """FeatureWriter that spools a matrix block by block; stored when it closes."""
+        os.makedirs(self.root, exist_ok=True)
+        return FeatureWriter(self, utterance_id or uuid.uuid4().hex, meta)
+
+    def _after_put(self):
+        with self._lock:
+            self._puts += 1
+            due = self._puts % PRUNE_EVERY == 0
+        if due:
+            self.prune()
+
+    def prune(self, max_entries=None):
+        """Drop all but the newest max_entries rows (default: the store's limit), then compact()."""
+        max_entries = self.max_entries if max_entries is None else max_entries
+        with self._write() as conn:
+            conn.execute('DELETE FROM features WHERE id IN (SELECT id FROM features '
+                         'ORDER BY created DESC LIMIT -1 OFFSET ?)', (max_entries,))
+        return self.compact()
+
+    def compact(self, garbage=COMPACT_GARBAGE):
+        """
+        Reclaim unreferenced shard bytes: shards no row points to are
+        deleted, and shards where at least `garbage` of the bytes are
+        unreferenced have their live matrices moved to the current shard.
+        Returns the number of bytes freed. Open memmaps of a moved shard
+        keep working on POSIX; where the file cannot be deleted yet
+        (Windows), the next compact() picks it up.
+        """
+        freed = 0
+        with self._write() as conn:
+            current = conn.execute("SELECT value FROM settings WHERE key = 'shard'").fetchone()
+            current = current[0] if current else None
+            ranges = {}
+            for shard, offset, n_rows, n_cols in conn.execute(
+                    'SELECT DISTINCT shard, offset, n_rows, n_cols FROM features').fetchall():
+                ranges.setdefault(shard, []).append((offset, n_rows * n_cols * DTYPE.itemsize))
+
+            for path in glob.glob(self._path('shard-*.f32')):
+                shard = os.path.basename(path)
+                size = os.path.getsize(path)
+                live = ranges.get(shard, [])
+                used = sum(nbytes for _, nbytes in live)
+                if shard == current or (live and size - used < garbage * size):
+                    continue
+                for offset, nbytes in sorted(live):
+                    if nbytes == 0:
+                        continue
+                    with open(path, 'rb') as source:
+                        source.seek(offset)
+                        new_shard, new_offset = self._append(
+                            conn, nbytes, lambda handle: _copy(source, handle, nbytes))
+                    conn.execute('UPDATE features SET shard = ?, offset = ? '
+                                 'WHERE shard = ? AND offset = ?',
+                                 (new_shard, new_offset, shard, offset))
+                try:
+                    os.remove(path)
+                    freed += size - used
+                except OSError:
+                    pass
+
+        # Spools of writers that died before closing
+        for path in glob.glob(self._path('spool-*.tmp')):
+            try:
+                if time.time() - os.path.getmtime(path) > SPOOL_TTL:
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+            except OSError:
+                pass
+        return freed
+
+    def _row(self, query, args=()):
+        conn = self._connect()
+        try:
+            return conn.execute(query, args).fetchone()
+        finally:
+            conn.close()
+
+    def get(self, utterance_id=None):
+        """Read-only memmap of a stored matrix (the newest when no id is given), or None."""
+        if utterance_id is None:
+            row = self._row('SELECT shard, offset, n_rows, n_cols, meta FROM features '
+                            'ORDER BY created DESC LIMIT 1')
+        else:
+            row = self._row('SELECT shard, offset, n_rows, n_cols, meta FROM features WHERE id = ?',
+                            (utterance_id,))
+        if row is None:
+            return None
+        shard, offset, n_rows, n_cols, meta = row
+        if n_rows * n_cols == 0:
+            return np.zeros((n_rows, n_cols), dtype=DTYPE)
+        order = json.loads(meta).get('order', 'C')
+        return np.memmap(self._path(shard), dtype=DTYPE, mode='r',
+                         offset=offset, shape=(n_rows, n_cols), order=order)
+
+    def meta(self, utterance_id):
+        """Index entry for an id: {'id', 'shape', 'created', **metadata}, or None."""
+        row = self._row('SELECT id, n_rows, n_cols, created, meta FROM features WHERE id = ?',
+                        (utterance_id,))
+        return _entry(row) if row else None
+
+    def recent(self, limit=50, offset=0):
+        """Newest index entries first; touches only the index, never the shards."""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT id, n_rows, n_cols, created, meta FROM features '
+                                'ORDER BY created DESC LIMIT ? OFFSET ?',
+                                (limit, offset)).fetchall()
+        finally:
+            conn.close()
+        return [_entry(row) for row in rows]
+
+    def __len__(self):
+        return self._row('SELECT COUNT(*) FROM features')[0]
+
+
+class FeatureWriter:
+    """
+    Streams one n_mfcc x frames matrix to a spool file, a block of frames
+    at a time, without holding it in memory; close() appends the spool to
+    the current shard (or makes it a shard of its own when it is larger
+    than a shard). Use it as a context manager: a clean exit stores the
+    matrix, an exception deletes the spool and leaves the index untouched.
+    """
+
+    def __init__(self, store, utterance_id, meta):
+        self.store = store
+        self.utterance_id = utterance_id
+        self.meta = dict(meta, order='F')
+        self.spool = store._path(f'spool-{os.getpid()}-{uuid.uuid4().hex[:8]}.tmp')
+        self.n_rows = None
+        self.n_frames = 0
+        self.closed = False
+        self._bytes = hashlib.blake2b(digest_size=20)
+        self._handle = open(self.spool, 'wb')
+
+    def append(self, mfcc):
+        """Append (n_mfcc, k) frames."""
+        if mfcc.ndim != 2 or (self.n_rows is not None and mfcc.shape[0] != self.n_rows):
+            raise ValueError('blocks must be (n_mfcc x frames) with the same n_mfcc')
+        self.n_rows = mfcc.shape[0]
+        # Frame-major bytes: the transposed block in C order
+        frames = np.ascontiguousarray(mfcc.T, dtype=DTYPE)
+        self._bytes.update(memoryview(frames).cast('B'))
+        self._handle.write(memoryview(frames).cast('B'))
+        self.n_frames += mfcc.shape[1]
+
+    def close(self, **meta):
+        """Store the spooled matrix (meta is merged in); returns the id."""
+        self._handle.close()
+        self.closed = True
+        shape = (self.n_rows or 0, self.n_frames)
+        digest = _digest('F', shape)
+        digest.update(self._bytes.digest())
+        nbytes = os.path.getsize(self.spool)
+        store = self.store
+        with store._write() as conn:
+            if nbytes > store.shard_bytes:
+                # Bigger than a shard: the spool becomes a shard of its own
+                shard = f'shard-{uuid.uuid4().hex[:12]}.f32'
+                os.replace(self.spool, store._path(shard))
+                conn.execute('INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                             (self.utterance_id, shard, 0, shape[0], shape[1], time.time(),
+                              json.dumps(dict(self.meta, **meta)), digest.hexdigest()))
+            else:
+                with open(self.spool, 'rb') as source:
+                    store._insert(conn, self.utterance_id, digest.hexdigest(), shape,
+                                  dict(self.meta, **meta), nbytes,
+                                  lambda handle: shutil.copyfileobj(source, handle))
+        if os.path.exists(self.spool):
+            os.remove(self.spool)
+        store._after_put()
+        return self.utterance_id
+
+    def discard(self):
+        """Drop the spool without storing it."""
+        self._handle.close()
+        self.closed = True
+        os.remove(self.spool)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.closed:
+            return False
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+def _copy(source, target, nbytes, chunk=1 << 20):
+    while nbytes > 0:
+        block = source.read(min(chunk, nbytes))
+        if not block:
+            raise IOError('shard is shorter than its index says')
+        target.write(block)
+        nbytes -= len(block)
+
+
+def _entry(row):
+    utterance_id, n_rows, n_cols, created, meta = row
+    return dict(json.loads(meta), id=utterance_id, shape=[n_rows, n_cols], created=created)
+
+
+store = FeatureStore()
@@ -0,0 +1,184 @@
+"""
+Fixed-point MFCC and detector path, emulating what an edge device runs.
+
+Used by /accelerate to benchmark the integer numeric path on the server:
+
+- quantize()/dequantize(): symmetric int8/int16 quantization of an MFCC
+  matrix with one scale per coefficient row.
+- fixed_point_mfcc(): int16 PCM -> Q8 MFCC using only integer arithmetic
+  after the FFT (Q15 window, block-floating-point power spectrum, Q15 mel
+  weights, integer log2 with a mantissa table, Q15 DCT). The FFT itself is
+  computed exactly on the integer frames and rounded back to integers,
+  standing in for a fixed-point FFT kernel such as arm_rfft_q15.
+- detect_quantized(): the heuristic detector run on integer features.
+"""
+
+import time
+
+import numpy as np
+import scipy.fft
+
+from command_detect import _detect_batch
+from features import (SAMPLE_RATE, N_MFCC, N_FFT, HOP_LENGTH, N_MELS, TOP_DB, get_transforms,
+                      compute_mfcc)
+
+Q15 = 1 << 15
+LOG_FRAC_BITS = 8      # log-mel and MFCC outputs are Q8 (1/256 dB resolution)
+POWER_BITS = 31        # power spectrum is normalised per frame to fit in int32
+
+# 10 * log10(2) in Q15, converts Q8 log2 values to Q8 decibels
+_DB_PER_OCTAVE_Q15 = int(round(10 * np.log10(2) * Q15))
+# log2(1 + i/256) in Q8 for the mantissa lookup
+_LOG2_MANTISSA_Q8 = np.round(np.log2(1 + np.arange(256) / 256.0) * 256).astype(np.int64)
+
+
+def quantize(x, bits=8):
+    """Symmetric per-row quantization; returns (integer array, float32 scale per row)."""
+    if bits not in (8, 16):
+        raise ValueError('bits must be 8 or 16')
+    x = np.asarray(x, dtype=np.float32)
+    qmax = (1 << (bits - 1)) - 1
+    scale = np.maximum(np.abs(x).max(axis=1, initial=0.0), 1e-12) / qmax
+    dtype = np.int8 if bits == 8 else np.int16
+    q = np.clip(np.round(x / scale[:, None]), -qmax, qmax).astype(dtype)
+    return q, scale.astype(np.float32)
+
+
+def dequantize(q, scale):
+    return q.astype(np.float32) * scale[:, None]
+
+
+def quantization_error(reference, approx):
+    """Max/RMS error and signal-to-quantization-noise ratio of approx against reference."""
+    reference = np.asarray(reference, dtype=np.float64)
+    error = np.asarray(approx, dtype=np.float64) - reference
+    noise = float(np.mean(error * error)) if error.size else 0.0
+    signal = float(np.mean(reference * reference)) if reference.size else 0.0
+    return {
+        'max_abs': float(np.max(np.abs(error))) if error.size else 0.0,
+        'rmse': float(np.sqrt(noise)),
+        'sqnr_db': float(10 * np.log10(signal / noise)) if noise > 0 else None
+    }
+
+
+def _bit_length(x):
+    """Bit length of non-negative int64 values using shifts only."""
+    v = x.copy()
+    length = np.zeros(x.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = v >= (1 << shift)
+        length[big] += shift
+        v[big] >>= shift
+    return length + (v > 0)
+
+
+def _log2_q8(x):
+    """floor-accurate log2 of positive int64 values in Q8 (table lookup on the top 9 bits)."""
+    length = _bit_length(x)
+    shift = length - 9
+    top = np.where(shift >= 0, x >> np.maximum(shift, 0), x << np.maximum(-shift, 0))
+    return (length - 1) * 256 + _LOG2_MANTISSA_Q8[top & 0xFF]
+
+
+def fixed_point_mfcc(pcm, sr=SAMPLE_RATE, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH,
+                     n_mels=N_MELS, top_db=TOP_DB):
+    """
+    MFCC of int16 PCM in fixed point; returns an int32 Q8 matrix (n_mfcc x frames).
+
+    Dividing by 256 gives values directly comparable with compute_mfcc on
+    pcm / 32768.
+    """
+    transforms = get_transforms(sr, n_fft, hop_length, n_mels, n_mfcc)
+    pcm = np.asarray(pcm, dtype=np.int16)
+
+    window_q15 = np.round(transforms.window * (Q15 - 1)).astype(np.int32)
+    mel_max = float(transforms.mel_basis.max())
+    mel_bits = 15 - int(np.ceil(np.log2(mel_max))) if mel_max > 0 else 15
+    mel_q = np.round(transforms.mel_basis.astype(np.float64) * (1 << mel_bits)).astype(np.int64)
+    dct_q15 = np.round(transforms.dct.astype(np.float64) * Q15).astype(np.int64)
+
+    padded = np.pad(pcm.astype(np.int32), n_fft // 2)
+    if len(padded) < n_fft:
+        return np.zeros((n_mfcc, 0), dtype=np.int32)
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop_length]
+    windowed = (frames * window_q15) >> 15
+
+    spectrum = scipy.fft.rfft(windowed.astype(np.float64), axis=1)
+    re = np.round(spectrum.real).astype(np.int64)
+    im = np.round(spectrum.imag).astype(np.int64)
+    power = re * re + im * im
+
+    # Block floating point: one exponent per frame keeps the power in int32
+    exponent = np.maximum(_bit_length(power.max(axis=1)) - POWER_BITS, 0)
+    power >>= exponent[:, None]
+
+    mel = power @ mel_q.T                               # (frames, n_mels), int64
+    log_mel = np.full(mel.shape, np.iinfo(np.int64).min // 4, dtype=np.int64)
+    positive = mel > 0
+    log_mel[positive] = (_log2_q8(mel[positive]) * _DB_PER_OCTAVE_Q15) >> 15
+
+    # Undo the fixed scalings: int16 -> [-1, 1) (2^-30 on power), frame exponent, mel weight shift
+    offset_octaves = exponent[:, None] - 30 - mel_bits
+    log_mel += (offset_octaves * 256 * _DB_PER_OCTAVE_Q15) >> 15
+    log_mel = np.maximum(log_mel, -100 << LOG_FRAC_BITS)   # amin = 1e-10
+    if top_db is not None and log_mel.size:
+        log_mel = np.maximum(log_mel, log_mel.max() - (int(top_db) << LOG_FRAC_BITS))
+
+    return ((dct_q15 @ log_mel.T) >> 15).astype(np.int32)
+
+
+def detect_quantized(q, scale):
+    """
+    Heuristic detector on integer features.
+
+    Rows are brought to a common scale with Q15 integer multipliers (as a
+    device would requantize) because the detector compares energy across
+    coefficients; its thresholds are otherwise scale-invariant.
+    """
+    relative = np.asarray(scale, dtype=np.float64) / np.max(scale)
+    multiplier = np.round(relative * Q15).astype(np.int64)
+    common = np.asarray(q, dtype=np.int64) * multiplier[:, None]
+    keyword, wake_range, _ = _detect_batch(common[np.newaxis])[0]
+    return keyword, wake_range
+
+
+def run_accelerator(mfcc, bits=8, pcm=None, sr=SAMPLE_RATE):
+    """
+    Quantize an MFCC matrix, run the integer detector on it and, when raw
+    PCM is given, the fixed-point MFCC front end too. Every stage is timed.
+    """
+    mfcc = np.asarray(mfcc, dtype=np.float32)
+    timings = {}
+    result = {}
+
+    start = time.perf_counter()
+    q, scale = quantize(mfcc, bits)
+    timings['quantize_ms'] = (time.perf_counter() - start) * 1000
+    result.update(bits=bits, quantized=q.tolist(), scale=scale.tolist(),
+                  error=quantization_error(mfcc, dequantize(q, scale)))
+
+    start = time.perf_counter()
+    keyword_q, range_q = detect_quantized(q, scale)
+    timings['detect_ms'] = (time.perf_counter() - start) * 1000
+    keyword_f, range_f, _ = _detect_batch(mfcc[np.newaxis])[0]
+    result['detection'] = {
+        'float': {'keyword': keyword_f, 'wake_range': range_f},
+        'quantized': {'keyword': keyword_q, 'wake_range': range_q},
+        'match': keyword_f == keyword_q and range_f == range_q
+    }
+
+    if pcm is not None:
+        start = time.perf_counter()
+        mfcc_q8 = fixed_point_mfcc(pcm, sr)
+        keyword, wake_range, _ = _detect_batch(mfcc_q8[np.newaxis].astype(np.int64))[0]
+        timings['fixed_point_pipeline_ms'] = (time.perf_counter() - start) * 1000
+        reference = compute_mfcc(np.asarray(pcm, dtype=np.float32) / 32768.0, sr)
+        result['fixed_point_mfcc'] = {
+            'shape': list(mfcc_q8.shape),
+            'frac_bits': LOG_FRAC_BITS,
+            'error': quantization_error(reference, mfcc_q8 / float(1 << LOG_FRAC_BITS)),
+            'detection': {'keyword': keyword, 'wake_range': wake_range}
+        }
+
+    result['compute_time_ms'] = {k: round(v, 3) for k, v in timings.items()}
+    return result
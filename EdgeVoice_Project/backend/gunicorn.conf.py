@@ -0,0 +1,65 @@
+"""
+Gunicorn settings for the EdgeVoice backend.
+
+    gunicorn -c EdgeVoice_Project/backend/gunicorn.conf.py wsgi:app
+
+Every value can be overridden from the environment:
+
+    PORT                     listen port (default 5000)
+    EDGEVOICE_WORKERS        worker processes (default 1, see below)
+    EDGEVOICE_THREADS        threads per worker (default 8)
+    EDGEVOICE_MAX_REQUESTS   recycle a worker after this many requests (default 0: never)
+    EDGEVOICE_TIMEOUT        seconds before a stuck request's worker is restarted (default 120)
+    EDGEVOICE_MAX_UPLOAD_MB  request body limit, enforced by Flask (default 32)
+    EDGEVOICE_WORKER_CLASS   'gthread' (default) or 'uvicorn.workers.UvicornWorker' with asgi:app
+    EDGEVOICE_WARMUP         'sync' (default, in the master), 'background' (per worker) or 'off'
+
+Streaming sessions (/stream_mfcc, /wakeword_detect with session_id), the
+per-session upload store behind /download_wav and the result cache's
+memory tier live in the worker process. A chunk routed to another worker
+would silently start a fresh session (frame_offset 0, STFT overlap lost),
+so the default is one worker that scales with threads. More workers need
+a load balancer with sticky routing (by client or session_id).
+"""
+
+import os
+
+# Run from the backend directory so the flat module imports resolve
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Session state is per process (see above): one worker by default. NumPy's
+# FFT and matrix products release the GIL, so threads still use several cores
+workers = int(os.environ.get('EDGEVOICE_WORKERS', 1))
+threads = int(os.environ.get('EDGEVOICE_THREADS', 8))
+worker_class = os.environ.get('EDGEVOICE_WORKER_CLASS', 'gthread')
+
+# Import the app, build the detector/MFCC transforms and warm up once, before forking
+preload_app = True
+
+timeout = int(os.environ.get('EDGEVOICE_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Header limits; the body limit is MAX_CONTENT_LENGTH in the Flask app
+limit_request_line = 8190
+limit_request_fields = 100
+limit_request_field_size = 16384
+
+# Recycling a worker drops its sessions and running jobs, so it is opt-in
+# (e.g. 1000 to bound fragmentation from large decodes)
+max_requests = int(os.environ.get('EDGEVOICE_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('EDGEVOICE_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # EDGEVOICE_WARMUP=background: each worker warms up in its own thread; /ready is 503 until then
+    if os.environ.get('EDGEVOICE_WARMUP') == 'background':
+        import pipeline
+        import startup
+        startup.start(pipeline.default, 'background')
@@ -0,0 +1,275 @@
+"""
+Asynchronous jobs with progress for heavy uploads.
+
+    POST /upload?async=1        202 {"id", "state": "queued",
+                                     "status_url", "events_url", "result_url"}
+    GET  /jobs/<id>             {"id", "state", "stage", "progress", "error", ...}
+    GET  /jobs/<id>/events      Server-Sent Events: "progress" on every stage change,
+                                then one "done" or "failed" event and the stream ends
+    GET  /jobs/<id>/result      what the synchronous route would have returned
+                                (same ?mfcc_format= / ?compress= options); 202 while running
+
+A job function returns (result dict, MFCC matrix) and takes an on_stage
+callback; every stage it reports moves progress along STAGES. Jobs run
+on EDGEVOICE_JOB_WORKERS threads per process (default 2). At most
+EDGEVOICE_JOB_QUEUE jobs (default 16) wait for a thread; beyond that
+submit() raises QueueFull and the route answers 503 with Retry-After,
+so clients back off instead of timing out.
+
+State, result and MFCC are files in EDGEVOICE_JOB_DIR (default
+<tmp>/edgevoice_jobs), shared by all gunicorn workers, so any worker can
+answer for any job; only the newest MAX_JOBS are kept. An open /events
+stream holds one server thread, like /ws/wakeword.
+
+The process running a job rewrites its state every TOUCH_INTERVAL
+seconds, even inside a long stage. A queued or running job whose state
+is older than EDGEVOICE_JOB_STALE_SECONDS (default 60) lost its worker
+(crash, OOM kill, max_requests recycling) and is marked failed with
+"worker lost", so /events streams and pollers end instead of waiting
+forever.
+"""
+
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+WORKERS = int(os.environ.get('EDGEVOICE_JOB_WORKERS', 2))
+MAX_QUEUE = int(os.environ.get('EDGEVOICE_JOB_QUEUE', 16))
+JOB_DIR = os.environ.get('EDGEVOICE_JOB_DIR', os.path.join(tempfile.gettempdir(), 'edgevoice_jobs'))
+MAX_JOBS = 200
+RETRY_AFTER = 5            # seconds suggested to clients when the queue is full
+POLL_INTERVAL = 0.2        # seconds between state checks of an /events stream
+HEARTBEAT = 15.0           # seconds between SSE keep-alive comments
+TOUCH_INTERVAL = 5.0       # seconds between liveness writes of queued/running jobs
+STALE_AFTER = float(os.environ.get('EDGEVOICE_JOB_STALE_SECONDS', 60))
+
+# Stages in order; progress is the fraction of them passed
+STAGES = ('queued', 'decode', 'mfcc', 'detect', 'stats', 'store', 'done')
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_pending = 0
+_live = {}                 # id -> Job queued or running in this process
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit() when MAX_QUEUE jobs are already waiting."""
+
+
+def _path(job_id, suffix):
+    return os.path.join(JOB_DIR, job_id + suffix)
+
+
+def _write_json(path, data):
+    # Atomic replace, so readers in other workers never see half a file
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as handle:
+        json.dump(data, handle)
+    os.replace(tmp, path)
+
+
+class Job:
+    """One submitted job; every change is written to its state file."""
+
+    def __init__(self, kind):
+        self.state = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'state': 'queued',
+            'stage': 'queued',
+            'progress': 0.0,
+            'error': None,
+            'status_code': None,
+            'created': time.time(),
+            'updated': time.time()
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def id(self):
+        return self.state['id']
+
+    def _save(self, **changes):
+        with self._lock:
+            self.state.update(changes, updated=time.time())
+            _write_json(_path(self.id, '.json'), self.state)
+
+    def on_stage(self, stage):
+        """Progress callback handed to the job function."""
+        index = STAGES.index(stage) if stage in STAGES else STAGES.index(self.state['stage'])
+        self._save(stage=stage, progress=round(index / (len(STAGES) - 1), 3))
+
+    def run(self, fn, args, kwargs):
+        global _pending
+        with _lock:
+            _pending -= 1
+        self._save(state='running')
+        try:
+            result, mfcc = fn(*args, on_stage=self.on_stage, **kwargs)
+            np.save(_path(self.id, '.npy'), np.asarray(mfcc, dtype=np.float32))
+            _write_json(_path(self.id, '.result.json'), result)
+            self._save(state='done', stage='done', progress=1.0)
+        except Exception as e:
+            # Errors may carry their HTTP status (audio_io.DecodeError: 415); anything else is a 500
+            self._save(state='failed', error=str(e) or type(e).__name__,
+                       status_code=getattr(e, 'status_code', 500))
+        finally:
+            _live.pop(self.id, None)
+
+
+def _touch_live():
+    # Liveness writes for this process's jobs; stops with the process, which is the point
+    while True:
+        time.sleep(TOUCH_INTERVAL)
+        for job in list(_live.values()):
+            try:
+                job._save()
+            except OSError:
+                pass
+
+
+def _pool():
+    """Thread pool of this process; a forked gunicorn worker builds its own."""
+    global _executor, _executor_pid, _pending
+    if _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='edgevoice-job')
+        _executor_pid = os.getpid()
+        _pending = 0
+        _live.clear()
+        threading.Thread(target=_touch_live, name='edgevoice-job-touch', daemon=True).start()
+    return _executor
+
+
+def submit(fn, *args, kind='job', **kwargs):
+    """Queue fn(*args, on_stage=..., **kwargs); returns the Job or raises QueueFull."""
+    global _pending
+    os.makedirs(JOB_DIR, exist_ok=True)
+    with _lock:
+        pool = _pool()
+        if _pending >= MAX_QUEUE:
+            raise QueueFull(f'{_pending} jobs already waiting')
+        _pending += 1
+    job = Job(kind)
+    job._save()
+    _live[job.id] = job
+    _prune()
+    pool.submit(job.run, fn, args, kwargs)
+    return job
+
+
+def _prune():
+    states = sorted(glob.glob(os.path.join(JOB_DIR, '*[0-9a-f].json')), key=os.path.getmtime)
+    for old in states[:-MAX_JOBS]:
+        for path in glob.glob(old[:-5] + '.*'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def load(job_id):
+    """State dict of a job (from any worker), or None; orphaned jobs come back failed."""
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        with open(_path(job_id, '.json')) as handle:
+            state = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if state['state'] in ('queued', 'running') and time.time() - state['updated'] > STALE_AFTER:
+        # Nobody has written this state for STALE_AFTER seconds: its worker is gone
+        state.update(state='failed', error='worker lost', status_code=500, updated=time.time())
+        _write_json(_path(job_id, '.json'), state)
+    return state
+
+
+def load_result(job_id):
+    """(result dict, MFCC memmap) of a finished job."""
+    with open(_path(job_id, '.result.json')) as handle:
+        result = json.load(handle)
+    return result, np.load(_path(job_id, '.npy'), mmap_mode='r')
+
+
+def status(state):
+    """Public view of a job state, with the URLs to follow it."""
+    base = f"/jobs/{state['id']}"
+    return dict(state, status_url=base, events_url=base + '/events', result_url=base + '/result')
+
+
+def events(job_id):
+    """SSE lines for one job: a progress event per change, then done/failed."""
+    last = None
+    last_sent = time.monotonic()
+    while True:
+        state = load(job_id)
+        if state is None:
+            yield 'event: failed\ndata: {"error": "Job not found"}\n\n'
+            return
+        view = (state['state'], state['stage'])
+        if view != last:
+            last, last_sent = view, time.monotonic()
+            kind = state['state'] if state['state'] in ('done', 'failed') else 'progress'
+            yield f'event: {kind}\ndata: {json.dumps(status(state))}\n\n'
+            if kind != 'progress':
+                return
+        elif time.monotonic() - last_sent > HEARTBEAT:
+            last_sent = time.monotonic()
+            yield ': keep-alive\n\n'
+        time.sleep(POLL_INTERVAL)
+
+
+def register(app):
+    """Add the /jobs endpoints to a Flask app."""
+    from flask import Response, jsonify, request, stream_with_context
+
+    import serialization
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        state = load(job_id)
+        if state is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(status(state))
+
+    @app.route('/jobs/<job_id>/events', methods=['GET'])
+    def job_events(job_id):
+        if load(job_id) is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return Response(stream_with_context(events(job_id)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/jobs/<job_id>/result', methods=['GET'])
+    def job_result(job_id):
+        state = load(job_id)
+        if state is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if state['state'] == 'failed':
+            body = {'error': state['error'], 'job': status(state)}
+            return jsonify(body), state['status_code'] or 500
+        if state['state'] != 'done':
+            return jsonify(status(state)), 202
+        try:
+            fmt, compression = serialization.negotiate(request)
+        except serialization.FormatError as e:
+            return jsonify({'error': str(e)}), 400
+        result, mfcc = load_result(job_id)
+        return serialization.mfcc_response(result, mfcc, fmt, compression)
+
+    return app
+
+
+def busy_response(error):
+    """503 + Retry-After for a full queue (call inside a request)."""
+    from flask import jsonify
+    response = jsonify({'error': 'Job queue is full, retry later', 'details': str(error)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response
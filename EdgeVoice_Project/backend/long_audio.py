@@ -0,0 +1,131 @@
+"""
+Bounded-memory analysis of long recordings (meetings, hour-long logs).
+
+/upload decodes the whole file and returns every MFCC frame, so memory
+grows with the duration. /upload_long instead decodes the upload block by
+block (audio_io.iter_audio_blocks), pushes each block through a streaming
+MFCC + detector session that carries the STFT overlap between blocks, and
+returns only what stays small:
+
+    curl -F audio=@meeting.wav -F store=1 http://localhost:5000/upload_long
+
+    {"duration": 3600.0, "frames": 112501, "blocks": 360,
+     "stats": {...},                      whole-recording mean/std/energy/rms
+     "events": [{"keyword", "start_time", "end_time", "wake_range", ...}],
+     "feature_id": "..."}                 with store=1: /download_mfcc?id=...
+
+Peak memory is one block (BLOCK_SECONDS of native-rate audio) plus its
+frames, whatever the duration. Werkzeug spools large uploads to a
+temporary file, and a raw audio/wav request body is read straight off the
+socket. With store=1 the frames are written to the feature store as they
+are computed; without it, silent blocks skip MFCC entirely (vad=0 turns
+that off). Frames match /upload's, except that top_db is measured against
+the loudest frame so far instead of the whole file's peak.
+
+Uploads to this route may be up to EDGEVOICE_MAX_LONG_UPLOAD_MB (default
+2048) instead of the usual EDGEVOICE_MAX_UPLOAD_MB.
+"""
+
+import os
+import time
+
+import audio_io
+import feature_store
+import metrics
+import streaming
+
+ROUTE = '/upload_long'
+BLOCK_SECONDS = audio_io.BLOCK_SECONDS
+MAX_UPLOAD_BYTES = int(float(os.environ.get('EDGEVOICE_MAX_LONG_UPLOAD_MB', 2048)) * 1024 * 1024)
+
+
+def analyze(stream, pipe, ext='.wav', gate=True, writer=None, block_seconds=BLOCK_SECONDS,
+            resample_mode=None):
+    """
+    Stream a file object through MFCC and the wake-word detector block by
+    block. Frames go to writer (a feature_store.FeatureWriter) when given;
+    the VAD gate is then off, so the stored matrix has every frame.
+    """
+    session = streaming.WakewordSession(gate=gate and writer is None, **pipe.wakeword_params)
+    events = []
+    n_blocks = 0
+    for y in audio_io.iter_audio_blocks(stream, ext, pipe.sr, block_seconds, resample_mode):
+        n_blocks += 1
+        with metrics.stage('mfcc_detect'):
+            frames, new_events = session.push(y)
+        if writer is not None and frames.shape[1]:
+            writer.append(frames)
+        events += new_events
+    with metrics.stage('mfcc_detect'):
+        frames, new_events = session.flush()
+    if writer is not None:
+        writer.append(frames)
+    events += new_events
+
+    stats = session.mfcc.stats
+    return {
+        'duration': round(session.mfcc.n_samples / pipe.sr, 2),
+        'frames': session.mfcc.n_frames,
+        'blocks': n_blocks,
+        'vad_skipped_blocks': session.gated_chunks,
+        'stats': stats.to_dict(pipe.sr),
+        'keyword': events[0]['keyword'] if events else None,
+        'events': [{k: v for k, v in e.items() if k != 'mfcc'} for e in events]
+    }
+
+
+def register(app, pipe):
+    """Add POST /upload_long to a Flask app and raise the body limit for that route only."""
+    from flask import jsonify, request
+
+    base = app.request_class
+
+    class LongUploadRequest(base):
+        @property
+        def max_content_length(self):
+            if self.path == ROUTE:
+                return MAX_UPLOAD_BYTES
+            return base.max_content_length.fget(self)
+
+    app.request_class = LongUploadRequest
+
+    @app.route(ROUTE, methods=['POST'])
+    def upload_long():
+        audio = request.files.get('audio')
+        if audio is not None:
+            stream = audio.stream
+            filename = audio.filename
+        elif request.mimetype.startswith('audio/'):
+            stream = request.stream
+            filename = request.args.get('filename')
+        else:
+            return jsonify({'error': 'POST form-data field "audio" '
+                                     'or an audio/* request body'}), 400
+        ext = os.path.splitext(filename)[1] if filename else '.wav'
+        options = request.form if audio is not None else request.args
+        gate = options.get('vad', '1') != '0'
+        store = options.get('store') == '1'
+
+        start = time.perf_counter()
+        writer = None
+        if store:
+            writer = feature_store.store.writer(filename=filename, source='upload_long', sr=pipe.sr)
+        try:
+            result = analyze(stream, pipe, ext, gate=gate, writer=writer,
+                             resample_mode=options.get('resample_mode'))
+        except audio_io.DecodeError as e:
+            if writer is not None:
+                writer.discard()
+            return jsonify({'error': 'Could not decode audio', 'details': str(e)}), 415
+        except Exception:
+            if writer is not None:
+                writer.discard()
+            raise
+        if writer is not None:
+            result['feature_id'] = writer.close(keyword=result['keyword'],
+                                                duration=result['duration'])
+        result['processing_seconds'] = round(time.perf_counter() - start, 3)
+        metrics.record_detection(ROUTE, result['keyword'])
+        return jsonify(result)
+
+    return app
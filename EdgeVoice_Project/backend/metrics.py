@@ -0,0 +1,269 @@
+"""
+Prometheus-style metrics for the EdgeVoice backend, without extra dependencies.
+
+    with metrics.stage('mfcc'):
+        mfcc = compute_mfcc(y, sr)
+
+    metrics.instrument(app)   # per-route counts/latency/payload sizes + GET /metrics
+
+Exposed series (text format 0.0.4):
+
+    edgevoice_requests_total{route,method,status}     counter
+    edgevoice_request_seconds{route}                   histogram
+    edgevoice_request_bytes{route}                     histogram of request bodies
+    edgevoice_response_bytes{route}                    histogram of response bodies
+    edgevoice_stage_seconds{stage}                     histogram: decode, resample, vad, mfcc,
+                                                       features, detect, serialize
+    edgevoice_detections_total{route,detected}         counter, detector hit rate
+    edgevoice_vad_chunks_total{decision}               counter, chunks the VAD gate passed/skipped
+    edgevoice_batch_size                               histogram of micro-batch sizes (batcher.py)
+    edgevoice_batch_wait_seconds                       histogram of time requests queue for a batch
+    edgevoice_requests_in_flight                       gauge
+
+plus whatever callbacks registered with add_collector() report (the result
+cache counters, for example). Values are per process: under gunicorn each
+worker keeps its own, so scrape every worker or use a single worker for
+exact totals.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+_START_TIME = time.time()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_one(key, value))
+        return lines
+
+    def _render_one(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self):
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_one(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            cumulative += n
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            labels = _format_labels(self.labelnames, key, [('le', le)])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+REGISTRY = []
+_COLLECTORS = []
+
+requests_total = Counter('edgevoice_requests_total', 'HTTP requests by route, method and status',
+                         ('route', 'method', 'status'))
+request_seconds = Histogram('edgevoice_request_seconds', 'Request latency by route', ('route',))
+request_bytes = Histogram('edgevoice_request_bytes', 'Request body size by route', ('route',),
+                          SIZE_BUCKETS)
+response_bytes = Histogram('edgevoice_response_bytes', 'Response body size by route', ('route',),
+                           SIZE_BUCKETS)
+stage_seconds = Histogram('edgevoice_stage_seconds', 'Time spent per pipeline stage', ('stage',))
+detections_total = Counter('edgevoice_detections_total', 'Detector runs by route and outcome',
+                           ('route', 'detected'))
+vad_chunks_total = Counter('edgevoice_vad_chunks_total', 'Chunks seen by the VAD gate by decision',
+                           ('decision',))
+batch_size = Histogram('edgevoice_batch_size', 'Requests per micro-batch', buckets=BATCH_BUCKETS)
+batch_wait_seconds = Histogram('edgevoice_batch_wait_seconds',
+                               'Time a request waited for its micro-batch')
+in_flight = Gauge('edgevoice_requests_in_flight', 'Requests currently being handled')
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block into edgevoice_stage_seconds{stage=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=name)
+
+
+def record_detection(route, detected):
+    detections_total.inc(route=route, detected='true' if detected else 'false')
+
+
+def record_vad(gated):
+    vad_chunks_total.inc(decision='skipped' if gated else 'passed')
+
+
+def record_batch(size, waits):
+    batch_size.observe(size)
+    for wait in waits:
+        batch_wait_seconds.observe(wait)
+
+
+def add_collector(callback):
+    """Register callback() -> [(name, type, help, value)] evaluated at scrape time."""
+    _COLLECTORS.append(callback)
+
+
+def cache_collector(cache):
+    """Collector for a result_cache.ResultCache's counters."""
+    def collect():
+        stats = cache.stats()
+        return [
+            ('edgevoice_cache_hits_total', 'counter', 'Result cache hits (memory and disk)',
+             stats['hits'] + stats['disk_hits']),
+            ('edgevoice_cache_misses_total', 'counter', 'Result cache misses', stats['misses']),
+            ('edgevoice_cache_evictions_total', 'counter', 'Result cache LRU evictions',
+             stats['evictions']),
+            ('edgevoice_cache_bytes', 'gauge', 'Bytes held by the in-memory result cache',
+             stats['bytes'])
+        ]
+    return collect
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines += ['# HELP edgevoice_uptime_seconds Seconds since the process started',
+              '# TYPE edgevoice_uptime_seconds gauge',
+              f'edgevoice_uptime_seconds {time.time() - _START_TIME:.3f}']
+    for callback in _COLLECTORS:
+        for name, kind, help_text, value in callback():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}',
+                      f'{name} {_format_value(value)}']
+    return '\n'.join(lines) + '\n'
+
+
+def snapshot():
+    """Small load summary for health checks."""
+    return {
+        'uptime_seconds': round(time.time() - _START_TIME, 1),
+        'requests_total': int(requests_total.total()),
+        'requests_in_flight': int(in_flight.value())
+    }
+
+
+def instrument(app):
+    """Count, time and size every request of a Flask app and add GET /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            in_flight.dec()
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            requests_total.inc(route=route, method=request.method, status=response.status_code)
+            request_seconds.observe(time.perf_counter() - start, route=route)
+            if request.content_length:
+                request_bytes.observe(request.content_length, route=route)
+            if response.content_length is not None:
+                response_bytes.observe(response.content_length, route=route)
+        return response
+
+    @app.teardown_request
+    def _unfinished_request(exc):
+        # after_request does not run when a view raises past the error handlers
+        if g.pop('metrics_start', None) is not None:
+            in_flight.dec()
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -1,15 +1,24 @@
-import librosa
-import numpy as np
+import os
+
+import pipeline
+
+
+def load_audio(filename):
+    """Decode a file to mono float32 at the pipeline rate, resampled like librosa.load (soxr HQ)."""
+    with open(filename, 'rb') as handle:
+        data = handle.read()
+    return pipeline.default.decode(data, os.path.splitext(filename)[1], resample_mode='hq')
+
 
 def extract_mfcc(filename, full=False):
-    y, sr = librosa.load(filename, sr=16000)
-    mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-    stats = {
-        'mean': np.mean(mfcc, axis=1).round(3).tolist(),
-        'std': np.std(mfcc, axis=1).round(3).tolist(),
-        'energy': float(np.sum(y ** 2) / len(y)),
-        'duration': round(len(y) / sr, 2)
-    }
+    pipe = pipeline.default
+    y = load_audio(filename)
+    mfcc = pipe.features(y)
     if full:
-        return mfcc, stats
+        return mfcc, pipe.stats(mfcc, y)
     return mfcc.mean(axis=1)
+
+
+def extract_features(filename, outputs=('mfcc', 'delta', 'delta2')):
+    """Several features of a file from one STFT (log_mel, mfcc, delta, delta2, energy, ...)."""
+    return pipeline.default.extract(load_audio(filename), outputs)
@@ -0,0 +1,174 @@
+"""
+The decode -> MFCC -> stats -> detect pipeline, configured once.
+
+Every entry point (Flask apps, Streamlit, batch CLI, mfcc.extract_mfcc)
+goes through a Pipeline, so they agree on parameters and a speed-up in
+one stage lands everywhere:
+
+    pipe = pipeline.default                    # 16 kHz, 13 MFCCs, configured detector
+    result = pipe.process(data, ext='.wav')    # bytes or float32 samples at pipe.sr
+    results = pipe.process_batch(buffers)      # one FFT and one detector call for all buffers
+    key = pipe.cache_key(data, ext='.wav')     # result_cache key for this configuration
+    WakewordSession(gate=True, **pipe.wakeword_params)   # streaming, same frames and decisions
+
+A result is {'mfcc', 'stats', 'sr', 'keyword', 'wake_range', 'confidence',
+'scores', 'detect_error'}, with confidence in percent. The stages are also
+usable on their own (decode, features, stats, detect); each is timed into
+the metrics stage histogram. pipe.extract(y, ('log_mel', 'mfcc', 'delta'))
+derives several features from a single STFT (feature_graph).
+"""
+
+import numpy as np
+
+import audio_io
+import metrics
+import result_cache
+from command_detect import HEURISTIC_CALIBRATION, load_detector, stack_mfcc
+from feature_graph import FeatureSet
+from feature_stats import FeatureStats
+from features import (SAMPLE_RATE, N_MFCC, N_FFT, HOP_LENGTH, N_MELS, TOP_DB, get_transforms,
+                      mfcc_batch)
+
+
+class Pipeline:
+    """Decode, MFCC, stats and wake-word detection with fixed parameters and shared transforms."""
+
+    def __init__(self, sr=SAMPLE_RATE, n_mfcc=N_MFCC, n_fft=N_FFT, hop_length=HOP_LENGTH,
+                 n_mels=N_MELS, top_db=TOP_DB, detector=None, resample_mode=None):
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.top_db = top_db
+        self.resample_mode = resample_mode
+        self.transforms = get_transforms(sr, n_fft, hop_length, n_mels, n_mfcc)
+        self.detector = load_detector() if detector is None else detector
+
+    @property
+    def params(self):
+        """Everything that changes a result, for cache keys."""
+        t = self.transforms
+        return {'sr': self.sr, 'n_mfcc': self.n_mfcc, 'n_fft': t.n_fft, 'hop_length': t.hop_length,
+                'n_mels': t.n_mels, 'top_db': self.top_db, 'resample_mode': self.resample_mode,
+                'detector': [self.detector.name, getattr(self.detector, 'model_path', None),
+                             getattr(self.detector, 'calibration', None)]}
+
+    @property
+    def stream_params(self):
+        """streaming.StreamingMFCC keywords that give the same frames as features()."""
+        t = self.transforms
+        return {'sr': self.sr, 'n_mfcc': self.n_mfcc, 'n_fft': t.n_fft, 'hop_length': t.hop_length,
+                'n_mels': t.n_mels, 'top_db': self.top_db}
+
+    @property
+    def wakeword_params(self):
+        """
+        streaming.WakewordSession keywords: stream_params plus the heuristic
+        detector's calibration (the streaming detector is always the heuristic).
+        """
+        heuristic = self.detector.name == 'heuristic'
+        calibration = self.detector.calibration if heuristic else HEURISTIC_CALIBRATION
+        return dict(self.stream_params, calibration=calibration)
+
+    def cache_key(self, data, **extra):
+        """result_cache key of data under this configuration; extra entries override params."""
+        return result_cache.cache_key(data, **dict(self.params, **extra))
+
+    def decode(self, data, ext='.wav', resample_mode=None, **raw):
+        """Upload bytes -> mono float32 at self.sr (raw: raw_format, raw_sr, raw_channels)."""
+        with metrics.stage('decode'):
+            y, _ = audio_io.decode_audio(data, ext, sr=self.sr,
+                                         resample_mode=resample_mode or self.resample_mode, **raw)
+        return y
+
+    def features(self, y):
+        """MFCC matrix (n_mfcc x frames), the same as librosa.feature.mfcc."""
+        with metrics.stage('mfcc'):
+            return FeatureSet(y, self.transforms, self.top_db)['mfcc']
+
+    def extract(self, y, outputs=('mfcc',)):
+        """
+        Several features of y from one STFT, e.g. ('log_mel', 'mfcc', 'delta',
+        'cmvn', 'energy'); returns {name: value}. Only the requested nodes and
+        what they depend on are computed (see feature_graph.NODES).
+        """
+        with metrics.stage('features'):
+            return FeatureSet(y, self.transforms, self.top_db).compute(outputs)
+
+    def features_batch(self, signals):
+        """features() of several signals, with one FFT and one pair of matrix multiplies for all."""
+        with metrics.stage('mfcc'):
+            return mfcc_batch(signals, self.transforms, self.top_db)
+
+    def stats(self, mfcc, y):
+        """Per-coefficient mean/std, energy, RMS, frame count and duration (see feature_stats)."""
+        return FeatureStats.of(mfcc, y).to_dict(self.sr)
+
+    def detect(self, mfcc):
+        """Detector result dict: keyword, wake_range, confidence (0-1), scores."""
+        with metrics.stage('detect'):
+            return self.detector.detect(mfcc)
+
+    def detect_batch(self, mfccs):
+        """detect() of several MFCC matrices in one vectorized detector call."""
+        if not mfccs:
+            return []
+        with metrics.stage('detect'):
+            return self.detector.detect_batch(*stack_mfcc(mfccs))
+
+    def _result(self, y, mfcc, detection, error=None):
+        keyword = detection['keyword'] if detection else None
+        wake_range = detection['wake_range'] if detection else None
+        return {
+            'mfcc': mfcc,
+            'stats': self.stats(mfcc, y),
+            'sr': self.sr,
+            'keyword': keyword,
+            'wake_range': [int(x) for x in wake_range] if wake_range else None,
+            'confidence': float(detection['confidence'] * 100) if keyword else None,
+            'scores': detection['scores'] if detection else None,
+            'detect_error': error
+        }
+
+    def _samples(self, buffer, ext, raw):
+        if isinstance(buffer, np.ndarray):
+            return buffer.astype(np.float32, copy=False)
+        return self.decode(buffer, ext, **raw)
+
+    def process(self, buffer, ext='.wav', on_stage=None, **raw):
+        """
+        Run the whole pipeline on upload bytes (decoded here) or float32
+        samples already at self.sr. A failing detector leaves the
+        detection fields None and its message in detect_error instead of
+        failing the request. on_stage(name) is called as each stage
+        starts ('decode', 'mfcc', 'detect', 'stats'), for job progress.
+        """
+        on_stage = on_stage or (lambda stage: None)
+        if not isinstance(buffer, np.ndarray):
+            on_stage('decode')
+        y = self._samples(buffer, ext, raw)
+        on_stage('mfcc')
+        mfcc = self.features(y)
+        on_stage('detect')
+        try:
+            detection, error = self.detect(mfcc), None
+        except Exception as e:
+            detection, error = None, str(e)
+        on_stage('stats')
+        return self._result(y, mfcc, detection, error)
+
+    def process_batch(self, buffers, ext='.wav', **raw):
+        """process() for several buffers, with one batched detector call for all of them."""
+        signals = [self._samples(buffer, ext, raw) for buffer in buffers]
+        if not signals:
+            return []
+        mfccs = self.features_batch(signals)
+        error = None
+        try:
+            detections = self.detect_batch(mfccs)
+        except Exception as e:
+            detections, error = [None] * len(mfccs), str(e)
+        return [self._result(y, mfcc, detection, error)
+                for y, mfcc, detection in zip(signals, mfccs, detections)]
+
+
+# Process-wide pipeline at the service defaults (detector from EDGEVOICE_DETECTOR)
+default = Pipeline()
@@ -0,0 +1,224 @@
+"""
+Opt-in per-request profiling, off unless EDGEVOICE_PROFILING=1.
+
+Without that flag register() adds nothing: no hooks and no /debug routes.
+With it, a request is profiled when it carries ``X-EdgeVoice-Profile: 1``
+or ``?profile=1`` (deterministic cProfile), or ``stacks`` instead of 1
+(sampling profiler, flamegraph-ready collapsed stacks). Flagged requests
+are profiled with probability EDGEVOICE_PROFILE_RATE (default 1.0).
+Unflagged requests only pay for one header lookup.
+
+When EDGEVOICE_PROFILE_TOKEN is set, flagging a request and every /debug
+route also need ``X-EdgeVoice-Profile-Token: <token>`` (or
+``?profile_token=``); set it whenever the server is reachable by others,
+since the dumps show code paths and timings.
+
+The response carries X-EdgeVoice-Profile-Id; fetch the artifact from
+
+    GET /debug/profiles                       newest first
+    GET /debug/profiles/<id>                  cProfile: top functions as text
+    GET /debug/profiles/<id>?format=prof      cProfile: binary pstats (snakeviz, pstats)
+    GET /debug/profiles/<id>?format=collapsed stacks: "a;b;c count" lines for flamegraph.pl
+                                              or speedscope
+
+Artifacts go to EDGEVOICE_PROFILE_DIR (default <tmp>/edgevoice_profiles),
+shared by all workers; only the newest MAX_PROFILES are kept.
+"""
+
+import cProfile
+import glob
+import hmac
+import io
+import json
+import marshal
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+ENABLED = os.environ.get('EDGEVOICE_PROFILING', '0') == '1'
+TOKEN = os.environ.get('EDGEVOICE_PROFILE_TOKEN')
+SAMPLE_RATE = float(os.environ.get('EDGEVOICE_PROFILE_RATE', 1.0))
+PROFILE_DIR = os.environ.get('EDGEVOICE_PROFILE_DIR',
+                             os.path.join(tempfile.gettempdir(), 'edgevoice_profiles'))
+MAX_PROFILES = 50
+SAMPLE_INTERVAL = 0.001   # seconds between stack samples; use cProfile for very short requests
+HEADER = 'X-EdgeVoice-Profile'
+TOKEN_HEADER = 'X-EdgeVoice-Profile-Token'
+
+# cProfile can only be active in one thread at a time on Python 3.12+
+_cprofile_lock = threading.Lock()
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _authorized(request):
+    if not TOKEN:
+        return True
+    given = request.headers.get(TOKEN_HEADER) or request.args.get('profile_token') or ''
+    return hmac.compare_digest(given.encode(), TOKEN.encode())
+
+
+def _requested_mode(request):
+    flag = request.headers.get(HEADER) or request.args.get('profile')
+    if not flag or flag == '0' or not _authorized(request):
+        return None
+    if SAMPLE_RATE < 1.0 and random.random() >= SAMPLE_RATE:
+        return None
+    return 'stacks' if flag == 'stacks' else 'cprofile'
+
+
+def _save(profile_id, meta, payload):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    ext = '.prof' if meta['mode'] == 'cprofile' else '.collapsed'
+    with open(os.path.join(PROFILE_DIR, profile_id + ext), 'wb') as handle:
+        handle.write(payload)
+    with open(os.path.join(PROFILE_DIR, profile_id + '.json'), 'w') as handle:
+        json.dump(meta, handle)
+    metas = sorted(glob.glob(os.path.join(PROFILE_DIR, '*.json')), key=os.path.getmtime)
+    for old in metas[:-MAX_PROFILES]:
+        for path in glob.glob(old[:-5] + '.*'):
+            os.remove(path)
+
+
+def list_profiles():
+    metas = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, '*.json')):
+        try:
+            with open(path) as handle:
+                metas.append(json.load(handle))
+        except (OSError, ValueError):
+            continue
+    return sorted(metas, key=lambda m: m['created'], reverse=True)
+
+
+def load_profile(profile_id, fmt=None):
+    """(body, mimetype) for a stored profile, or None."""
+    if not all(c in '0123456789abcdef' for c in profile_id):
+        return None
+    prof = os.path.join(PROFILE_DIR, profile_id + '.prof')
+    collapsed = os.path.join(PROFILE_DIR, profile_id + '.collapsed')
+    if os.path.exists(collapsed):
+        with open(collapsed, 'rb') as handle:
+            return handle.read(), 'text/plain'
+    if not os.path.exists(prof):
+        return None
+    if fmt == 'prof':
+        with open(prof, 'rb') as handle:
+            return handle.read(), 'application/octet-stream'
+    out = io.StringIO()
+    pstats.Stats(prof, stream=out).strip_dirs().sort_stats('cumulative').print_stats(40)
+    return out.getvalue().encode(), 'text/plain'
+
+
+def register(app):
+    """Add profiling hooks and /debug/profiles endpoints to a Flask app (EDGEVOICE_PROFILING=1)."""
+    if not ENABLED:
+        return False
+    from flask import g, jsonify, request, Response
+
+    @app.before_request
+    def _start_profile():
+        mode = _requested_mode(request)
+        if mode == 'cprofile' and not _cprofile_lock.acquire(blocking=False):
+            mode = 'stacks'   # another request holds cProfile; sample this one instead
+        if mode is None:
+            return
+        g.profile = {'mode': mode, 'start': time.perf_counter()}
+        if mode == 'cprofile':
+            g.profile['profiler'] = profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            g.profile['profiler'] = sampler = StackSampler(threading.get_ident())
+            sampler.start()
+
+    def _finish(response=None):
+        state = g.pop('profile', None)
+        if state is None:
+            return None
+        profiler = state['profiler']
+        if state['mode'] == 'cprofile':
+            profiler.disable()
+            _cprofile_lock.release()
+            # Same bytes Stats.dump_stats() writes, without a temp file
+            payload = marshal.dumps(pstats.Stats(profiler).stats)
+        else:
+            profiler.stop()
+            payload = profiler.collapsed().encode()
+        profile_id = uuid.uuid4().hex
+        _save(profile_id, {
+            'id': profile_id,
+            'mode': state['mode'],
+            'route': request.path,
+            'method': request.method,
+            'status': response.status_code if response is not None else None,
+            'duration_ms': round((time.perf_counter() - state['start']) * 1000, 2),
+            'created': time.time()
+        }, payload)
+        return profile_id
+
+    @app.after_request
+    def _stop_profile(response):
+        profile_id = _finish(response)
+        if profile_id:
+            response.headers['X-EdgeVoice-Profile-Id'] = profile_id
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # The view raised past the error handlers: still stop the profiler
+        if 'profile' in g:
+            _finish()
+
+    @app.route('/debug/profiles', methods=['GET'])
+    def debug_profiles():
+        if not _authorized(request):
+            return jsonify({'error': 'Profile token required'}), 403
+        return jsonify({'profiles': list_profiles()})
+
+    @app.route('/debug/profiles/<profile_id>', methods=['GET'])
+    def debug_profile(profile_id):
+        if not _authorized(request):
+            return jsonify({'error': 'Profile token required'}), 403
+        found = load_profile(profile_id, request.args.get('format'))
+        if found is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        body, mimetype = found
+        return Response(body, mimetype=mimetype)
+
+    return True
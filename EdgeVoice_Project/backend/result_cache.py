@@ -0,0 +1,164 @@
+"""
+Content-addressed cache of decode -> MFCC -> detection results.
+
+The key is a hash of the uploaded bytes plus every parameter that changes
+the result, so a re-uploaded file (retries, the same test clip from
+several dashboards) skips the whole pipeline:
+
+    key = cache_key(data, ext='.wav', sr=16000, n_mfcc=13)
+    value = cache.get(key)            # dict of arrays and JSON values, or None
+    cache.put(key, value)
+
+The in-process tier is an LRU bounded by size (EDGEVOICE_CACHE_MB, default
+64). Setting EDGEVOICE_CACHE_DIR adds an on-disk .npz tier shared by all
+workers and kept under EDGEVOICE_CACHE_DISK_MB (default 1024); disk hits
+are promoted to memory. stats() reports hits/misses for sizing.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_BYTES = int(float(os.environ.get('EDGEVOICE_CACHE_MB', 64)) * 1024 * 1024)
+DISK_DIR = os.environ.get('EDGEVOICE_CACHE_DIR') or None
+DISK_MAX_BYTES = int(float(os.environ.get('EDGEVOICE_CACHE_DISK_MB', 1024)) * 1024 * 1024)
+
+ENTRY_OVERHEAD = 1024   # rough size of an entry's dict, stats and key
+_DISK_TRIM_EVERY = 64   # writes between disk size checks
+
+
+def cache_key(data, **params):
+    """Hex digest of the content bytes and the extraction parameters."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(memoryview(data).cast('B'))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _entry_size(value):
+    return ENTRY_OVERHEAD + sum(v.nbytes for v in value.values() if isinstance(v, np.ndarray))
+
+
+class ResultCache:
+    """Size-bounded LRU of key -> {name: ndarray or JSON value}, with an optional disk tier."""
+
+    def __init__(self, max_bytes=MAX_BYTES, disk_dir=DISK_DIR, disk_max_bytes=DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._put_memory(key, value)
+        return value
+
+    def put(self, key, value):
+        """Cache value; its arrays are made read-only since hits share them."""
+        self._put_memory(key, value)
+        self._write_disk(key, value)
+
+    def _put_memory(self, key, value):
+        for v in value.values():
+            if isinstance(v, np.ndarray):
+                v.setflags(write=False)
+        size = _entry_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._items[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + '.npz')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with np.load(self._path(key), allow_pickle=False) as npz:
+                value = json.loads(str(npz['__meta__']))
+                value.update({name: npz[name] for name in npz.files if name != '__meta__'})
+            os.utime(self._path(key))   # disk trimming is oldest-first by mtime
+        except (OSError, ValueError, KeyError):
+            return None
+        return value
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        arrays = {k: v for k, v in value.items() if isinstance(v, np.ndarray)}
+        meta = {k: v for k, v in value.items() if not isinstance(v, np.ndarray)}
+        os.makedirs(self.disk_dir, exist_ok=True)
+        tmp = f'{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as handle:
+            np.savez(handle, __meta__=np.array(json.dumps(meta, default=float)), **arrays)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._disk_writes += 1
+            trim = self._disk_writes % _DISK_TRIM_EVERY == 0
+        if trim:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        files = []
+        for path in glob.glob(os.path.join(self.disk_dir, '*.npz')):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.disk_hits) / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'items': len(self._items),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_dir': self.disk_dir
+            }
+
+
+cache = ResultCache()
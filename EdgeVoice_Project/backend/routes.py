@@ -0,0 +1,266 @@
+"""
+Request handling shared by app.py and app_stable.py.
+
+The two apps differ in logging, error bodies and the 'success' field;
+what a route computes lives here once, so a change to /upload, /stream_mfcc
+or /wakeword_detect lands in both:
+
+    result, mfcc = routes.stream_mfcc(pipe, data, file_ext, request.form)
+    result = routes.wakeword_detect(pipe, wake_batcher, data, request.form)
+    result, mfcc = routes.run_upload(pipe, data, file_ext, filename, session_id)  # jobs.submit too
+    mfcc, pcm, bits = routes.accelerator_inputs(pipe, data, file_ext, request.form)  # 415 / 400
+
+Helpers take the decoded upload bytes and the form (any mapping with
+Werkzeug's get(key, default, type=)) and return plain dicts; the apps
+add their own fields and build the response.
+"""
+
+import json
+import logging
+import time
+
+import numpy as np
+
+import artifacts
+import audio_io
+import feature_store
+import metrics
+import result_cache
+import streaming
+import vad
+
+logger = logging.getLogger(__name__)
+
+
+INVALID_MFCC = 'Invalid MFCC data format'
+
+
+class PayloadError(ValueError):
+    """A missing or malformed request field (400); details says what is wrong with it."""
+
+    status_code = 400
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details
+
+    def to_dict(self):
+        """The JSON error fields, {'error', 'details'} (details only when set)."""
+        body = {'error': str(self)}
+        if self.details:
+            body['details'] = self.details
+        return body
+
+
+def decode_params(form):
+    """Raw PCM / resampling options of a chunk upload, as Pipeline.decode keywords."""
+    return dict(raw_format=form.get('format'),
+                raw_sr=form.get('sample_rate', type=int),
+                resample_mode=form.get('resample_mode'))
+
+
+def mfcc_matrix(data):
+    """
+    A posted MFCC (nested lists from JSON, or an array) as a finite float32
+    (n_mfcc, frames) matrix. 1-D, ragged, empty or non-numeric input raises
+    PayloadError instead of failing later inside NumPy or fixed_point.
+    """
+    if not isinstance(data, (list, np.ndarray)):
+        raise PayloadError(INVALID_MFCC, f'mfcc must be a list of rows, got {type(data).__name__}')
+    try:
+        mfcc = np.asarray(data, dtype=np.float32)
+    except (TypeError, ValueError) as e:
+        raise PayloadError(INVALID_MFCC,
+                           f'mfcc must be a rectangular matrix of numbers ({e})') from e
+    if mfcc.ndim != 2:
+        raise PayloadError(INVALID_MFCC,
+                           f'mfcc must be 2-D (coefficients x frames), got {mfcc.ndim}-D')
+    if mfcc.size == 0:
+        raise PayloadError(INVALID_MFCC, f'mfcc is empty (shape {list(mfcc.shape)})')
+    if not np.isfinite(mfcc).all():
+        raise PayloadError(INVALID_MFCC, 'mfcc contains NaN, infinite or null values')
+    return mfcc
+
+
+def accelerator_inputs(pipe, data, file_ext, form):
+    """
+    Inputs of /accelerate as (mfcc, pcm, bits). data is optional audio: it
+    is decoded to int16 pcm for the fixed-point front end, and its MFCC is
+    used when the form has no mfcc matrix. Undecodable audio raises
+    audio_io.DecodeError (415); a missing or malformed mfcc or bits field
+    raises PayloadError (400).
+    """
+    pcm = None
+    if data is not None:
+        try:
+            y = pipe.decode(data, file_ext)
+        except Exception as e:
+            raise audio_io.DecodeError(str(e) or type(e).__name__) from e
+        pcm = np.clip(np.round(y * 32768.0), -32768, 32767).astype(np.int16)
+
+    mfcc_json = form.get('mfcc', '[]')
+    if (not mfcc_json or mfcc_json == '[]') and pcm is None:
+        raise PayloadError('No MFCC data provided')
+    try:
+        mfcc_data = json.loads(mfcc_json) if mfcc_json else []
+    except json.JSONDecodeError as e:
+        raise PayloadError('Invalid JSON data', str(e)) from e
+    if pcm is not None and not mfcc_data:
+        mfcc_data = pipe.features(pcm / np.float32(32768.0))
+    mfcc = mfcc_matrix(mfcc_data)
+
+    bits = form.get('bits', '8')
+    if bits not in ('8', '16'):
+        raise PayloadError('bits must be 8 or 16')
+    return mfcc, pcm, int(bits)
+
+
+def run_upload(pipe, data, file_ext, original_filename, session_id, on_stage=None, envelope=None):
+    """
+    Cache lookup, decode, pipeline and storage for /upload; returns
+    (result, mfcc). Runs inline or as a jobs.submit() target, reporting
+    stages through on_stage. Decoder failures raise audio_io.DecodeError
+    (415). envelope holds fields the app puts first in every result.
+    """
+    on_stage = on_stage or (lambda stage: None)
+    # Same bytes + parameters as an earlier upload: reuse its result
+    cache_key = pipe.cache_key(data, route='upload', ext=file_ext)
+    cached = result_cache.cache.get(cache_key)
+    if cached is not None:
+        logger.info("Result cache hit, skipping decode/MFCC/detection")
+    else:
+        # WAV/PCM decode in memory; MP3, M4A etc. fall back to librosa/FFmpeg
+        on_stage('decode')
+        try:
+            y = pipe.decode(data, file_ext)
+        except Exception as e:
+            logger.error(f"Audio decode failed for {original_filename}: {e}")
+            raise audio_io.DecodeError(str(e) or type(e).__name__) from e
+        cached = pipe.process(y, on_stage=on_stage)
+        if cached['detect_error']:
+            logger.warning(f"Wake word detection failed: {cached['detect_error']}, "
+                           "continuing without it")
+        result_cache.cache.put(cache_key, cached)
+    mfcc, stats, sr = cached['mfcc'], cached['stats'], cached['sr']
+    wake_word, wake_range = cached['keyword'], cached['wake_range']
+    confidence, scores = cached['confidence'], cached['scores']
+    metrics.record_detection('/upload', wake_word)
+
+    on_stage('store')
+    artifacts.store.put(session_id, audio=bytes(data), ext=file_ext)
+    feature_store.store.put(mfcc, session_id, filename=original_filename, source='upload',
+                            keyword=wake_word, duration=stats['duration'], sr=sr)
+
+    # Native Python types only, for JSON
+    result = dict(envelope or {})
+    result.update({
+        'session_id': session_id,
+        'shape': [int(x) for x in mfcc.shape],
+        'stats': stats,
+        'wake_word': bool(wake_word),
+        'wake_range': [int(x) for x in wake_range] if wake_range else None,
+        'confidence': float(confidence) if confidence else None,
+        'timestamp': (int((wake_range[0] / mfcc.shape[1]) * stats['duration'] * 1000)
+                      if wake_range else None),
+        'keyword': wake_word,
+        'scores': scores
+    })
+    return result, mfcc
+
+
+def stream_mfcc(pipe, data, file_ext, form):
+    """
+    MFCC of one /stream_mfcc chunk; returns (result fields, mfcc). With a
+    session_id the frame overlap is carried across chunks and only the new
+    frames are returned (final=1 with the last chunk); without one the
+    chunk stands alone and goes through the result cache.
+    """
+    session_id = form.get('session_id')
+    final = form.get('final') == '1'
+    params = decode_params(form)
+
+    if session_id:
+        y = pipe.decode(data, file_ext, **params)
+        session = streaming.get_session(session_id, **pipe.stream_params)
+        frame_offset = session.n_frames
+        with metrics.stage('mfcc'):
+            mfcc = session.push(y)
+            if final:
+                mfcc = np.concatenate([mfcc, session.flush()], axis=1)
+        if final:
+            streaming.close_session(session_id)
+        stats = pipe.stats(mfcc, y)
+        # Running whole-session stats, merged chunk by chunk in the session
+        session_stats = session.stats.to_dict(pipe.sr)
+    else:
+        # A one-shot request depends only on its bytes and parameters, so it is cacheable
+        frame_offset = 0
+        session_stats = None
+        cache_key = pipe.cache_key(data, route='stream_mfcc', ext=file_ext, **params)
+        cached = result_cache.cache.get(cache_key)
+        if cached is None:
+            y = pipe.decode(data, file_ext, **params)
+            mfcc = pipe.features(y)
+            cached = {'mfcc': mfcc, 'stats': pipe.stats(mfcc, y)}
+            result_cache.cache.put(cache_key, cached)
+        mfcc, stats = cached['mfcc'], cached['stats']
+
+    return {
+        'shape': list(mfcc.shape),
+        'stats': stats,
+        'session_id': session_id,
+        'frame_offset': frame_offset,
+        'session_stats': session_stats
+    }, mfcc
+
+
+def wakeword_detect(pipe, batcher, data, form):
+    """
+    Wake-word detection on one /wakeword_detect chunk (raw PCM or WAV).
+    With a session_id the detector state and VAD hangover carry over
+    between chunks; one-shot chunks are VAD-gated and then micro-batched.
+    """
+    # Decode the chunk in memory (raw float32 from the wakeword page, or WAV)
+    y = pipe.decode(data, '.wav', **decode_params(form))
+    session_id = form.get('session_id')
+    # Voice-activity gate: silent chunks skip MFCC and detection (vad=0 turns it off)
+    gate = form.get('vad', '1') != '0'
+    events = []
+    if session_id:
+        # Running threshold, open segments and VAD hangover carry over between chunks
+        session = streaming.wakeword_sessions.get(session_id, gate=gate, **pipe.wakeword_params)
+        with metrics.stage('mfcc_detect'):
+            mfcc, events = session.push(y)
+        gated = session.gated
+        if form.get('final') == '1':
+            with metrics.stage('mfcc_detect'):
+                more_frames, more_events = session.flush()
+            mfcc = np.concatenate([mfcc, more_frames], axis=1)
+            events += more_events
+            streaming.wakeword_sessions.close(session_id)
+        detected_word = events[0]['keyword'] if events else None
+    else:
+        with metrics.stage('vad'):
+            gated = gate and not vad.is_speech(y)
+        if gated:
+            mfcc, detected_word = np.zeros((pipe.n_mfcc, 0), dtype=np.float32), None
+        else:
+            mfcc, detection = batcher.submit(y)
+            detected_word = detection['keyword']
+            events = [{'keyword': detected_word, 'wake_range': detection['wake_range'],
+                       'confidence': round(detection['confidence'], 4)}] if detected_word else []
+
+    if gate:
+        metrics.record_vad(gated)
+    metrics.record_detection('/wakeword_detect', detected_word)
+    return {
+        'detected': bool(detected_word),
+        'wake_word': form.get('wakeWord', 'hey assistant'),
+        'detected_word': detected_word,
+        'confidence': float(form.get('confidence', 0)),
+        'timestamp': int(time.time() * 1000),
+        'mfcc_shape': list(mfcc.shape),
+        'session_id': session_id,
+        'vad_skipped': gated,
+        'events': [{k: v for k, v in e.items() if k != 'mfcc'} for e in events]
+    }
@@ -0,0 +1,111 @@
+"""
+MFCC response encodings for /upload and /stream_mfcc.
+
+JSON stays the default. Binary encodings skip the nested-list conversion:
+
+    ?mfcc_format=f32 | f16   raw little-endian float32/float16, C order (n_mfcc x frames)
+    ?mfcc_format=npy         NumPy .npy file
+    ?compress=zlib | lz4     compress the binary body (lz4 needs the lz4 package)
+
+The format can also be negotiated with the Accept header
+(application/octet-stream -> f32, application/x-npy -> npy). Binary bodies
+carry the shape and dtype in X-MFCC-Shape / X-MFCC-Dtype and the remaining
+result fields (stats, wake word, ...) as JSON in X-EdgeVoice-Meta.
+"""
+
+import io
+import json
+import zlib
+
+import numpy as np
+from flask import jsonify, make_response
+
+import metrics
+
+try:
+    import lz4.frame
+except ImportError:  # optional dependency
+    lz4 = None
+
+FORMATS = ('json', 'f32', 'f16', 'npy')
+COMPRESSIONS = ('zlib', 'lz4')
+
+_DTYPES = {'f32': np.dtype('<f4'), 'f16': np.dtype('<f2')}
+_ACCEPT_FORMATS = {'application/octet-stream': 'f32', 'application/x-npy': 'npy'}
+
+# Headers the browser may read on a cross-origin response
+EXPOSED_HEADERS = ('X-MFCC-Shape, X-MFCC-Dtype, X-MFCC-Compression, X-EdgeVoice-Meta, '
+                   'X-EdgeVoice-Profile-Id')
+
+
+class FormatError(ValueError):
+    """Raised for an unknown or unavailable response encoding."""
+
+
+def negotiate(request):
+    """Pick (format, compression) from the query string/form, then the Accept header."""
+    fmt = request.values.get('mfcc_format')
+    if not fmt:
+        fmt = 'json'
+        for mimetype, _quality in request.accept_mimetypes:
+            if mimetype in _ACCEPT_FORMATS:
+                fmt = _ACCEPT_FORMATS[mimetype]
+                break
+            if mimetype in ('application/json', '*/*'):
+                break
+    if fmt not in FORMATS:
+        raise FormatError(f'Unknown format: {fmt} (expected one of {", ".join(FORMATS)})')
+
+    compression = request.values.get('compress') or None
+    if compression is not None and compression not in COMPRESSIONS:
+        raise FormatError(f'Unknown compression: {compression}')
+    if compression == 'lz4' and lz4 is None:
+        raise FormatError('lz4 compression requested but the lz4 package is not installed')
+    return fmt, compression
+
+
+def encode_mfcc(mfcc, fmt, compression=None):
+    """Serialize an MFCC matrix to bytes; returns (body, mimetype)."""
+    if fmt == 'npy':
+        buf = io.BytesIO()
+        np.save(buf, np.ascontiguousarray(mfcc, dtype=np.float32))
+        body, mimetype = buf.getvalue(), 'application/x-npy'
+    else:
+        body = np.ascontiguousarray(mfcc, dtype=_DTYPES[fmt]).tobytes()
+        mimetype = 'application/octet-stream'
+    if compression == 'zlib':
+        body = zlib.compress(body, 1)
+    elif compression == 'lz4':
+        body = lz4.frame.compress(body)
+    return body, mimetype
+
+
+def decode_mfcc(body, shape, dtype='float32', compression=None):
+    """Inverse of encode_mfcc for the raw formats (used by clients and tooling)."""
+    if compression == 'zlib':
+        body = zlib.decompress(body)
+    elif compression == 'lz4':
+        body = lz4.frame.decompress(body)
+    return np.frombuffer(body, dtype=np.dtype(dtype).newbyteorder('<')).reshape(shape)
+
+
+def mfcc_response(result, mfcc, fmt='json', compression=None):
+    """
+    Build the response for a result dict whose 'mfcc' entry is mfcc.
+
+    JSON keeps the existing payload; binary formats move everything except
+    the matrix into the X-EdgeVoice-Meta header.
+    """
+    with metrics.stage('serialize'):
+        if fmt == 'json':
+            return jsonify(dict(result, mfcc=mfcc.tolist()))
+        body, mimetype = encode_mfcc(mfcc, fmt, compression)
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.headers['X-MFCC-Shape'] = ','.join(str(int(x)) for x in mfcc.shape)
+    response.headers['X-MFCC-Dtype'] = 'float16' if fmt == 'f16' else 'float32'
+    if compression:
+        response.headers['X-MFCC-Compression'] = compression
+    meta = {k: v for k, v in result.items() if k != 'mfcc'}
+    response.headers['X-EdgeVoice-Meta'] = json.dumps(meta, separators=(',', ':'))
+    return response
@@ -0,0 +1,162 @@
+"""
+Cold-start control: import/warm-up timings, the warm-up pass and readiness.
+
+The apps import only what routing and the NumPy pipeline need; librosa
+and scipy.signal are loaded on first use. warm_up() then runs a synthetic
+clip through every stage a request can hit (WAV parsing, soxr resampling,
+FFT plans, the detector, streaming sessions, and librosa for compressed
+formats) so the first real request is as fast as the hundredth.
+
+EDGEVOICE_WARMUP picks when that happens:
+
+    sync        warm up before the app is returned (default; under gunicorn's
+                preload_app this runs once in the master, before forking)
+    background  serve immediately and warm up in a thread; /ready says 503
+                until it is done (gunicorn starts it in each worker after
+                fork; elsewhere the first request starts it)
+    off         no warm-up; ready at once
+
+EDGEVOICE_WARMUP_LIBROSA=0 leaves librosa out of the warm-up, so the first
+MP3/OGG/M4A upload pays for importing it.
+
+GET /ready is the readiness probe (200 once warmed, 503 before); /health
+stays a liveness check. Both report the timings collected here.
+"""
+
+import io
+import os
+import threading
+import time
+import wave
+
+MODES = ('sync', 'background', 'off')
+MODE = os.environ.get('EDGEVOICE_WARMUP', 'sync')
+WARMUP_LIBROSA = os.environ.get('EDGEVOICE_WARMUP_LIBROSA', '1') != '0'
+
+# Imported before anything heavy (numpy included), so this is the start of the app's imports
+_START = time.perf_counter()
+_last_mark = _START
+_ready = threading.Event()
+_lock = threading.Lock()
+_started = False
+
+# name -> milliseconds, in the order they happened
+timings = {}
+error = None
+
+
+def mark(name):
+    """Record the time since the previous mark (or since this module was imported) as name."""
+    global _last_mark
+    now = time.perf_counter()
+    timings[name] = round((now - _last_mark) * 1000, 1)
+    _last_mark = now
+
+
+def synthetic_clip(sr=48000, seconds=1.0):
+    """A second of harmonic 'speech' with a syllable envelope, as 16-bit WAV bytes."""
+    import numpy as np
+    t = np.arange(int(sr * seconds)) / sr
+    y = sum(np.sin(2 * np.pi * 140 * k * t) / k for k in range(1, 8))
+    y *= np.clip(np.sin(2 * np.pi * 3 * t), 0, None) * 0.3 / 2.6
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(sr)
+        handle.writeframes((y * 32767).astype('<i2').tobytes())
+    return buf.getvalue()
+
+
+def _step(name, fn):
+    start = time.perf_counter()
+    fn()
+    timings[f'warmup_{name}'] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def warm_up(pipe):
+    """Exercise every request-path stage once; fills timings['warmup_*']."""
+    import numpy as np
+
+    import audio_io
+    import streaming
+    import vad
+
+    clips = {sr: synthetic_clip(sr) for sr in (48000, 44100, pipe.sr)}
+    y = pipe.decode(clips[pipe.sr])
+
+    _step('decode', lambda: [pipe.decode(data) for data in clips.values()])
+    _step('pipeline', lambda: (pipe.process(y), pipe.process_batch([y, y[:len(y) // 2]])))
+    _step('vad', lambda: vad.is_speech(y))
+
+    def stream():
+        session = streaming.WakewordSession(**pipe.wakeword_params)
+        session.push(y)
+        session.flush()
+        resampler = audio_io.StreamResampler(48000, pipe.sr)
+        resampler.push(np.zeros(4800, dtype=np.float32))
+    _step('stream', stream)
+
+    if WARMUP_LIBROSA:
+        # Compressed uploads go through librosa; import it (numba, audioread) now
+        _step('librosa', lambda: audio_io._load_with_librosa(clips[pipe.sr], '.wav'))
+
+
+def _run(pipe):
+    global error
+    start = time.perf_counter()
+    try:
+        warm_up(pipe)
+    except Exception as e:   # a failed warm-up only costs speed; still serve
+        error = f'{type(e).__name__}: {e}'
+        print(f"⚠️ Warm-up failed: {error}")
+    timings['warmup_total'] = round((time.perf_counter() - start) * 1000, 1)
+    timings['ready_after'] = round((time.perf_counter() - _START) * 1000, 1)
+    _ready.set()
+    print(f"🔥 Warm-up finished in {timings['warmup_total']:.0f} ms, "
+          f"ready {timings['ready_after']:.0f} ms after import")
+
+
+def start(pipe, mode=None):
+    """Warm up according to mode (default EDGEVOICE_WARMUP); only the first call does anything."""
+    global _started
+    mode = mode or MODE
+    if mode not in MODES:
+        raise ValueError(f'EDGEVOICE_WARMUP must be one of {MODES}, not {mode!r}')
+    with _lock:
+        if _started:
+            return
+        _started = True
+    if mode == 'off':
+        timings['ready_after'] = round((time.perf_counter() - _START) * 1000, 1)
+        _ready.set()
+    elif mode == 'background':
+        threading.Thread(target=_run, args=(pipe,), name='edgevoice-warmup', daemon=True).start()
+    else:
+        _run(pipe)
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def report():
+    return {'ready': is_ready(), 'mode': MODE, 'pid': os.getpid(), 'timings_ms': dict(timings),
+            'warmup_error': error}
+
+
+def register(app, pipe):
+    """Add GET /ready (readiness probe) to a Flask app, and start a warm-up nobody started."""
+    from flask import jsonify
+
+    @app.before_request
+    def _ensure_warm_up():
+        # Served without wsgi.py (flask run, uvicorn app:app, ...): warm up behind the first request
+        if not _started:
+            start(pipe, 'off' if MODE == 'off' else 'background')
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        return jsonify(report()), 200 if is_ready() else 503
+
+    return app
@@ -0,0 +1,212 @@
+"""
+Session-scoped streaming MFCC extraction.
+
+Each live microphone gets a StreamingMFCC that keeps the STFT tail and the
+pre-emphasis state between chunks, so only the frames that became complete
+with the new chunk are computed and returned. Whole-session statistics are
+folded in chunk by chunk (feature_stats), without keeping old frames. Wake-word sessions pair it
+with a StreamingDetector and put a VAD gate in front: chunks of silence
+only advance the frame clock, no FFT or detector work is done for them.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+import vad
+from command_detect import HEURISTIC_CALIBRATION, StreamingDetector
+from feature_stats import FeatureStats
+from features import (SAMPLE_RATE, N_MFCC, N_FFT, HOP_LENGTH, N_MELS, TOP_DB,
+                      get_transforms, power_spectrogram, log_mel_to_mfcc)
+
+# Sessions idle for longer than this are dropped
+SESSION_TTL = 60.0
+
+
+class StreamingMFCC:
+    """
+    Incremental MFCC extractor.
+
+    Feeding a recording chunk by chunk through push() and then calling
+    flush() yields the same frames as extract_mfcc() over the whole
+    recording. The only difference is the top_db floor, which is measured
+    against the loudest frame seen so far instead of the global maximum;
+    pass top_db=None for identical frames.
+    """
+
+    def __init__(self, sr=SAMPLE_RATE, n_mfcc=N_MFCC, n_fft=N_FFT,
+                 hop_length=HOP_LENGTH, n_mels=N_MELS, top_db=TOP_DB,
+                 preemphasis=0.0):
+        self.sr = sr
+        self.n_mfcc = n_mfcc
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.top_db = top_db
+        self.preemphasis = preemphasis
+
+        # Shared with every other session using the same configuration
+        self._transforms = get_transforms(sr, n_fft, hop_length, n_mels, n_mfcc)
+
+        # Start with the left half of the centre padding librosa applies
+        self._tail = np.zeros(n_fft // 2, dtype=np.float32)
+        self._prev_sample = 0.0
+        self._peak_db = -np.inf
+
+        self.n_samples = 0
+        self.n_frames = 0
+        self.stats = FeatureStats(n_mfcc)   # whole-session mean/std/energy so far
+        self.last_used = time.time()
+
+    def push(self, y):
+        """Add samples and return the MFCC frames (n_mfcc x k) they completed."""
+        y = np.asarray(y, dtype=np.float32)
+        self.last_used = time.time()
+        self.n_samples += len(y)
+        self.stats.update(y=y)
+        if self.preemphasis and len(y):
+            previous = np.concatenate([[self._prev_sample], y[:-1]]).astype(np.float32)
+            self._prev_sample = float(y[-1])
+            y = y - self.preemphasis * previous
+        buffer = np.concatenate([self._tail, y])
+        return self._consume(buffer)
+
+    def skip(self, y):
+        """
+        Advance over samples without computing their frames; returns how many
+        frames were skipped. The STFT tail is kept, so the frames after the
+        skipped ones are the same as without skipping. Skipped samples count
+        towards the session energy; skipped frames are not in its moments.
+        """
+        y = np.asarray(y, dtype=np.float32)
+        self.last_used = time.time()
+        self.n_samples += len(y)
+        self.stats.update(y=y)
+        if self.preemphasis and len(y):
+            previous = np.concatenate([[self._prev_sample], y[:-1]]).astype(np.float32)
+            self._prev_sample = float(y[-1])
+            y = y - self.preemphasis * previous
+        buffer = np.concatenate([self._tail, y])
+        n_frames = 0
+        if len(buffer) >= self.n_fft:
+            n_frames = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        self._tail = buffer[n_frames * self.hop_length:]
+        self.n_frames += n_frames
+        return n_frames
+
+    def flush(self):
+        """Pad the end of the stream and return the remaining frames."""
+        padding = np.zeros(self.n_fft // 2, dtype=np.float32)
+        return self._consume(np.concatenate([self._tail, padding]), final=True)
+
+    def _consume(self, buffer, final=False):
+        if len(buffer) < self.n_fft:
+            n_frames = 0
+        else:
+            n_frames = 1 + (len(buffer) - self.n_fft) // self.hop_length
+        if final:
+            # Frames that start inside the real signal are the only ones left
+            n_frames = min(n_frames, 1 + self.n_samples // self.hop_length - self.n_frames)
+
+        if n_frames <= 0:
+            self._tail = buffer
+            return np.zeros((self.n_mfcc, 0), dtype=np.float32)
+
+        usable = buffer[:(n_frames - 1) * self.hop_length + self.n_fft]
+        mel = self._transforms.mel_basis @ power_spectrogram(usable, self._transforms, center=False)
+        if self.top_db is not None:
+            self._peak_db = max(self._peak_db, float(10.0 * np.log10(max(mel.max(), 1e-10))))
+        mfcc = log_mel_to_mfcc(mel, self._transforms, self.top_db, self._peak_db)
+
+        self._tail = buffer[n_frames * self.hop_length:]
+        self.n_frames += n_frames
+        self.stats.update(mfcc)
+        return mfcc
+
+
+class WakewordSession:
+    """
+    Streaming MFCC plus a StreamingDetector for one always-on microphone.
+
+    With gate=True (the default) a VoiceActivityDetector sees each chunk
+    first. Silent chunks after the hangover are skipped once the detector
+    can_skip (warmed up, a quiet-frame energy learned from silent chunks it
+    did compute, no segment open): the MFCC and detector clocks move on,
+    so event times stay right, and the skipped frames enter the adaptive
+    threshold at the quiet level, so it is learned from silence and speech
+    as without the gate. gated_chunks counts the skipped chunks.
+    """
+
+    def __init__(self, sr=SAMPLE_RATE, n_mfcc=N_MFCC, hop_length=HOP_LENGTH, gate=True,
+                 flatness=False, calibration=HEURISTIC_CALIBRATION, **params):
+        self.mfcc = StreamingMFCC(sr=sr, n_mfcc=n_mfcc, hop_length=hop_length, **params)
+        self.detector = StreamingDetector(n_mfcc=n_mfcc, hop_seconds=hop_length / sr,
+                                          calibration=calibration)
+        self.vad = None
+        if gate:
+            self.vad = vad.VoiceActivityDetector(flatness=flatness, frame_length=hop_length)
+        self.gated = False          # whether the last push was skipped
+        self.gated_chunks = 0
+
+    @property
+    def last_used(self):
+        return self.mfcc.last_used
+
+    def push(self, y):
+        """Feed samples; returns (new MFCC frames, detection events)."""
+        active = self.vad is None or self.vad.update(y)
+        self.gated = not active and self.detector.can_skip
+        if self.gated:
+            self.gated_chunks += 1
+            self.detector.skip(self.mfcc.skip(y))
+            return np.zeros((self.mfcc.n_mfcc, 0), dtype=np.float32), []
+        frames = self.mfcc.push(y)
+        return frames, self.detector.update(frames, quiet=not active)
+
+    def flush(self):
+        frames = self.mfcc.flush()
+        return frames, self.detector.update(frames) + self.detector.flush()
+
+
+class SessionRegistry:
+    """Thread-safe id -> session map that drops sessions idle for SESSION_TTL."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id, **params):
+        """Return the session for session_id, creating it on first use (params only apply then)."""
+        now = time.time()
+        with self._lock:
+            stale_ids = [sid for sid, s in self._sessions.items()
+                         if now - s.last_used > SESSION_TTL]
+            for stale in stale_ids:
+                del self._sessions[stale]
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = self.factory(**params)
+            return session
+
+    def close(self, session_id):
+        """Forget a session; returns it (or None) so the caller can flush it."""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+mfcc_sessions = SessionRegistry(StreamingMFCC)
+wakeword_sessions = SessionRegistry(WakewordSession)
+
+
+def get_session(session_id, **params):
+    """Return the StreamingMFCC for session_id, creating it on first use."""
+    return mfcc_sessions.get(session_id, **params)
+
+
+def close_session(session_id):
+    """Forget a session; returns it (or None) so the caller can flush it."""
+    return mfcc_sessions.close(session_id)
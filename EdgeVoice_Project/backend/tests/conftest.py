@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend is a directory of flat modules (import pipeline, import jobs, ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,23 @@
+from artifacts import ArtifactStore
+
+
+def test_store_is_bounded_by_bytes():
+    store = ArtifactStore(max_items=100, max_bytes=1000)
+    for i in range(5):
+        store.put(f's{i}', audio=b'x' * 300, ext='.wav')
+    assert store.nbytes <= 1000
+    assert store.get('s0') is None and store.get('s1') is None
+    assert store.get('s4')['audio'] == b'x' * 300
+
+    store.put('s4', audio=b'y' * 10)        # replacing an upload releases its bytes
+    assert store.nbytes == 610
+
+    store.put('huge', audio=b'z' * 2000)    # larger than the whole budget: not kept
+    assert store.get('huge') is None and store.nbytes == 610
+
+
+def test_get_needs_a_session_id():
+    store = ArtifactStore()
+    store.put('abc', audio=b'data', ext='.wav')
+    assert store.get(None) is None and store.get('') is None
+    assert store.get('abc')['audio'] == b'data'
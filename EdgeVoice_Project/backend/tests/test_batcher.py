@@ -0,0 +1,47 @@
+import threading
+import time
+
+import numpy as np
+
+from batcher import MicroBatcher
+
+
+class _CountingPipe:
+    """Stands in for Pipeline: records batch sizes, takes a little time per batch."""
+
+    def __init__(self):
+        self.sizes = []
+
+    def features_batch(self, signals):
+        self.sizes.append(len(signals))
+        time.sleep(0.005)
+        return [np.zeros((13, 1), dtype=np.float32) for _ in signals]
+
+    def detect_batch(self, mfccs):
+        return [{'keyword': None} for _ in mfccs]
+
+
+def test_lone_request_does_not_wait_for_the_window():
+    pipe = _CountingPipe()
+    batcher = MicroBatcher(pipe, window=0.5, max_batch=8, enabled=True)
+    batcher.submit(np.zeros(16))        # starts the worker thread
+    start = time.perf_counter()
+    for _ in range(5):
+        batcher.submit(np.zeros(16))
+    assert (time.perf_counter() - start) / 5 < 0.1
+    assert pipe.sizes == [1] * 6
+
+
+def test_concurrent_requests_share_batches():
+    pipe = _CountingPipe()
+    batcher = MicroBatcher(pipe, window=0.02, max_batch=8, enabled=True)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(batcher.submit(np.zeros(16))))
+               for _ in range(32)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 32
+    assert sum(pipe.sizes) == 32
+    assert max(pipe.sizes) > 1
@@ -0,0 +1,216 @@
+import numpy as np
+import pytest
+
+import command_detect
+from command_detect import (DSCNNDetector, HeuristicDetector, calibrate_model, fit_platt,
+                            fit_temperature, save_model, stack_mfcc)
+
+N_MFCC = 13
+LABELS = ('_silence_', 'light_on')
+
+
+@pytest.fixture
+def tiny_model(tmp_path):
+    """A 1-block DS-CNN with fixed random weights: the model file layout, not a trained spotter."""
+    rng = np.random.default_rng(0)
+    channels = 8
+    params = {
+        'conv0': (rng.normal(0, 0.3, (channels, N_MFCC, 3)), np.zeros(channels)),
+        'ds0.dw': (rng.normal(0, 0.5, (channels, 3)), np.zeros(channels)),
+        'ds0.pw': (rng.normal(0, 0.5, (channels, channels)), np.zeros(channels)),
+        'fc': (rng.normal(0, 2.0, (len(LABELS), channels)), np.zeros(len(LABELS))),
+    }
+    path = tmp_path / 'tiny.npz'
+    save_model(path, params, LABELS)
+    return path
+
+
+def _burst_clip(rng, ratio, frames=60):
+    # Quiet background with a 20-frame burst whose low coefficients are `ratio` times the high ones
+    mfcc = rng.normal(0, 0.05, (N_MFCC, frames)).astype(np.float32)
+    mfcc[:5, 20:40] += ratio
+    mfcc[5:, 20:40] += 1.0
+    return mfcc
+
+
+def test_dscnn_empty_mfcc_is_no_command(tiny_model):
+    detector = DSCNNDetector(tiny_model)
+    result = detector.detect(np.zeros((N_MFCC, 0), dtype=np.float32))
+    assert result == {'keyword': None, 'wake_range': None, 'confidence': 0.0,
+                      'scores': {'light_on': 0.0}}
+    assert len(detector.detect_batch(np.zeros((3, N_MFCC, 0), dtype=np.float32))) == 3
+
+
+def test_dscnn_zero_length_item_in_batch(tiny_model):
+    detector = DSCNNDetector(tiny_model)
+    rng = np.random.default_rng(1)
+    results = detector.detect_batch(*stack_mfcc([rng.normal(size=(N_MFCC, 40)).astype(np.float32),
+                                                 np.zeros((N_MFCC, 0), dtype=np.float32)]))
+    assert results[1]['keyword'] is None and results[1]['confidence'] == 0.0
+    assert set(results[0]['scores']) == {'light_on'}
+
+
+def test_fit_temperature_recovers_scale():
+    rng = np.random.default_rng(2)
+    logits = rng.normal(0, 3.0, (5000, 3))
+    z = np.exp(logits / 2.0)
+    probs = z / z.sum(axis=1, keepdims=True)
+    targets = [rng.choice(3, p=p) for p in probs]
+    assert fit_temperature(logits, targets) == pytest.approx(2.0, rel=0.1)
+
+
+def test_calibrate_model_stores_temperature(tiny_model, tmp_path):
+    rng = np.random.default_rng(3)
+    clips = [rng.normal(size=(N_MFCC, int(rng.integers(20, 60)))).astype(np.float32)
+             for _ in range(200)]
+    targets = [LABELS[int(rng.integers(0, 2))] for _ in clips]
+    out = tmp_path / 'calibrated.npz'
+
+    temperature = calibrate_model(tiny_model, clips, targets, out)
+    detector = DSCNNDetector(out)
+    assert detector.temperature == pytest.approx(temperature, rel=1e-6)
+    assert DSCNNDetector(tiny_model).temperature == 1.0
+    # The fitted temperature never fits the clips worse than the uncalibrated one
+    logits = detector.clip_logits(*stack_mfcc(clips))
+    index = [LABELS.index(t) for t in targets]
+
+    def nll(t):
+        z = logits / t
+        z = z - z.max(axis=1, keepdims=True)
+        return np.mean(np.log(np.exp(z).sum(axis=1)) - z[np.arange(len(z)), index])
+    assert nll(temperature) <= nll(1.0) + 1e-9
+
+
+def test_fit_platt_recovers_parameters():
+    rng = np.random.default_rng(4)
+    scores = rng.normal(0, 1.5, 20000)
+    targets = rng.random(20000) < 1 / (1 + np.exp(-(2.0 * scores - 1.0)))
+    a, b = fit_platt(scores, targets)
+    assert a == pytest.approx(2.0, abs=0.15)
+    assert b == pytest.approx(-1.0, abs=0.15)
+
+
+def test_heuristic_calibrate_gives_probabilities():
+    rng = np.random.default_rng(5)
+    ratios = rng.uniform(1.3, 4.0, 200)
+    clips = [_burst_clip(rng, r) for r in ratios]
+    # Stronger low-band bursts are more often the keyword
+    targets = rng.random(200) < (ratios - 1.3) / 2.7
+
+    detector = HeuristicDetector(calibration=None)
+    a, b = detector.calibrate(clips, targets)
+    assert a > 0
+    results = detector.detect_batch(*stack_mfcc(clips))
+    confidences = np.array([r['confidence'] for r in results if r['keyword']])
+    assert len(confidences) == len(clips)
+    assert np.all((confidences > 0) & (confidences < 1))
+    # Calibrated: mean confidence matches the keyword rate it was fitted on
+    assert confidences.mean() == pytest.approx(targets.mean(), abs=0.05)
+
+
+def test_heuristic_uncalibrated_default():
+    clip = _burst_clip(np.random.default_rng(6), 3.0)
+    result = HeuristicDetector(calibration=None).detect(clip)
+    _, _, ratio = command_detect._detect_batch(*stack_mfcc([clip]))[0]
+    assert result['keyword'] == 'light_on'
+    assert result['confidence'] == pytest.approx(1.0 - command_detect.SPEECH_RATIO / ratio)
+
+
+def _reference_detect(mfcc):
+    """The per-frame loop detect_command used before the vectorized rewrite, kept as the oracle."""
+    if mfcc.size == 0 or mfcc.shape[1] < command_detect.MIN_FRAMES:
+        return None, None
+    frame_energy = np.sum(np.abs(mfcc), axis=0)
+    threshold = np.mean(frame_energy) + command_detect.THRESHOLD_STDS * np.std(frame_energy)
+    high = np.where(frame_energy > threshold)[0]
+    if len(high) < command_detect.MIN_ACTIVE_FRAMES:
+        return None, None
+    segments = []
+    start = high[0]
+    for i in range(1, len(high)):
+        if high[i] - high[i - 1] > command_detect.MAX_GAP:
+            segments.append((start, high[i - 1]))
+            start = high[i]
+    segments.append((start, high[-1]))
+    best = max(segments, key=lambda s: s[1] - s[0])
+    length = best[1] - best[0] + 1
+    if command_detect.MIN_SEGMENT <= length <= command_detect.MAX_SEGMENT:
+        segment = mfcc[:, best[0]:best[1] + 1]
+        n_lower = command_detect.N_LOWER_COEFFS
+        if segment.shape[0] <= n_lower:
+            return None, None
+        ratio = np.mean(np.abs(segment[:n_lower])) / (np.mean(np.abs(segment[n_lower:])) + 1e-10)
+        if ratio > command_detect.SPEECH_RATIO:
+            return 'light_on', (int(best[0]), int(best[1]))
+    return None, None
+
+
+def _random_clip(rng):
+    # Noise plus a few bursts, loud in the low coefficients, so every branch is reached
+    n_mfcc = rng.choice([13, 13, 13, 20, 6, 5])
+    frames = int(rng.choice([rng.integers(0, 200), rng.integers(8, 13)]))
+    mfcc = rng.normal(0, 1, (n_mfcc, frames))
+    for _ in range(rng.integers(0, 4)):
+        length = int(rng.integers(1, 40))
+        start = int(rng.integers(0, max(frames, 1)))
+        mfcc[:5, start:start + length] += rng.uniform(1, 8)
+        mfcc[5:, start:start + length] *= rng.uniform(0.5, 3)
+    return mfcc.astype(np.float32)
+
+
+def test_vectorized_detection_matches_reference_loop():
+    rng = np.random.default_rng(0)
+    clips = [_random_clip(rng) for _ in range(2000)]
+    expected = [_reference_detect(m) for m in clips]
+    assert 0.1 < np.mean([k is not None for k, _ in expected]) < 0.9   # both outcomes exercised
+
+    assert [command_detect.detect_command(m) for m in clips] == expected
+    # Batched with zero padding, mixed lengths in one call
+    for n_mfcc in {m.shape[0] for m in clips}:
+        group = [(m, e) for m, e in zip(clips, expected) if m.shape[0] == n_mfcc]
+        for i in range(0, len(group), 64):
+            chunk = group[i:i + 64]
+            batch, lengths = stack_mfcc([m for m, _ in chunk])
+            assert command_detect.detect_command_batch(batch, lengths) == [e for _, e in chunk]
+
+
+def _clip_with_active_frames(n_active, frames=40):
+    # A flat background with n_active loud, speech-like frames in a row
+    mfcc = np.full((N_MFCC, frames), 0.1, dtype=np.float32)
+    mfcc[:5, 10:10 + n_active] = 10.0
+    mfcc[5:, 10:10 + n_active] = 1.0
+    return mfcc
+
+
+@pytest.mark.parametrize('mfcc', [
+    _clip_with_active_frames(command_detect.MIN_ACTIVE_FRAMES - 1),
+    _clip_with_active_frames(command_detect.MIN_ACTIVE_FRAMES),
+    _clip_with_active_frames(command_detect.MIN_SEGMENT),
+    _clip_with_active_frames(12, frames=command_detect.MIN_FRAMES - 1),
+    _clip_with_active_frames(command_detect.MIN_FRAMES, frames=command_detect.MIN_FRAMES + 10),
+    np.zeros((N_MFCC, 0), dtype=np.float32),
+    np.concatenate([_clip_with_active_frames(12), _clip_with_active_frames(12)], axis=1),  # tie
+])
+def test_detection_edge_cases_match_reference_loop(mfcc):
+    expected = _reference_detect(mfcc)
+    assert command_detect.detect_command(mfcc) == expected
+    batch, lengths = stack_mfcc([mfcc, _clip_with_active_frames(20, frames=80)])
+    assert command_detect.detect_command_batch(batch, lengths)[0] == expected
+
+
+def test_threshold_ties_match_reference_loop_in_padded_batches():
+    # Few distinct values, so frame energies often sit exactly on the threshold
+    rng = np.random.default_rng(1)
+    clips = []
+    for _ in range(2000):
+        frames = int(rng.integers(0, 60))
+        mfcc = np.full((N_MFCC, frames), rng.choice([0.1, 0.5, 1.0]), dtype=np.float32)
+        length, start = int(rng.integers(0, frames + 1)), int(rng.integers(0, frames + 1))
+        mfcc[:5, start:start + length] = rng.choice([3.0, 10.0])
+        mfcc[5:, start:start + length] = rng.choice([0.5, 1.0, 2.0])
+        clips.append(mfcc)
+    expected = [_reference_detect(m) for m in clips]
+    assert [command_detect.detect_command(m) for m in clips] == expected
+    for i in range(0, len(clips), 32):
+        batch, lengths = stack_mfcc(clips[i:i + 32])
+        assert command_detect.detect_command_batch(batch, lengths) == expected[i:i + 32]
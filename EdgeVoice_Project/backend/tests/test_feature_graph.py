@@ -0,0 +1,24 @@
+import numpy as np
+
+from feature_graph import FeatureSet
+from features import frame_signal, get_transforms
+
+
+def test_energy_is_window_compensated_mean_square():
+    transforms = get_transforms()
+    y = np.random.default_rng(0).standard_normal(transforms.sr).astype(np.float32)
+    energy = FeatureSet(y, transforms)['energy']
+
+    frames = frame_signal(y, transforms).astype(np.float64)
+    window = transforms.window.astype(np.float64)
+    expected = np.mean((frames * window) ** 2, axis=1) / np.mean(window ** 2)
+    np.testing.assert_allclose(energy, expected, rtol=1e-4)
+
+
+def test_energy_of_stationary_signal_is_its_mean_square():
+    transforms = get_transforms()
+    t = np.arange(transforms.sr) / transforms.sr
+    y = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    energy = FeatureSet(y, transforms)['energy']
+    # Interior frames (not touching the centre padding) see the full sine
+    np.testing.assert_allclose(energy[4:-4], 0.125, rtol=0.02)
@@ -0,0 +1,90 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from feature_store import FeatureStore
+
+
+def _mfcc(seed, frames=50):
+    return np.random.default_rng(seed).normal(size=(13, frames)).astype(np.float32)
+
+
+def _shard_bytes(root):
+    return sum(os.path.getsize(p) for p in glob.glob(os.path.join(root, 'shard-*.f32')))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeatureStore(root=str(tmp_path))
+
+
+def test_same_id_and_matrix_writes_nothing(store):
+    mfcc = _mfcc(0)
+    store.put(mfcc, 'a')
+    size = _shard_bytes(store.root)
+    store.put(mfcc, 'a')
+    assert _shard_bytes(store.root) == size
+    assert len(store) == 1
+
+
+def test_new_id_for_stored_matrix_only_adds_a_row(store):
+    mfcc = _mfcc(0)
+    store.put(mfcc, 'a')
+    size = _shard_bytes(store.root)
+    store.put(mfcc, 'b')
+    assert _shard_bytes(store.root) == size
+    np.testing.assert_array_equal(store.get('b'), mfcc)
+
+
+def test_processes_share_one_shard(tmp_path):
+    # Two FeatureStore objects on one root stand in for two gunicorn workers
+    first, second = FeatureStore(root=str(tmp_path)), FeatureStore(root=str(tmp_path))
+    first.put(_mfcc(0), 'a')
+    second.put(_mfcc(1), 'b')
+    with second.writer('c') as writer:
+        writer.append(_mfcc(2, 30))
+        writer.append(_mfcc(3, 20))
+    assert len(glob.glob(os.path.join(str(tmp_path), 'shard-*.f32'))) == 1
+    assert not glob.glob(os.path.join(str(tmp_path), 'spool-*'))
+    np.testing.assert_array_equal(first.get('b'), _mfcc(1))
+    np.testing.assert_array_equal(first.get('c'),
+                                  np.concatenate([_mfcc(2, 30), _mfcc(3, 20)], axis=1))
+
+
+def test_replaced_bytes_are_compacted(store):
+    store.put(_mfcc(0), 'a')
+    for seed in range(1, 6):
+        store.put(_mfcc(seed), 'b')      # each replaces the last, orphaning its bytes
+    assert _shard_bytes(store.root) == 6 * _mfcc(0).nbytes
+    # Roll over so the old shard is no longer the one being appended to
+    store.shard_bytes = 1
+    store.put(_mfcc(9), 'c')
+    store.compact()
+    assert _shard_bytes(store.root) == 3 * _mfcc(0).nbytes
+    np.testing.assert_array_equal(store.get('a'), _mfcc(0))
+    np.testing.assert_array_equal(store.get('b'), _mfcc(5))
+    np.testing.assert_array_equal(store.get('c'), _mfcc(9))
+
+
+def test_retention_keeps_newest(store):
+    store.max_entries = 5
+    for seed in range(12):
+        store.put(_mfcc(seed), f'id{seed}')
+    store.shard_bytes = 1
+    store.put(_mfcc(99), 'last')
+    store.prune()
+    assert len(store) == 5
+    assert [entry['id'] for entry in store.recent(5)] == ['last', 'id11', 'id10', 'id9', 'id8']
+    assert _shard_bytes(store.root) == 5 * _mfcc(0).nbytes
+    np.testing.assert_array_equal(store.get('id9'), _mfcc(9))
+
+
+def test_discarded_writer_leaves_nothing(store):
+    with pytest.raises(RuntimeError):
+        with store.writer('x') as writer:
+            writer.append(_mfcc(0))
+            raise RuntimeError('decode failed')
+    assert store.get('x') is None
+    assert not glob.glob(os.path.join(store.root, 'spool-*'))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from features import compute_mfcc
+from streaming import StreamingMFCC
+
+
+def _signal(sr, seconds, seed=0):
+    """Chirp plus noise: a spectrum that moves, so misaligned frames would show."""
+    t = np.arange(int(sr * seconds)) / sr
+    chirp = np.sin(2 * np.pi * (200 + 1500 * t) * t)
+    noise = np.random.default_rng(seed).standard_normal(len(t))
+    return (0.2 * chirp + 0.05 * noise).astype(np.float32)
+
+
+@pytest.mark.parametrize('sr', [16000, 22050, 44100])
+def test_compute_mfcc_matches_librosa(sr):
+    librosa = pytest.importorskip('librosa')
+    y = _signal(sr, 1.5)
+    reference = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
+    ours = compute_mfcc(y, sr)
+    assert ours.shape == reference.shape
+    np.testing.assert_allclose(ours, reference, atol=1e-3)
+
+
+@pytest.mark.parametrize('chunks', [[16000 * 2 + 123], [1, 511, 512, 2048, 4000, 30000],
+                                    [800] * 41])
+def test_streaming_push_flush_matches_compute_mfcc(chunks):
+    y = _signal(16000, sum(chunks) / 16000, seed=1)[:sum(chunks)]
+    # top_db=None: the streaming floor follows the loudest frame so far, not the global one
+    session = StreamingMFCC(top_db=None)
+    parts, start = [], 0
+    for n in chunks:
+        parts.append(session.push(y[start:start + n]))
+        start += n
+    parts.append(session.flush())
+    streamed = np.concatenate(parts, axis=1)
+
+    batch = compute_mfcc(y, top_db=None)
+    assert streamed.shape == batch.shape
+    np.testing.assert_allclose(streamed, batch, atol=1e-3)
+
+
+def test_streaming_frame_count_matches_with_top_db():
+    y = _signal(16000, 2.0)
+    session = StreamingMFCC()
+    frames = [session.push(y[i:i + 1000]) for i in range(0, len(y), 1000)] + [session.flush()]
+    assert sum(f.shape[1] for f in frames) == compute_mfcc(y).shape[1]
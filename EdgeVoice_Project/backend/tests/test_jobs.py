@@ -0,0 +1,69 @@
+import json
+import time
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_DIR', str(tmp_path))
+    return tmp_path
+
+
+def _orphan(job_dir, age):
+    # State file left behind by a worker that died mid-job
+    job = jobs.Job('upload')
+    job._save(state='running', stage='mfcc', progress=0.333)
+    path = job_dir / f'{job.id}.json'
+    state = json.loads(path.read_text())
+    state['updated'] -= age
+    path.write_text(json.dumps(state))
+    return job.id
+
+
+def test_orphaned_job_is_marked_failed(job_dir):
+    job_id = _orphan(job_dir, jobs.STALE_AFTER + 1)
+    state = jobs.load(job_id)
+    assert state['state'] == 'failed'
+    assert state['error'] == 'worker lost'
+    assert state['status_code'] == 500
+    # Written back, so every worker sees the same verdict
+    assert json.loads((job_dir / f'{job_id}.json').read_text())['state'] == 'failed'
+
+
+def test_events_end_for_orphaned_job(job_dir, monkeypatch):
+    monkeypatch.setattr(jobs, 'POLL_INTERVAL', 0.01)
+    job_id = _orphan(job_dir, jobs.STALE_AFTER + 1)
+    lines = list(jobs.events(job_id))
+    assert lines[-1].startswith('event: failed')
+    assert 'worker lost' in lines[-1]
+
+
+def test_recent_running_job_is_not_stale(job_dir):
+    job_id = _orphan(job_dir, 1)
+    assert jobs.load(job_id)['state'] == 'running'
+
+
+def test_long_stage_is_kept_alive(job_dir, monkeypatch):
+    # A stage longer than STALE_AFTER must not be declared lost while its worker lives
+    monkeypatch.setattr(jobs, 'STALE_AFTER', 0.3)
+    monkeypatch.setattr(jobs, 'TOUCH_INTERVAL', 0.05)
+    monkeypatch.setattr(jobs, '_executor_pid', None)
+
+    def slow(on_stage):
+        on_stage('mfcc')
+        time.sleep(0.8)
+        return {'ok': True}, [[0.0]]
+
+    job = jobs.submit(slow, kind='test')
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        state = jobs.load(job.id)
+        assert state['state'] != 'failed', state
+        if state['state'] == 'done':
+            break
+        time.sleep(0.05)
+    assert jobs.load(job.id)['state'] == 'done'
+    assert jobs.load_result(job.id)[0] == {'ok': True}
@@ -0,0 +1,76 @@
+import io
+import json
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+# Keep the app's feature store out of the working tree
+os.environ.setdefault('EDGEVOICE_FEATURE_STORE', tempfile.mkdtemp(prefix='edgevoice_test_'))
+
+import routes  # noqa: E402
+
+
+@pytest.mark.parametrize('payload', [
+    [1.0, 2.0, 3.0],              # 1-D
+    [[1.0, 2.0], [3.0]],          # ragged
+    [['a', 'b'], ['c', 'd']],     # non-numeric
+    [[1.0, None], [2.0, 3.0]],    # null
+    [[]],                         # no frames
+    {'rows': [[1.0]]},            # not a list
+])
+def test_mfcc_matrix_rejects_bad_payloads(payload):
+    with pytest.raises(routes.PayloadError):
+        routes.mfcc_matrix(payload)
+
+
+def test_mfcc_matrix_accepts_a_matrix():
+    mfcc = routes.mfcc_matrix([[1, 2, 3], [4, 5, 6]])
+    assert mfcc.dtype == np.float32 and mfcc.shape == (2, 3)
+
+
+BAD_REQUESTS = [
+    ({'mfcc': json.dumps([1.0, 2.0, 3.0])}, 400, 'Invalid MFCC data format'),
+    ({'mfcc': json.dumps([[1.0, 2.0], [3.0]])}, 400, 'Invalid MFCC data format'),
+    ({'mfcc': json.dumps([['a', 'b']])}, 400, 'Invalid MFCC data format'),
+    ({'mfcc': '[[1.0, 2.0'}, 400, 'Invalid JSON data'),
+    ({}, 400, 'No MFCC data provided'),
+    ({'mfcc': json.dumps([[1.0, 2.0]]), 'bits': '4'}, 400, 'bits must be 8 or 16'),
+    ({'audio': (io.BytesIO(b'not audio at all'), 'clip.wav')}, 415, 'Could not decode audio'),
+]
+
+
+@pytest.mark.parametrize('form, status, error', BAD_REQUESTS)
+def test_accelerate_errors_match_in_both_apps(form, status, error):
+    bodies = []
+    for module in ('app', 'app_stable'):
+        client = __import__(module).app.test_client()
+        data = {k: (io.BytesIO(v[0].getvalue()), v[1]) if isinstance(v, tuple) else v
+                for k, v in form.items()}
+        response = client.post('/accelerate', data=data)
+        assert response.status_code == status, (module, response.data)
+        bodies.append(response.get_json())
+    assert bodies[0] == bodies[1]
+    assert bodies[0]['success'] is False and bodies[0]['error'] == error
+    if error == 'Invalid MFCC data format':
+        assert 'mfcc' in bodies[0]['details']
+
+
+@pytest.mark.parametrize('module', ['app', 'app_stable'])
+def test_accelerate_accepts_a_matrix(module):
+    client = __import__(module).app.test_client()
+    response = client.post('/accelerate', data={'mfcc': json.dumps(np.ones((13, 20)).tolist())})
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+
+
+@pytest.mark.parametrize('module', ['app', 'app_stable'])
+def test_downloads_need_an_id(module):
+    import artifacts
+    artifacts.store.put('someone-else', audio=b'RIFF', ext='.wav')
+    client = __import__(module).app.test_client()
+    assert client.get('/download_wav').status_code == 400
+    assert client.get('/download_mfcc').status_code == 400
+    assert client.get('/download_wav?session_id=someone-else').status_code == 200
+    assert client.get('/download_wav?session_id=unknown').status_code == 404
@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import pytest
+
+from streaming import WakewordSession
+
+SR = 16000
+
+
+def _vowel(duration, f0):
+    t = np.arange(int(duration * SR)) / SR
+    y = sum(np.sin(2 * np.pi * f0 * h * t) / h for h in range(1, 15))
+    return (0.3 * y / np.abs(y).max() * np.hanning(len(t))).astype(np.float32)
+
+
+def _words_in_silence(n_words, gap=2.0):
+    """0.6 s harmonic 'words' between stretches of quiet noise the VAD gates."""
+    rng = np.random.default_rng(0)
+    quiet = lambda: (0.0005 * rng.standard_normal(int(gap * SR))).astype(np.float32)
+    parts = [quiet()]
+    for i in range(n_words):
+        parts += [_vowel(0.6, 120 + 20 * (i % 2)), quiet()]
+    return np.concatenate(parts)
+
+
+def _events(y, gate, chunk):
+    session = WakewordSession(sr=SR, gate=gate)
+    events = []
+    for i in range(0, len(y), chunk):
+        events += session.push(y[i:i + chunk])[1]
+    events += session.flush()[1]
+    return [e['wake_range'] for e in events], session.gated_chunks
+
+
+@pytest.mark.parametrize('n_words, chunk', [(2, 8000), (2, 1600), (10, 800), (10, 4000)])
+def test_gate_detects_the_same_words_as_no_gate(n_words, chunk):
+    y = _words_in_silence(n_words)
+    ungated, _ = _events(y, gate=False, chunk=chunk)
+    gated, skipped = _events(y, gate=True, chunk=chunk)
+    assert skipped > 0                      # the gate did drop silence
+    assert len(ungated) == n_words
+    assert len(gated) == len(ungated)
+    for (start, end), (g_start, g_end) in zip(ungated, gated):
+        assert abs(start - g_start) <= 2 and abs(end - g_end) <= 2
+
+
+class _FakeSocket:
+    """flask-sock stand-in: hands out queued messages, records what is sent."""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    def receive(self):
+        return self.messages.pop(0) if self.messages else None
+
+    def send(self, message):
+        self.sent.append(json.loads(message))
+
+
+def test_websocket_sessions_follow_the_pipeline():
+    from werkzeug.datastructures import MultiDict
+
+    import ws_stream
+    from command_detect import HeuristicDetector
+    from pipeline import Pipeline
+
+    pipe = Pipeline(n_mfcc=20, hop_length=256, detector=HeuristicDetector(calibration=(2.0, -1.0)))
+    y = _words_in_silence(2)
+    chunks = [y[i:i + 8000].tobytes() for i in range(0, len(y), 8000)]
+    ws = _FakeSocket(chunks + ['flush'])
+    ws_stream.serve_wakeword(ws, MultiDict({'format': 'pcm_f32le', 'sample_rate': str(SR)}), pipe)
+
+    assert ws.sent[0] == {'type': 'ready', 'sample_rate': SR, 'hop_seconds': 256 / SR}
+    expected = WakewordSession(**pipe.wakeword_params)
+    events = []
+    for i in range(0, len(y), 8000):
+        events += expected.push(y[i:i + 8000])[1]
+    events += expected.flush()[1]
+    sent = [m for m in ws.sent if m['type'] == 'event']
+    assert sent
+    assert [m['wake_range'] for m in sent] == [e['wake_range'] for e in events]
+    assert [m['confidence'] for m in sent] == [e['confidence'] for e in events]
+    assert ws.sent[-1]['type'] == 'flushed'
@@ -0,0 +1,130 @@
+"""
+Voice-activity gate that runs on raw samples, ahead of MFCC and detection.
+
+Each chunk is cut into hop-sized frames (512 samples, the MFCC hop) and
+every frame is classified from its short-term energy and zero-crossing
+rate, optionally vetoed by spectral flatness:
+
+    voiced      energy above the gate (ENERGY_DB, or NOISE_MARGIN_DB over
+                the tracked noise floor, whichever is higher)
+    unvoiced    energy within UNVOICED_DB of the gate and a high
+                zero-crossing rate (fricative onsets like "s")
+    flatness    with flatness=True, frames whose spectrum is noise-flat
+                are never speech (fans, hiss); costs one small rFFT
+
+A VoiceActivityDetector keeps the noise floor and a hangover of
+HANGOVER_FRAMES between chunks, so the tail of a word and short pauses are
+still passed on. is_speech() is the stateless one-chunk version.
+EDGEVOICE_VAD=0 turns the gate off everywhere.
+"""
+
+import os
+
+import numpy as np
+
+ENABLED = os.environ.get('EDGEVOICE_VAD', '1') != '0'
+
+FRAME_LENGTH = 512          # samples per VAD frame (32 ms at 16 kHz, one MFCC hop)
+ENERGY_DB = -45.0           # absolute gate in dBFS (mean square of [-1, 1) samples)
+NOISE_MARGIN_DB = 9.0       # speech must also clear the noise floor by this much
+UNVOICED_DB = 10.0          # unvoiced frames may sit this far below the gate
+UNVOICED_ZCR = 0.25         # zero crossings per sample that mark unvoiced speech
+MAX_FLATNESS = 0.5          # geometric / arithmetic mean of the power spectrum
+HANGOVER_FRAMES = 8         # frames kept open after the last speech frame (~256 ms)
+FLOOR_RISE_DB = 0.05        # per-frame upward drift of the noise floor estimate
+
+
+def frame_features(y, frame_length=FRAME_LENGTH):
+    """Per-frame energy (dBFS) and zero-crossing rate of the complete frames in y."""
+    n_frames = len(y) // frame_length
+    frames = np.asarray(y[:n_frames * frame_length], dtype=np.float32)
+    frames = frames.reshape(n_frames, frame_length)
+    energy_db = 10.0 * np.log10(np.einsum('ij,ij->i', frames, frames) / frame_length + 1e-12)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_length - 1)
+    return frames, energy_db, zcr
+
+
+def spectral_flatness(frames):
+    """Wiener entropy of each frame's power spectrum: ~1 for white noise, near 0 for tones/voice."""
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2 + 1e-12
+    return np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+
+
+def classify_frames(y, floor_db=None, flatness=False, frame_length=FRAME_LENGTH):
+    """Boolean speech mask per frame plus the frame energies (dBFS)."""
+    frames, energy_db, zcr = frame_features(y, frame_length)
+    gate = ENERGY_DB if floor_db is None else max(ENERGY_DB, floor_db + NOISE_MARGIN_DB)
+    speech = (energy_db > gate) | ((energy_db > gate - UNVOICED_DB) & (zcr > UNVOICED_ZCR))
+    if flatness and speech.any():
+        speech[speech] = spectral_flatness(frames[speech]) < MAX_FLATNESS
+    return speech, energy_db
+
+
+def is_speech(y, flatness=False):
+    """Stateless gate for a single chunk: does any frame look like speech?"""
+    if not ENABLED:
+        return True
+    if len(y) < FRAME_LENGTH:
+        return False
+    speech, _ = classify_frames(y, flatness=flatness)
+    return bool(speech.any())
+
+
+class VoiceActivityDetector:
+    """
+    Chunk-by-chunk gate with hangover for one live stream.
+
+    update() returns True while speech frames are arriving and for
+    HANGOVER_FRAMES frames after the last one. Samples that do not fill a
+    frame are carried into the next call. The noise floor follows the
+    quietest frames immediately and creeps up FLOOR_RISE_DB per frame, so
+    a steady background noise stops opening the gate after a few seconds.
+    """
+
+    def __init__(self, flatness=False, hangover=HANGOVER_FRAMES, frame_length=FRAME_LENGTH):
+        self.flatness = flatness
+        self.hangover = hangover
+        self.frame_length = frame_length
+        self.floor_db = None
+        self.energy_db = None         # loudest frame of the last chunk
+        self._remaining = 0           # hangover frames left
+        self._carry = np.zeros(0, dtype=np.float32)
+
+    @property
+    def active(self):
+        return self._remaining > 0
+
+    def update(self, y):
+        """Feed samples; True if this chunk should go on to MFCC and detection."""
+        if not ENABLED:
+            return True
+        y = np.asarray(y, dtype=np.float32)
+        if len(self._carry):
+            y = np.concatenate([self._carry, y])
+        usable = len(y) - len(y) % self.frame_length
+        self._carry = y[usable:]
+        if usable == 0:
+            return self.active
+
+        speech, energy_db = classify_frames(y[:usable], self.floor_db, self.flatness,
+                                            self.frame_length)
+        self.energy_db = float(energy_db.max())
+        quietest = float(energy_db.min())
+        if self.floor_db is None or quietest < self.floor_db:
+            self.floor_db = quietest
+        else:
+            self.floor_db += FLOOR_RISE_DB * len(energy_db)
+
+        was_active = self.active
+        if speech.any():
+            last = int(np.flatnonzero(speech)[-1])
+            self._remaining = max(self.hangover - (len(speech) - 1 - last), 0)
+            return True
+        self._remaining = max(self._remaining - len(speech), 0)
+        return was_active
+
+    def reset(self):
+        """Forget the hangover (the noise floor is kept)."""
+        self._remaining = 0
+        self._carry = np.zeros(0, dtype=np.float32)
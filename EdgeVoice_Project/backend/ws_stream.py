@@ -0,0 +1,106 @@
+"""
+WebSocket endpoint for continuous wake-word detection.
+
+    ws://host:5000/ws/wakeword?sample_rate=48000&format=pcm_f32le
+
+One connection is one microphone. The client sends raw mono PCM as binary
+messages (pcm_s16le by default, pcm_f32le also accepted, any sample_rate)
+and the server runs streaming MFCC + detector on each message as it
+arrives, with the MFCC and detector settings of the app's pipeline (the
+same frames and decisions as /wakeword_detect), pushing JSON messages back:
+
+    {"type": "ready", "sample_rate": 16000, "hop_seconds": 0.032}
+    {"type": "event", "keyword": ..., "wake_range": [...], "start_time": ...,
+     "end_time": ..., "confidence": ..., "stream_time": ..., "compute_ms": ...}
+    {"type": "flushed", "frames": N}     reply to a text "flush" message
+    {"type": "error", "error": ...}
+
+A text "flush" closes the current utterance (open segments are reported)
+and starts a fresh detector. Silent stretches are dropped by the session's
+VAD gate before any MFCC work; vad=0 in the query string turns it off.
+Compared with one multipart POST per chunk there is no header, form
+parsing, preflight or session lookup per message.
+
+Needs the flask-sock package; without it register() leaves the app as is.
+"""
+
+import json
+import time
+
+import numpy as np
+from flask import request
+
+import audio_io
+from streaming import WakewordSession
+
+try:
+    from flask_sock import Sock
+except ImportError:  # optional dependency
+    Sock = None
+
+DEFAULT_FORMAT = 'pcm_s16le'
+
+
+def _event_message(event, stream_time, compute_ms):
+    message = {k: v for k, v in event.items() if k != 'mfcc'}
+    message.update(type='event', stream_time=round(stream_time, 3), compute_ms=round(compute_ms, 3))
+    return json.dumps(message)
+
+
+def serve_wakeword(ws, args, pipe):
+    """Receive loop for one connection; args are the query parameters, pipe the app's Pipeline."""
+    raw_format = args.get('format', DEFAULT_FORMAT)
+    if raw_format not in audio_io.RAW_FORMATS:
+        ws.send(json.dumps({'type': 'error', 'error': f'Unsupported raw format: {raw_format}'}))
+        return
+    dtype = audio_io.RAW_FORMATS[raw_format]
+    native_sr = args.get('sample_rate', pipe.sr, type=int)
+    resample_mode = args.get('resample_mode') or pipe.resample_mode
+    resampler = audio_io.StreamResampler(native_sr, pipe.sr, resample_mode)
+
+    gate = args.get('vad', '1') != '0'
+    session = WakewordSession(gate=gate, **pipe.wakeword_params)
+    ws.send(json.dumps({'type': 'ready', 'sample_rate': pipe.sr,
+                        'hop_seconds': session.detector.hop_seconds}))
+    pending = b''       # partial sample left over from the previous message
+    received = 0        # samples received at pipe.sr, for stream_time
+
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+        if isinstance(message, str):
+            if message.strip() == 'flush':
+                start = time.perf_counter()
+                frames, events = session.flush()
+                compute_ms = (time.perf_counter() - start) * 1000
+                for event in events:
+                    ws.send(_event_message(event, received / pipe.sr, compute_ms))
+                ws.send(json.dumps({'type': 'flushed', 'frames': int(frames.shape[1])}))
+                session = WakewordSession(gate=gate, **pipe.wakeword_params)
+            continue
+
+        start = time.perf_counter()
+        data = pending + message if pending else message
+        usable = len(data) - len(data) % dtype.itemsize
+        pending = data[usable:]
+        pcm = np.frombuffer(data, dtype=dtype, count=usable // dtype.itemsize)
+        y = resampler.push(audio_io.pcm_to_float(pcm))
+        received += len(y)
+        _, events = session.push(y)
+        compute_ms = (time.perf_counter() - start) * 1000
+        for event in events:
+            ws.send(_event_message(event, received / pipe.sr, compute_ms))
+
+
+def register(app, pipe):
+    """Add /ws/wakeword to app, sessions built from pipe; False when flask-sock is not installed."""
+    if Sock is None:
+        return False
+    sock = Sock(app)
+
+    @sock.route('/ws/wakeword')
+    def ws_wakeword(ws):
+        serve_wakeword(ws, request.args, pipe)
+
+    return True
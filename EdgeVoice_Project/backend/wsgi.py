@@ -0,0 +1,30 @@
+"""
+Production WSGI entry point for the EdgeVoice backend.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module imports the app (routing plus the NumPy pipeline;
+librosa and scipy.signal stay unloaded until used) and then runs the
+warm-up pass from startup.py. With preload_app (see gunicorn.conf.py) both
+happen once in the master before forking, so workers share the pages and
+are ready as soon as they start. EDGEVOICE_WARMUP=background leaves the
+warm-up to each worker instead, behind GET /ready.
+
+EDGEVOICE_APP=stable serves app_stable.py instead of app.py.
+"""
+
+import os
+
+import startup
+
+if os.environ.get('EDGEVOICE_APP', 'app') == 'stable':
+    from app_stable import app, pipe
+else:
+    from app import app, pipe
+
+# Threads do not survive fork, so a background warm-up is started per worker (gunicorn post_fork)
+if startup.MODE != 'background':
+    startup.start(pipe)
+print(f"⏱️ Startup timings (ms): {startup.timings}")
+
+application = app
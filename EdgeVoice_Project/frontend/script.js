@@ -97,6 +97,7 @@ if (recordBtn) {
     mediaRecorder = new MediaRecorder(stream);
     let startTime = Date.now();
     let chunkCount = 0;
+    const streamSessionId = `rec_${startTime}_${Math.random().toString(36).slice(2, 8)}`;
     let durationInterval = setInterval(() => {
       const elapsed = ((Date.now() - startTime) / 1000).toFixed(1);
       durationSpan.textContent = `Duration: ${elapsed}s`;
@@ -112,13 +113,15 @@ if (recordBtn) {
       // Stream chunk to backend for real-time MFCC
       const formData = new FormData();
       formData.append('audio', e.data, `chunk_${chunkCount}.wav`);
+      formData.append('session_id', streamSessionId);
+      formData.append('final', mediaRecorder.state === 'inactive' ? '1' : '0');
       
       try {
-        const response = await fetch('http://localhost:5000/stream_mfcc', {
+        const response = await fetch('http://localhost:5000/stream_mfcc?mfcc_format=f32', {
           method: 'POST',
           body: formData
         });
-        const result = await response.json();
+        const result = await readMfccResponse(response);
         
         if (result.mfcc) {
           console.log('Real-time MFCC received, shape:', result.shape);
@@ -348,6 +351,63 @@ if (chooseFileBtn && fileInput) {
   });
 }
 
+// --- Async upload jobs (large or compressed files) ---
+const ASYNC_UPLOAD_BYTES = 5 * 1024 * 1024;
+
+function shouldUploadAsync(blob) {
+  // Compressed formats go through FFmpeg on the server and take longest
+  const type = blob.type || '';
+  return blob.size > ASYNC_UPLOAD_BYTES || (type !== '' && !type.includes('wav'));
+}
+
+// Follow /jobs/<id>/events (Server-Sent Events) and resolve with the job's result
+function waitForJob(origin, job) {
+  return new Promise((resolve, reject) => {
+    const fetchResult = async () => {
+      const resp = await fetch(origin + job.result_url, { mode: 'cors' });
+      const body = await resp.json();
+      if (!resp.ok) {
+        throw new Error(`Server error ${resp.status}: ${body.error || 'job failed'}`);
+      }
+      return body;
+    };
+    const showProgress = (state) => {
+      statusDiv.textContent = `Processing on server: ${state.stage} (${Math.round(state.progress * 100)}%)`;
+    };
+    const events = new EventSource(origin + job.events_url);
+    events.addEventListener('progress', (e) => showProgress(JSON.parse(e.data)));
+    events.addEventListener('done', () => {
+      events.close();
+      statusDiv.textContent = 'Processing on server: done (100%)';
+      fetchResult().then(resolve, reject);
+    });
+    events.addEventListener('failed', (e) => {
+      events.close();
+      reject(new Error(JSON.parse(e.data).error || 'Job failed'));
+    });
+    events.onerror = () => {
+      // SSE blocked (proxy buffering etc.): fall back to polling the job status
+      events.close();
+      const poll = async () => {
+        try {
+          const state = await (await fetch(origin + job.status_url, { mode: 'cors' })).json();
+          if (state.state === 'done') {
+            resolve(await fetchResult());
+          } else if (state.state === 'failed') {
+            reject(new Error(state.error || 'Job failed'));
+          } else {
+            showProgress(state);
+            setTimeout(poll, 500);
+          }
+        } catch (err) {
+          reject(err);
+        }
+      };
+      poll();
+    };
+  });
+}
+
 // --- Extract MFCC ---
 window.extractMFCC = async function extractMFCC(event) {
   if (event) {
@@ -392,6 +452,9 @@ window.extractMFCC = async function extractMFCC(event) {
         
         const formData = new FormData();
         formData.append('audio', audioBlob, 'audio.wav');
+        if (shouldUploadAsync(audioBlob)) {
+          formData.append('async', '1');
+        }
         
         console.log('Sending POST request with FormData...');
         const resp = await fetch(url, {
@@ -415,6 +478,11 @@ window.extractMFCC = async function extractMFCC(event) {
           throw new Error(`Server error ${resp.status}${serverMsg ? ': ' + serverMsg : ''}`);
         }
 
+        // Heavy uploads run as a server job: follow its progress, then fetch the result
+        if (resp.status === 202 && result?.events_url) {
+          result = await waitForJob(new URL(url).origin, result);
+        }
+
         // Successful response
         console.log('Backend response:', result);
         mfccData = result.mfcc;
@@ -574,6 +642,21 @@ function displayWakeWordDetection(result) {
   }
 }
 
+// --- Read an MFCC response (JSON, or raw float32 with ?mfcc_format=f32) ---
+async function readMfccResponse(response) {
+  const contentType = response.headers.get('Content-Type') || '';
+  if (contentType.includes('application/json')) {
+    return response.json();
+  }
+  // Binary body: row-major float32 matrix, everything else in X-EdgeVoice-Meta
+  const [rows, cols] = response.headers.get('X-MFCC-Shape').split(',').map(Number);
+  const values = new Float32Array(await response.arrayBuffer());
+  const result = JSON.parse(response.headers.get('X-EdgeVoice-Meta') || '{}');
+  // Plain arrays so mfccData still round-trips through JSON.stringify (CSV export, /accelerate)
+  result.mfcc = Array.from({ length: rows }, (_, r) => Array.from(values.subarray(r * cols, (r + 1) * cols)));
+  return result;
+}
+
 // --- Draw Waveform from Blob ---
 function drawWaveformFromBlob(blob) {
   const ctx = waveformCanvas.getContext('2d');
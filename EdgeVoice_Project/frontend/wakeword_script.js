@@ -5,6 +5,11 @@ const CONFIG = {
   sampleRate: 16000,
   fftSize: 2048,
   chunkDuration: 500, // ms
+  streamBufferSize: 2048, // samples per WebSocket message (~43 ms at 48 kHz)
+  streamUrls: [
+    'ws://127.0.0.1:5000/ws/wakeword',
+    'ws://localhost:5000/ws/wakeword'
+  ],
   confidenceThreshold: 0.7,
   wakeWords: {
     'hey assistant': [0.2, -0.5, 0.8, -0.3, 0.6, -0.4, 0.7, -0.2, 0.5, -0.6, 0.4, -0.7, 0.3],
@@ -25,6 +30,7 @@ let spectrogramData = [];
 let currentWakeWord = 'hey assistant';
 let detectionStartTime = null;
 let audioChunks = [];
+let backendSocket = null;
 
 // UI Elements
 const startBtn = document.getElementById('startBtn');
@@ -95,6 +101,9 @@ async function startDetection() {
   // Connect nodes
   source.connect(analyser);
   
+  // Stream raw PCM to the backend detector over one WebSocket
+  openBackendStream(source);
+  
   // Update UI
   isDetecting = true;
   detectionStartTime = Date.now();
@@ -119,6 +128,8 @@ function stopDetection() {
   
   isDetecting = false;
   
+  closeBackendStream();
+  
   // Stop media stream
   if (mediaStream) {
     mediaStream.getTracks().forEach(track => track.stop());
@@ -446,9 +457,11 @@ async function sendToBackend(detection) {
   const dataArray = new Float32Array(bufferLength);
   analyser.getFloatTimeDomainData(dataArray);
   
-  // Convert to WAV blob (simplified)
-  const audioBlob = new Blob([dataArray.buffer], { type: 'audio/wav' });
-  formData.append('audio', audioBlob, 'wakeword.wav');
+  // Send the raw float32 samples; the backend decodes them without a WAV header
+  const audioBlob = new Blob([dataArray.buffer], { type: 'application/octet-stream' });
+  formData.append('audio', audioBlob, 'wakeword.pcm');
+  formData.append('format', 'pcm_f32le');
+  formData.append('sample_rate', audioContext.sampleRate);
   formData.append('wakeWord', currentWakeWord);
   formData.append('confidence', detection.confidence);
   
@@ -476,6 +489,74 @@ async function sendToBackend(detection) {
   }
 }
 
+// Backend streaming: one WebSocket per detection run, raw float32 PCM out,
+// detection events back (no per-chunk HTTP request)
+function openBackendStream(source, urlIndex = 0) {
+  if (urlIndex >= CONFIG.streamUrls.length) {
+    console.log('Backend stream not available, using local detection only');
+    return;
+  }
+  const url = `${CONFIG.streamUrls[urlIndex]}?format=pcm_f32le&sample_rate=${audioContext.sampleRate}`;
+  const socket = new WebSocket(url);
+  socket.binaryType = 'arraybuffer';
+  
+  socket.onopen = () => {
+    backendSocket = socket;
+    scriptProcessor = audioContext.createScriptProcessor(CONFIG.streamBufferSize, 1, 1);
+    scriptProcessor.onaudioprocess = (e) => {
+      if (backendSocket && backendSocket.readyState === WebSocket.OPEN) {
+        // Copy: the input buffer is reused by the audio thread
+        backendSocket.send(new Float32Array(e.inputBuffer.getChannelData(0)).buffer);
+      }
+    };
+    source.connect(scriptProcessor);
+    scriptProcessor.connect(audioContext.destination);
+    console.log('Streaming audio to', url);
+  };
+  socket.onmessage = (e) => {
+    const message = JSON.parse(e.data);
+    if (message.type === 'event') {
+      handleBackendEvent(message);
+    } else if (message.type === 'error') {
+      console.error('Backend stream error:', message.error);
+    }
+  };
+  socket.onerror = () => {
+    if (backendSocket !== socket && isDetecting) {
+      openBackendStream(source, urlIndex + 1);
+    }
+  };
+  socket.onclose = () => {
+    if (backendSocket === socket) {
+      backendSocket = null;
+    }
+  };
+}
+
+function closeBackendStream() {
+  if (scriptProcessor) {
+    scriptProcessor.disconnect();
+    scriptProcessor.onaudioprocess = null;
+    scriptProcessor = null;
+  }
+  if (backendSocket) {
+    backendSocket.close();
+    backendSocket = null;
+  }
+}
+
+function handleBackendEvent(event) {
+  console.log('Backend detection event:', event);
+  // Time between the end of the detected segment and the event reaching the server loop
+  const latency = Math.round((event.stream_time - event.end_time) * 1000 + event.compute_ms);
+  detectedContainer.style.display = 'block';
+  confidenceValue.textContent = `${Math.round(event.confidence * 100)}%`;
+  confidenceValue.style.color = '#00ff64';
+  latencyValue.textContent = `${latency} ms`;
+  latencyValue.style.color = '#00ff64';
+  drawDetectedWaveform();
+}
+
 // Initialize on load
 document.addEventListener('DOMContentLoaded', () => {
   console.log('Wake Word Detection UI initialized');
@@ -8,10 +8,17 @@ import sys
 # Add backend directory to path
 sys.path.insert(0, 'EdgeVoice_Project/backend')
 
+import pipeline
+
+try:
+    import feature_store
+except ImportError:
+    feature_store = None
+
 try:
-    from command_detect import detect_command
+    import result_cache
 except ImportError:
-    detect_command = None
+    result_cache = None
 
 st.set_page_config(page_title="EdgeVoice", layout="wide", initial_sidebar_state="expanded")
 
@@ -24,6 +31,49 @@ with st.sidebar:
     sample_rate = st.number_input("Sample Rate (Hz)", value=16000, min_value=8000, max_value=48000)
     n_mfcc = st.number_input("MFCC Coefficients", value=13, min_value=1, max_value=40)
 
+@st.cache_resource
+def get_pipeline(sr, n_mfcc):
+    """The backend's decode -> MFCC -> stats -> detect pipeline, built once per sidebar setting."""
+    # soxr HQ resampling, as librosa.load does
+    return pipeline.Pipeline(sr=sr, n_mfcc=n_mfcc, resample_mode='hq')
+
+def load_and_extract(audio_bytes, ext='.wav'):
+    """Run the pipeline at the sidebar settings; reruns with the same audio hit the result cache."""
+    pipe = get_pipeline(int(sample_rate), int(n_mfcc))
+    key = pipe.cache_key(audio_bytes, route='streamlit', ext=ext) if result_cache else None
+    cached = result_cache.cache.get(key) if key else None
+    if cached is None:
+        cached = pipe.process(audio_bytes, ext)
+        if key:
+            result_cache.cache.put(key, cached)
+    else:
+        st.caption("⚡ Reused cached result for this audio")
+    return dict(cached, cache_key=key)
+
+def show_extraction(result, source, filename):
+    """Report an extraction, keep it for the results tab and in the feature store."""
+    mfcc, sr, duration = result['mfcc'], result['sr'], result['stats']['duration']
+    st.success(f"✅ Audio loaded: {duration:.2f}s at {sr} Hz")
+    st.success(f"✅ MFCC extracted: shape {mfcc.shape}")
+    
+    # Store in session and in the persistent feature store
+    st.session_state.mfcc = mfcc
+    st.session_state.sr = sr
+    st.session_state.duration = duration
+    if feature_store:
+        # Keyed by the result-cache key: extracting the same audio again stores nothing new
+        st.session_state.mfcc_id = feature_store.store.put(
+            mfcc, result['cache_key'], source=source, filename=filename,
+            keyword=result['keyword'], duration=duration, sr=sr)
+    
+    # Wake word detection
+    if result['detect_error']:
+        st.warning(f"⚠️ Wake word detection error: {result['detect_error']}")
+    elif result['keyword']:
+        st.warning(f"🔊 Wake word DETECTED! ({result['keyword']}, {result['confidence']:.1f}%)")
+    else:
+        st.info("No wake word detected")
+
 # Tabs
 tab1, tab2, tab3 = st.tabs(["📤 Upload Audio", "🎤 Record Audio", "📊 Results"])
 
@@ -36,32 +86,9 @@ with tab1:
         
         if st.button("Extract MFCC", key="extract_upload"):
             try:
-                # Load audio
-                audio_data = uploaded_file.read()
-                y, sr = librosa.load(io.BytesIO(audio_data), sr=sample_rate)
-                
-                st.success(f"✅ Audio loaded: {len(y):,} samples at {sr} Hz")
-                
-                # Extract MFCC
-                mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
-                st.success(f"✅ MFCC extracted: shape {mfcc.shape}")
-                
-                # Store in session
-                st.session_state.mfcc = mfcc
-                st.session_state.y = y
-                st.session_state.sr = sr
-                
-                # Wake word detection
-                if detect_command:
-                    try:
-                        is_wake_word = detect_command(y, sr)
-                        if is_wake_word:
-                            st.warning("🔊 Wake word DETECTED!")
-                        else:
-                            st.info("No wake word detected")
-                    except Exception as e:
-                        st.warning(f"⚠️ Wake word detection error: {e}")
-                
+                ext = os.path.splitext(uploaded_file.name)[1]
+                result = load_and_extract(uploaded_file.getvalue(), ext)
+                show_extraction(result, 'streamlit-upload', uploaded_file.name)
             except Exception as e:
                 st.error(f"❌ Error: {e}")
 
@@ -72,47 +99,39 @@ with tab2:
     if audio_data is not None:
         if st.button("Extract MFCC from Recording", key="extract_record"):
             try:
-                # Load from recorded bytes
-                y, sr = librosa.load(io.BytesIO(audio_data), sr=sample_rate)
-                
-                st.success(f"✅ Audio loaded: {len(y):,} samples at {sr} Hz")
-                
-                # Extract MFCC
-                mfcc = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=n_mfcc)
-                st.success(f"✅ MFCC extracted: shape {mfcc.shape}")
-                
-                # Store in session
-                st.session_state.mfcc = mfcc
-                st.session_state.y = y
-                st.session_state.sr = sr
-                
-                # Wake word detection
-                if detect_command:
-                    try:
-                        is_wake_word = detect_command(y, sr)
-                        if is_wake_word:
-                            st.warning("🔊 Wake word DETECTED!")
-                        else:
-                            st.info("No wake word detected")
-                    except Exception as e:
-                        st.warning(f"⚠️ Wake word detection error: {e}")
-                
+                result = load_and_extract(audio_data.getvalue(), '.wav')
+                show_extraction(result, 'streamlit-recording', 'recording.wav')
             except Exception as e:
                 st.error(f"❌ Error: {e}")
 
 with tab3:
     st.header("📊 MFCC Results")
     
-    if 'mfcc' in st.session_state:
+    # Stored utterances are read by id through a memmap; only the selected one is touched
+    entries = feature_store.store.recent(200) if feature_store else []
+    mfcc = None
+    if entries:
+        labels = {e['id']: f"{e.get('filename') or e['id']} ({e['shape'][1]} frames)"
+                  for e in entries}
+        ids = list(labels)
+        current = st.session_state.get('mfcc_id')
+        index = ids.index(current) if current in ids else 0
+        selected = st.selectbox("Stored utterance", ids, index=index, format_func=labels.get)
+        entry = next(e for e in entries if e['id'] == selected)
+        mfcc = feature_store.store.get(selected)
+        sr = entry.get('sr', sample_rate)
+        duration = entry.get('duration', mfcc.shape[1] * 512 / sr)
+    elif 'mfcc' in st.session_state:
         mfcc = st.session_state.mfcc
-        y = st.session_state.y
         sr = st.session_state.sr
-        
+        duration = st.session_state.duration
+    
+    if mfcc is not None:
         col1, col2 = st.columns(2)
         
         with col1:
-            st.metric("Duration (seconds)", f"{len(y) / sr:.2f}s")
-            st.metric("MFCC Shape", f"{mfcc.shape}")
+            st.metric("Duration (seconds)", f"{duration:.2f}s")
+            st.metric("MFCC Shape", f"{tuple(mfcc.shape)}")
         
         with col2:
             st.metric("Sample Rate", f"{sr} Hz")